@@ -18,8 +18,8 @@ from config import APP_CONFIG
 from components.ui_components import aplicar_estilos_customizados, render_header
 from data_manager import data_manager
 
-# Imports das views (páginas)
-from views import mapa, reportar, dashboard, sobre, admin
+# Views (páginas): importadas sob demanda, só a página selecionada
+from views import PAGINAS, carregar_pagina
 
 # ==================== CONFIGURAÇÃO DA PÁGINA ====================
 st.set_page_config(
@@ -60,7 +60,7 @@ with st.sidebar:
     # Navegação
     pagina = st.radio(
         "Navegação",
-        ["🗺️ Mapa Interativo", "📣 Reportar Problema", "📊 Dashboard", "ℹ️ Sobre", "🔐 Admin"],
+        list(PAGINAS.keys()),
         label_visibility="collapsed"
     )
     
@@ -109,20 +109,7 @@ with st.sidebar:
 render_header()
 
 # Renderizar página selecionada
-if pagina == "🗺️ Mapa Interativo":
-    mapa.render()
-    
-elif pagina == "📣 Reportar Problema":
-    reportar.render()
-    
-elif pagina == "📊 Dashboard":
-    dashboard.render()
-    
-elif pagina == "ℹ️ Sobre":
-    sobre.render()
-    
-elif pagina == "🔐 Admin":
-    admin.render()
+carregar_pagina(pagina).render()
 
 # ==================== FOOTER ====================
 st.markdown("---")
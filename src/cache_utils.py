@@ -0,0 +1,103 @@
+"""
+Cache LRU compartilhado entre sessões, com despejo por tamanho.
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+
+class CacheLRU:
+    """
+    Cache LRU thread-safe limitado pelo tamanho total (em bytes) das entradas.
+
+    Cada entrada guarda o valor e o tamanho informado na inserção. Quando o
+    total ultrapassa ``max_bytes``, as entradas menos usadas recentemente são
+    descartadas. Uma instância em nível de módulo é compartilhada por todas
+    as sessões do Streamlit no mesmo processo.
+    """
+
+    def __init__(self, max_bytes: int, max_entradas: Optional[int] = None):
+        self.max_bytes = max_bytes
+        self.max_entradas = max_entradas
+        self._itens: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+
+    def __len__(self) -> int:
+        return len(self._itens)
+
+    def __contains__(self, chave: Hashable) -> bool:
+        return chave in self._itens
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def obter(self, chave: Hashable, padrao: Any = None) -> Any:
+        """Retorna o valor da chave (marcando-o como recente) ou ``padrao``."""
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                self.falhas += 1
+                return padrao
+            self._itens.move_to_end(chave)
+            self.acertos += 1
+            return item[0]
+
+    def inserir(self, chave: Hashable, valor: Any, tamanho: int) -> None:
+        """Insere ou substitui uma entrada e aplica o despejo por tamanho."""
+        with self._lock:
+            antigo = self._itens.pop(chave, None)
+            if antigo is not None:
+                self._total_bytes -= antigo[1]
+
+            # Entradas maiores que o cache inteiro não são guardadas
+            if tamanho > self.max_bytes:
+                return
+
+            self._itens[chave] = (valor, tamanho)
+            self._total_bytes += tamanho
+            self._despejar()
+
+    def obter_ou_criar(
+        self,
+        chave: Hashable,
+        criar: Callable[[], Any],
+        medir: Callable[[Any], int]
+    ) -> Any:
+        """
+        Retorna o valor em cache ou o constrói com ``criar``.
+
+        A construção acontece fora do lock para não bloquear outras sessões;
+        ``medir`` informa o tamanho aproximado do valor em bytes.
+        """
+        valor = self.obter(chave)
+        if valor is not None:
+            return valor
+
+        valor = criar()
+        self.inserir(chave, valor, medir(valor))
+        return valor
+
+    def remover(self, chave: Hashable) -> None:
+        """Remove uma entrada, se existir."""
+        with self._lock:
+            item = self._itens.pop(chave, None)
+            if item is not None:
+                self._total_bytes -= item[1]
+
+    def limpar(self) -> None:
+        """Remove todas as entradas."""
+        with self._lock:
+            self._itens.clear()
+            self._total_bytes = 0
+
+    def _despejar(self) -> None:
+        while self._itens and (
+            self._total_bytes > self.max_bytes
+            or (self.max_entradas is not None and len(self._itens) > self.max_entradas)
+        ):
+            _, (_, tamanho) = self._itens.popitem(last=False)
+            self._total_bytes -= tamanho
@@ -0,0 +1,163 @@
+"""
+Armazenamento colunar das ocorrências em arrays NumPy.
+
+Filtros, contagens e o índice dos tiles usam só as colunas "quentes":
+
+    tipo, status, bairro, prioridade  códigos int8 (-1 = ausente) sobre os
+                                      vocabulários do config.py, estendidos
+                                      com os valores que aparecerem a mais
+    latitude, longitude               float32 (NaN = ausente)
+    data                              int64, nanossegundos desde 1970
+                                      (``DATA_AUSENTE`` = NaT)
+
+Textos longos (descrição, usuário...) ficam fora dessas colunas e só são
+lidos do DataFrame de origem quando pedidos (``texto``). As colunas são
+montadas de forma vetorizada a partir de um snapshot do DataManager e,
+como ele, não devem ser alteradas.
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from config import BAIRROS, PRIORIDADES, STATUS_OCORRENCIA, TIPOS_OCORRENCIA
+
+CAMPOS_CATEGORICOS = ("tipo", "status", "bairro", "prioridade")
+
+CODIGO_AUSENTE = -1
+DATA_AUSENTE = np.iinfo(np.int64).min  # mesma representação de NaT
+
+
+def _vocabularios_config() -> Dict[str, List[str]]:
+    return {
+        "tipo": list(TIPOS_OCORRENCIA.keys()),
+        "status": list(STATUS_OCORRENCIA.keys()),
+        "bairro": list(BAIRROS),
+        "prioridade": list(PRIORIDADES.keys()),
+    }
+
+
+def _tipo_codigo(tamanho_vocabulario: int) -> type:
+    """Menor inteiro com sinal que comporta os códigos e o -1 de ausente."""
+    for tipo in (np.int8, np.int16):
+        if tamanho_vocabulario <= np.iinfo(tipo).max:
+            return tipo
+    return np.int32
+
+
+class ColunasOcorrencias:
+    """Colunas NumPy de um snapshot de ocorrências (ver docstring do módulo)."""
+
+    def __init__(self, df: pd.DataFrame):
+        self.tamanho = len(df)
+        self._df = df
+        self._textos: Dict[str, np.ndarray] = {}
+
+        self.vocabularios: Dict[str, List[str]] = {}
+        self.codigos: Dict[str, np.ndarray] = {}
+        for campo, vocabulario in _vocabularios_config().items():
+            valores = df[campo] if campo in df.columns else pd.Series([None] * len(df), dtype=object)
+            # Fatora uma vez e traduz as categorias encontradas para o vocabulário
+            fatorado = pd.Categorical(valores)
+            encontrados = [str(c) for c in fatorado.categories]
+            vocabulario = vocabulario + sorted(set(encontrados) - set(vocabulario))
+            posicao = {valor: i for i, valor in enumerate(vocabulario)}
+            traducao = np.array([posicao[v] for v in encontrados] + [CODIGO_AUSENTE], dtype=np.int32)
+            self.vocabularios[campo] = vocabulario
+            self.codigos[campo] = traducao[fatorado.codes].astype(_tipo_codigo(len(vocabulario)))
+
+        def _coordenada(coluna: str) -> np.ndarray:
+            if coluna not in df.columns:
+                return np.full(len(df), np.nan, dtype=np.float32)
+            return pd.to_numeric(df[coluna], errors="coerce").to_numpy(dtype=np.float32, na_value=np.nan)
+
+        self.latitude = _coordenada("latitude")
+        self.longitude = _coordenada("longitude")
+
+        if "data" in df.columns:
+            datas = pd.to_datetime(df["data"], errors="coerce")
+            if getattr(datas.dt, "tz", None) is not None:
+                datas = datas.dt.tz_localize(None)
+            self.data = datas.to_numpy(dtype="datetime64[ns]").view(np.int64)
+        else:
+            self.data = np.full(len(df), DATA_AUSENTE, dtype=np.int64)
+
+    def nbytes(self) -> int:
+        """Bytes das colunas quentes (sem os textos)."""
+        return (
+            sum(c.nbytes for c in self.codigos.values())
+            + self.latitude.nbytes + self.longitude.nbytes + self.data.nbytes
+        )
+
+    def codigo(self, campo: str, valor: Any) -> Optional[int]:
+        """Código de ``valor`` em ``campo``, ou None se ele não ocorre."""
+        try:
+            return self.vocabularios[campo].index(str(valor))
+        except ValueError:
+            return None
+
+    def rotulos(self, campo: str, posicoes: Optional[np.ndarray] = None) -> np.ndarray:
+        """Valores (str ou None) de ``campo`` nas posições dadas, como array de objetos."""
+        tabela = np.array(self.vocabularios[campo] + [None], dtype=object)
+        codigos = self.codigos[campo] if posicoes is None else self.codigos[campo][posicoes]
+        return tabela[codigos]  # -1 (ausente) indexa o None do fim
+
+    def texto(self, campo: str) -> np.ndarray:
+        """Coluna de texto do DataFrame de origem, lida só na primeira vez."""
+        if campo not in self._textos:
+            if campo in self._df.columns:
+                self._textos[campo] = self._df[campo].to_numpy(dtype=object)
+            else:
+                self._textos[campo] = np.full(self.tamanho, None, dtype=object)
+        return self._textos[campo]
+
+    def mascara(
+        self,
+        filtros: Optional[Dict[str, Any]] = None,
+        bbox: Optional[tuple] = None,
+        inicio: Optional[datetime] = None,
+        fim: Optional[datetime] = None
+    ) -> np.ndarray:
+        """
+        Máscara das linhas que atendem aos filtros, só sobre as colunas quentes.
+
+        Args:
+            filtros: Campo categórico -> valor ("Todos"/"Todas"/None não filtram)
+            bbox: Recorte (lat_min, lon_min, lat_max, lon_max)
+            inicio, fim: Intervalo de datas [inicio, fim)
+        """
+        mascara = np.ones(self.tamanho, dtype=bool)
+        for campo, valor in (filtros or {}).items():
+            if valor in (None, "", "Todos", "Todas"):
+                continue
+            codigo = self.codigo(campo, valor)
+            if codigo is None:
+                mascara[:] = False
+            else:
+                mascara &= self.codigos[campo] == codigo
+
+        if bbox is not None:
+            lat_min, lon_min, lat_max, lon_max = bbox
+            mascara &= (self.latitude >= lat_min) & (self.latitude <= lat_max)
+            mascara &= (self.longitude >= lon_min) & (self.longitude <= lon_max)
+
+        if inicio is not None or fim is not None:
+            mascara &= self.data != DATA_AUSENTE
+            if inicio is not None:
+                mascara &= self.data >= pd.Timestamp(inicio).value
+            if fim is not None:
+                mascara &= self.data < pd.Timestamp(fim).value
+
+        return mascara
+
+    def contar_por(self, campo: str) -> Dict[str, int]:
+        """Quantidade por valor de ``campo``, em ordem decrescente, sem os ausentes."""
+        codigos = self.codigos[campo]
+        contagem = np.bincount(codigos[codigos != CODIGO_AUSENTE], minlength=len(self.vocabularios[campo]))
+        ordem = np.argsort(-contagem, kind="stable")
+        return {self.vocabularios[campo][i]: int(contagem[i]) for i in ordem if contagem[i]}
+
+    def datas_ordenadas(self) -> np.ndarray:
+        """Datas presentes em ordem crescente (datetime64[ns])."""
+        return np.sort(self.data[self.data != DATA_AUSENTE]).view("datetime64[ns]")
@@ -27,6 +27,8 @@ MAP_CONFIG = {
     "zoom_start": 13,
     "min_zoom": 10,
     "max_zoom": 18,
+    # Recorte da cidade (lat_min, lon_min, lat_max, lon_max)
+    "bbox": (-11.50, -61.52, -11.38, -61.40),
 }
 
 # Tipos de ocorrência com cores e ícones
@@ -106,6 +108,147 @@ BAIRROS = [
     "Outro"
 ]
 
+# Caches de mapas e gráficos renderizados (compartilhados entre sessões)
+CACHE_CONFIG = {
+    "mapas_max_bytes": 64 * 1024 * 1024,
+    "figuras_max_bytes": 16 * 1024 * 1024,  # figuras Plotly do dashboard
+}
+
+# Servidor de tiles vetoriais (MVT) para grandes volumes de dados. O
+# navegador acessa os tiles por "url_publica"; sem ela, o mapa vetorial e os
+# tiles de fundo locais ficam desligados (ver README).
+TILES_CONFIG = {
+    "host": os.environ.get("MAPA_TILES_HOST", "127.0.0.1"),  # interface em que o servidor escuta
+    "porta": int(os.environ.get("MAPA_TILES_PORTA", "8765")),
+    "url_publica": os.environ.get("MAPA_TILES_URL"),  # ex.: https://mapa.exemplo.gov.br/tiles
+    # Origens (esquema://host[:porta]) do app que podem ler os tiles vetoriais
+    "origens": tuple(
+        o.strip().rstrip("/") for o in os.environ.get("MAPA_APP_ORIGENS", "http://localhost:8501").split(",") if o.strip()
+    ),
+    "diretorio_cache": PROCESSED_DATA_DIR / "tiles_mvt",
+    "limite_marcadores": 2000,  # acima disso o mapa usa tiles vetoriais
+    "extent": 4096,
+    "buffer": 64,
+    "max_pontos_tile": 5000,  # acima disso pontos próximos são agregados
+    "min_zoom": MAP_CONFIG["min_zoom"],
+    "max_zoom": MAP_CONFIG["max_zoom"],
+}
+
+# Tiles de fundo (CartoDB/OSM). Em modo "local" os mapas usam o cache em
+# disco servido pelo servidor de tiles, sem acesso externo.
+TILES_BASE_CONFIG = {
+    "modo": os.environ.get("MAPA_TILES_BASE", "online"),  # "online" ou "local"
+    "formato": "xyz",  # "xyz" (pastas z/x/y.png) ou "mbtiles"
+    "diretorio": DATA_DIR / "tiles_base",
+    "buscar_ausentes": False,  # em modo local, baixar e guardar tiles que faltam
+    "bbox": MAP_CONFIG["bbox"],
+    "zoom_min": MAP_CONFIG["min_zoom"],
+    "zoom_max": MAP_CONFIG["max_zoom"],
+    "estilos": {
+        "claro": {
+            "nome": "Claro",
+            "provedor": "CartoDB positron",
+            "url_origem": "https://a.basemaps.cartocdn.com/light_all/{z}/{x}/{y}.png",
+            "attr": "&copy; OpenStreetMap contributors &copy; CARTO",
+        },
+        "escuro": {
+            "nome": "Escuro",
+            "provedor": "CartoDB dark_matter",
+            "url_origem": "https://a.basemaps.cartocdn.com/dark_all/{z}/{x}/{y}.png",
+            "attr": "&copy; OpenStreetMap contributors &copy; CARTO",
+        },
+        "padrao": {
+            "nome": "Padrão",
+            "provedor": "OpenStreetMap",
+            "url_origem": "https://tile.openstreetmap.org/{z}/{x}/{y}.png",
+            "attr": "&copy; OpenStreetMap contributors",
+        },
+    },
+}
+
+# Polígonos dos bairros (GeoJSON com a propriedade "bairro")
+GEO_CONFIG = {
+    # Limites oficiais (não acompanham o repositório); únicos usados para
+    # identificar o bairro de um ponto
+    "arquivo_bairros": Path(os.environ.get("MAPA_BAIRROS_GEOJSON", RAW_DATA_DIR / "bairros.geojson")),
+    # Substituto gerado por "python geo_bairros.py --gerar", só para exibição
+    "arquivo_aproximado": PROCESSED_DATA_DIR / "bairros_aproximados.geojson",
+    # Tolerâncias de simplificação (graus) pré-calculadas e guardadas em cache
+    "tolerancias": (0.0, 0.0002, 0.0005, 0.001),
+}
+
+# Detecção de reportes duplicados no momento do envio
+DUPLICADOS_CONFIG = {
+    "raio_m": 50,  # distância máxima para sugerir um reporte existente
+    "max_sugestoes": 5,
+    "celula_m": 100,  # tamanho da célula do índice espacial
+    "status_abertos": ("Pendente", "Em Analise", "Em Andamento"),
+}
+
+# Agrupamento de reportes do mesmo problema físico em incidentes
+INCIDENTES_CONFIG = {
+    "distancia_m": 30,  # reportes do mesmo tipo a até esta distância...
+    "janela_dias": 30,  # ...e com datas a até este intervalo formam um incidente
+}
+
+# Índice de urgência por bairro e por célula de grade
+URGENCIA_CONFIG = {
+    "celula_m": 250,  # lado das células da grade
+    "meia_vida_dias": 30,  # a pontuação cai pela metade a cada meia-vida...
+    "decaimento_minimo": 0.25,  # ...até este piso (reportes antigos ainda abertos)
+    "peso_votos": 0.25,  # multiplicador: 1 + peso_votos * log(1 + votos)...
+    "votos_max": 100,  # ...com os votos limitados a este valor
+    "status_considerados": ("Pendente", "Em Analise", "Em Andamento"),
+}
+
+# Fila de triagem do painel administrativo
+TRIAGEM_CONFIG = {
+    "dias_para_dobrar": 30,  # a pontuação de uma ocorrência aberta dobra a cada N dias de espera
+    "peso_votos": 0.25,  # multiplicador: 1 + peso_votos * log(1 + votos)
+    "peso_densidade": 0.5,  # multiplicador: 1 + peso_densidade * log(1 + abertas próximas)
+    "raio_densidade_m": 250,  # lado das células: conta as abertas no bloco de 3×3 células em volta
+    "status_abertos": ("Pendente", "Em Analise", "Em Andamento"),
+    "por_pagina": 50,  # ocorrências exibidas por vez na lista do admin
+}
+
+# Cubo de agregados do dashboard
+CUBO_CONFIG = {
+    # Datas fora de [data_minima, hoje + dias_futuros] (erros de digitação)
+    # contam como "sem data", para não estender o eixo dos dias
+    "data_minima": "2020-01-01",
+    "dias_futuros": 1,
+    "atraso_gravacao_s": 5,  # escritas em sequência geram uma só gravação do cubo
+}
+
+# Linha do tempo do dashboard
+TIMELINE_CONFIG = {
+    "max_pontos": 500,  # a resolução (dia/semana/mês...) é escolhida para não passar disso
+}
+
+# Exportações geradas sob demanda e guardadas por versão dos dados e filtros
+EXPORTACAO_CONFIG = {
+    "diretorio": PROCESSED_DATA_DIR / "exportacoes",
+    "linhas_por_bloco": 50_000,
+    # Pastas de versões antigas só são apagadas sem uso há este tempo, para
+    # não sumir com um arquivo que outra sessão ou processo ainda vai enviar
+    "retencao_s": 15 * 60,
+}
+
+# Pintura progressiva: indicadores primeiro, mapas e gráficos preenchidos depois
+PINTURA_CONFIG = {
+    "progressiva": True,  # False: tudo é montado em sequência, como antes
+    "threads": 4,  # construções de mapas/gráficos em segundo plano (por processo)
+}
+
+# Coerência entre processos (vários workers do Streamlit nos mesmos arquivos):
+# cada escrita é registrada em um log compartilhado, e os outros processos
+# aplicam as alterações aos seus caches em vez de recarregar tudo
+SINCRONIZACAO_CONFIG = {
+    "log": PROCESSED_DATA_DIR / "alteracoes.jsonl",
+    "trava": PROCESSED_DATA_DIR / "alteracoes.lock",
+    "max_bytes_log": 4 * 1024 * 1024,  # acima disso o log é reiniciado
+}
+
 # Configurações da aplicação
 APP_CONFIG = {
     "titulo": "🗺️ Mapa Digital Urbano",
@@ -0,0 +1,359 @@
+"""
+Cubo de agregados das ocorrências para o dashboard.
+
+Guarda a contagem de ocorrências em um array NumPy indexado por
+tipo × status × bairro × prioridade × dia. Todo gráfico do dashboard (e o
+filtro cruzado entre eles) é uma fatia somada do cubo, cujo tamanho depende
+da quantidade de categorias e de dias, não da quantidade de ocorrências.
+
+O cubo é atualizado incrementalmente a cada escrita do DataManager e
+gravado de forma esparsa em ``PROCESSED_DATA_DIR`` alguns segundos depois
+da última escrita (``CUBO_CONFIG["atraso_gravacao_s"]``).
+"""
+import json
+import threading
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from config import BAIRROS, CUBO_CONFIG, PRIORIDADES, PROCESSED_DATA_DIR, STATUS_OCORRENCIA, TIPOS_OCORRENCIA
+from data_manager import data_manager
+
+DIMENSOES = ("tipo", "status", "bairro", "prioridade")
+
+# Rótulo das ocorrências sem valor em uma dimensão
+NAO_INFORMADO = "Não informado"
+
+# Valores assumidos pelo DataManager quando o registro não os informa
+_PADROES = {"status": "Pendente", "prioridade": "Media"}
+
+ARQUIVO_CUBO = PROCESSED_DATA_DIR / "cubo_agregados.npz"
+
+_EPOCA = np.datetime64("1970-01-01", "D")
+
+
+def _vocabularios_padrao() -> Dict[str, List[str]]:
+    return {
+        "tipo": list(TIPOS_OCORRENCIA.keys()),
+        "status": list(STATUS_OCORRENCIA.keys()),
+        "bairro": list(BAIRROS),
+        "prioridade": list(PRIORIDADES.keys()),
+    }
+
+
+def _rotulo(valor: Any) -> str:
+    if valor is None or (isinstance(valor, float) and np.isnan(valor)) or valor == "":
+        return NAO_INFORMADO
+    return str(valor)
+
+
+def _dias(datas) -> np.ndarray:
+    """Dias desde 1970-01-01 de cada data (-1 para datas ausentes ou fora do intervalo aceito)."""
+    datas = pd.to_datetime(pd.Series(datas), errors="coerce")
+    if getattr(datas.dt, "tz", None) is not None:
+        datas = datas.dt.tz_localize(None)
+    valores = datas.to_numpy(dtype="datetime64[ns]")
+    nulos = np.isnat(valores)
+    dias = (valores.astype("datetime64[D]") - _EPOCA).astype(np.int64)
+
+    minimo = (np.datetime64(CUBO_CONFIG["data_minima"], "D") - _EPOCA).astype(np.int64)
+    maximo = (np.datetime64(date.today(), "D") - _EPOCA).astype(np.int64) + CUBO_CONFIG["dias_futuros"]
+    dias[nulos | (dias < minimo) | (dias > maximo)] = -1
+    return dias
+
+
+class CuboAgregados:
+    """
+    Contagens por tipo, status, bairro, prioridade e dia.
+
+    O último eixo tem uma posição por dia a partir de ``dia0`` e, na posição
+    0, as ocorrências sem data ou com data fora do intervalo do
+    ``CUBO_CONFIG`` (o que limita o tamanho do eixo). Categorias fora dos
+    vocabulários do config são acrescentadas ao fim do eixo correspondente.
+    """
+
+    def __init__(self, vocabularios: Optional[Dict[str, List[str]]] = None, dia0: Optional[int] = None, n_dias: int = 0):
+        self.rotulos: Dict[str, List[str]] = {
+            d: list(v) for d, v in (vocabularios or _vocabularios_padrao()).items()
+        }
+        self._posicoes = {d: {r: i for i, r in enumerate(v)} for d, v in self.rotulos.items()}
+        self.dia0 = dia0
+        forma = tuple(len(self.rotulos[d]) for d in DIMENSOES) + (1 + n_dias,)
+        self.contagens = np.zeros(forma, dtype=np.int32)
+
+    # ---------- construção ----------
+
+    @classmethod
+    def de_dataframe(cls, df: pd.DataFrame) -> "CuboAgregados":
+        """Constrói o cubo com uma única contagem vetorizada (bincount)."""
+        cubo = cls()
+        if df.empty:
+            return cubo
+
+        codigos = []
+        for dimensao in DIMENSOES:
+            if dimensao not in df.columns:
+                codigos.append(np.full(len(df), cubo._codigo(dimensao, NAO_INFORMADO), dtype=np.int64))
+                continue
+            # Fatoração das strings uma única vez; depois só se traduzem os códigos
+            categorias = pd.Categorical(df[dimensao])
+            traducao = np.array(
+                [cubo._codigo(dimensao, _rotulo(c)) for c in categorias.categories]
+                + [cubo._codigo(dimensao, NAO_INFORMADO) if (categorias.codes < 0).any() else 0],
+                dtype=np.int64
+            )
+            codigos.append(traducao[categorias.codes])
+
+        dias = _dias(df["data"]) if "data" in df.columns else np.full(len(df), -1, dtype=np.int64)
+        validos = dias >= 0
+        if validos.any():
+            cubo.dia0 = int(dias[validos].min())
+            n_dias = int(dias[validos].max()) - cubo.dia0 + 1
+        else:
+            n_dias = 0
+        posicao_dia = np.where(validos, dias - (cubo.dia0 or 0) + 1, 0)
+
+        forma = tuple(len(cubo.rotulos[d]) for d in DIMENSOES) + (1 + n_dias,)
+        planos = np.ravel_multi_index(tuple(codigos) + (posicao_dia,), forma)
+        cubo.contagens = np.bincount(planos, minlength=int(np.prod(forma))).astype(np.int32).reshape(forma)
+        return cubo
+
+    def _codigo(self, dimensao: str, rotulo: str) -> int:
+        """Posição do rótulo no eixo, acrescentando-o se for novo."""
+        posicao = self._posicoes[dimensao].get(rotulo)
+        if posicao is None:
+            posicao = len(self.rotulos[dimensao])
+            self.rotulos[dimensao].append(rotulo)
+            self._posicoes[dimensao][rotulo] = posicao
+            eixo = DIMENSOES.index(dimensao)
+            if self.contagens.shape[eixo] < len(self.rotulos[dimensao]):
+                largura = [(0, 0)] * self.contagens.ndim
+                largura[eixo] = (0, 1)
+                self.contagens = np.pad(self.contagens, largura)
+        return posicao
+
+    def _posicao_dia(self, dia: int) -> int:
+        """Posição do dia no último eixo, estendendo o eixo se necessário."""
+        if dia < 0:
+            return 0
+        if self.dia0 is None:
+            self.dia0 = dia
+        n_dias = self.contagens.shape[-1] - 1
+        largura = [(0, 0)] * self.contagens.ndim
+        if dia < self.dia0:
+            # Dias anteriores entram entre a posição "sem data" e o antigo dia0
+            antes = self.dia0 - dia
+            sem_data = self.contagens[..., :1]
+            largura[-1] = (antes, 0)
+            self.contagens = np.concatenate([sem_data, np.pad(self.contagens[..., 1:], largura)], axis=-1)
+            self.dia0 = dia
+        elif dia - self.dia0 >= n_dias:
+            largura[-1] = (0, dia - self.dia0 - n_dias + 1)
+            self.contagens = np.pad(self.contagens, largura)
+        return dia - self.dia0 + 1
+
+    def aplicar(self, registro: Dict[str, Any], delta: int = 1) -> None:
+        """Soma ``delta`` à célula de uma ocorrência no formato armazenado."""
+        posicao = tuple(self._codigo(d, _rotulo(registro.get(d) or _PADROES.get(d))) for d in DIMENSOES)
+        data = registro.get("data", registro.get("data_envio"))
+        dia = int(_dias([data])[0]) if data is not None else -1
+        posicao += (self._posicao_dia(dia),)  # pode estender o eixo dos dias
+        self.contagens[posicao] += delta
+
+    # ---------- consulta ----------
+
+    def _indice_dia(self, valor: Optional[date], fim: bool) -> int:
+        dia = (np.datetime64(pd.Timestamp(valor).date(), "D") - _EPOCA).astype(np.int64)
+        posicao = int(dia) - (self.dia0 or 0) + 1
+        return posicao + 1 if fim else posicao
+
+    def fatiar(
+        self,
+        filtros: Optional[Dict[str, Iterable[str]]] = None,
+        inicio: Optional[date] = None,
+        fim: Optional[date] = None
+    ) -> np.ndarray:
+        """
+        Sub-cubo com as categorias e o intervalo de datas selecionados.
+
+        Args:
+            filtros: Dimensão -> rótulos aceitos (dimensões ausentes não filtram)
+            inicio, fim: Intervalo de datas inclusivo; se informado, ocorrências
+                sem data ficam de fora
+
+        Returns:
+            Array com os mesmos eixos do cubo (eixos filtrados reduzidos)
+        """
+        fatia = self.contagens
+        for eixo, dimensao in enumerate(DIMENSOES):
+            selecionados = (filtros or {}).get(dimensao)
+            if selecionados:
+                posicoes = [self._posicoes[dimensao][r] for r in selecionados if r in self._posicoes[dimensao]]
+                fatia = fatia.take(posicoes, axis=eixo)
+
+        if inicio is not None or fim is not None:
+            n = fatia.shape[-1]
+            a = 1 if inicio is None else min(max(self._indice_dia(inicio, False), 1), n)
+            b = n if fim is None else min(max(self._indice_dia(fim, True), 1), n)
+            fatia = fatia[..., a:max(a, b)]
+        return fatia
+
+    def total(self, filtros=None, inicio=None, fim=None) -> int:
+        """Quantidade de ocorrências na seleção."""
+        return int(self.fatiar(filtros, inicio, fim).sum(dtype=np.int64))
+
+    def contar_por(self, dimensao: str, filtros=None, inicio=None, fim=None) -> Dict[str, int]:
+        """
+        Contagem por rótulo de uma dimensão, sem rótulos zerados.
+
+        O filtro da própria dimensão é ignorado, como em um filtro cruzado:
+        o gráfico continua mostrando as demais categorias para comparação.
+        """
+        outros = {d: v for d, v in (filtros or {}).items() if d != dimensao}
+        eixo = DIMENSOES.index(dimensao)
+        fatia = self.fatiar(outros, inicio, fim)
+        somas = fatia.sum(axis=tuple(i for i in range(fatia.ndim) if i != eixo), dtype=np.int64)
+        return {r: int(q) for r, q in zip(self.rotulos[dimensao], somas) if q > 0}
+
+    def serie_diaria(self, filtros=None, inicio=None, fim=None) -> pd.Series:
+        """Ocorrências por dia (dias sem ocorrências incluídos com zero)."""
+        if self.dia0 is None or self.contagens.shape[-1] <= 1:
+            return pd.Series(dtype=np.int64)
+
+        fatia = self.fatiar(filtros)[..., 1:]
+        valores = fatia.reshape(-1, fatia.shape[-1]).sum(axis=0, dtype=np.int64)
+        datas = pd.date_range(
+            pd.Timestamp(_EPOCA + np.timedelta64(self.dia0, "D")), periods=len(valores), freq="D"
+        )
+        serie = pd.Series(valores, index=datas)
+        if inicio is not None or fim is not None:
+            serie = serie.loc[pd.Timestamp(inicio) if inicio else None:pd.Timestamp(fim) if fim else None]
+        return serie
+
+    # ---------- persistência ----------
+
+    def salvar(self, caminho: Path, versao: Optional[str]) -> None:
+        """Grava apenas as células não nulas (o cubo costuma ser muito esparso)."""
+        planos = np.flatnonzero(self.contagens)
+        temporario = Path(caminho).with_suffix(".tmp.npz")
+        np.savez_compressed(
+            temporario,
+            forma=np.asarray(self.contagens.shape, dtype=np.int64),
+            planos=planos.astype(np.int64),
+            valores=self.contagens.ravel()[planos],
+            meta=np.asarray(json.dumps({"versao": versao, "dia0": self.dia0, "rotulos": self.rotulos})),
+        )
+        temporario.replace(caminho)
+
+    @classmethod
+    def carregar(cls, caminho: Path) -> Optional[tuple]:
+        """Lê um cubo gravado; retorna (cubo, versão) ou None."""
+        try:
+            with np.load(caminho) as arquivo:
+                meta = json.loads(str(arquivo["meta"]))
+                forma = tuple(int(v) for v in arquivo["forma"])
+                cubo = cls(meta["rotulos"], meta["dia0"], forma[-1] - 1)
+                cubo.contagens.ravel()[arquivo["planos"]] = arquivo["valores"]
+            return cubo, meta["versao"]
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Erro ao carregar cubo de agregados: {e}")
+            return None
+
+
+# ==================== CUBO COMPARTILHADO ====================
+
+_lock = threading.Lock()
+_estado: Dict[str, Any] = {"versao": None, "cubo": None, "gravacao": None}
+
+
+def _gravar(cubo: CuboAgregados, versao: str) -> None:
+    try:
+        cubo.salvar(ARQUIVO_CUBO, versao)
+    except Exception as e:
+        print(f"Erro ao salvar cubo de agregados: {e}")
+
+
+def _gravar_pendente() -> None:
+    with _lock:
+        _estado["gravacao"] = None
+        if _estado["cubo"] is not None and _estado["versao"] is not None:
+            _gravar(_estado["cubo"], _estado["versao"])
+
+
+def _agendar_gravacao() -> None:
+    """Agenda a gravação do cubo; escritas até lá entram na mesma gravação (chamar com ``_lock``)."""
+    if _estado["gravacao"] is None:
+        temporizador = threading.Timer(CUBO_CONFIG["atraso_gravacao_s"], _gravar_pendente)
+        temporizador.daemon = True
+        _estado["gravacao"] = temporizador
+        temporizador.start()
+
+
+def obter_cubo() -> CuboAgregados:
+    """
+    Retorna o cubo das ocorrências atuais, compartilhado entre sessões.
+
+    Usa o arquivo em ``PROCESSED_DATA_DIR`` quando ele corresponde à versão
+    atual dos dados; caso contrário reconstrói o cubo e o grava.
+    """
+    versao = data_manager.obter_versao()
+    with _lock:
+        if _estado["cubo"] is None or _estado["versao"] != versao:
+            gravado = CuboAgregados.carregar(ARQUIVO_CUBO)
+            if gravado is not None and gravado[1] == versao:
+                cubo = gravado[0]
+            else:
+                cubo = CuboAgregados.de_dataframe(data_manager.carregar_todas_ocorrencias())
+                _gravar(cubo, versao)
+            _estado["cubo"], _estado["versao"] = cubo, versao
+        return _estado["cubo"]
+
+
+def obter_estatisticas() -> Dict[str, Any]:
+    """
+    Mesmo formato de ``DataManager.obter_estatisticas``, calculado pelo cubo.
+
+    O custo depende do tamanho do cubo e não da quantidade de ocorrências.
+    """
+    cubo = obter_cubo()
+    total = cubo.total()
+
+    def _ordenado(dimensao: str) -> Dict[str, int]:
+        contagem = cubo.contar_por(dimensao)
+        return dict(sorted(contagem.items(), key=lambda item: item[1], reverse=True))
+
+    por_status = _ordenado("status")
+    return {
+        "total": total,
+        "por_tipo": _ordenado("tipo"),
+        "por_status": por_status,
+        "por_bairro": _ordenado("bairro"),
+        "por_prioridade": _ordenado("prioridade"),
+        "ultimos_7_dias": data_manager.contar_no_periodo(datetime.now() - timedelta(days=7)),
+        "taxa_resolucao": round(por_status.get("Resolvido", 0) / total * 100, 1) if total else 0
+    }
+
+
+def _ao_alterar_dados(evento: str, ocorrencia: Dict, anterior: Optional[Dict]) -> None:
+    """Observador do DataManager: aplica a escrita ao cubo sem reconstruí-lo."""
+    with _lock:
+        cubo = _estado["cubo"]
+        if cubo is None or _estado["versao"] != data_manager.versao_antes_da_escrita:
+            return
+
+        if evento == "adicionada":
+            cubo.aplicar(ocorrencia, +1)
+        elif evento == "atualizada" and anterior is not None:
+            cubo.aplicar(anterior, -1)
+            cubo.aplicar(ocorrencia, +1)
+
+        _estado["versao"] = data_manager.versao_depois_da_escrita
+        _agendar_gravacao()
+
+
+data_manager.registrar_observador(_ao_alterar_dados)
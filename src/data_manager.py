@@ -2,29 +2,178 @@
 Gerenciador de dados - CRUD completo para ocorrências.
 """
 import json
+import os
+import threading
+import numpy as np
 import pandas as pd
+from contextlib import contextmanager, nullcontext
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Callable, Iterator, Tuple
 import uuid
 
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos
+    fcntl = None
+
 from config import (
     OCORRENCIAS_CSV, 
     REPORTES_JSON, 
     IMAGES_DIR,
     TIPOS_OCORRENCIA,
     STATUS_OCORRENCIA,
-    PRIORIDADES
+    PRIORIDADES,
+    SINCRONIZACAO_CONFIG
 )
+import geo_bairros
+from colunas_ocorrencias import CAMPOS_CATEGORICOS, ColunasOcorrencias
+from ocorrencia import CAMPOS_GRAVADOS, FONTE_USUARIO, Comentario, Ocorrencia
+
+# O DataFrame de ocorrências é compartilhado entre sessões; com copy-on-write
+# (padrão a partir do pandas 3) alterar uma seleção nunca altera o original
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+
+# Evento notificado para uma ocorrência alterada por várias operações na mesma transação
+_PESO_EVENTO = {"votada": 0, "comentada": 1, "atualizada": 2, "adicionada": 3}
+
+# Campos que ``Transacao.atualizar`` recusa: identificam o registro e sua origem
+_CAMPOS_PROTEGIDOS = frozenset(("id", "fonte"))
+
+
+def normalizar_filtros(filtros: Optional[Dict[str, str]]) -> Tuple[Tuple[str, str], ...]:
+    """
+    Mantém apenas filtros ativos e conhecidos, em ordem estável.
+    
+    O resultado serve de chave para os caches por filtro (tiles, urgência,
+    exportações).
+    """
+    filtros = filtros or {}
+    return tuple(
+        (campo, str(filtros[campo]))
+        for campo in CAMPOS_CATEGORICOS
+        if filtros.get(campo) not in (None, "", "Todos", "Todas")
+    )
+
+
+class Transacao:
+    """
+    Alterações acumuladas por ``DataManager.transacao``, gravadas juntas no fim do bloco.
+    
+    As operações só registram o que fazer: são aplicadas, na ordem, sobre os
+    reportes lidos na confirmação.
+    """
+    
+    def __init__(self):
+        self.novas: List[Ocorrencia] = []
+        # (id, evento, função que altera a ocorrência)
+        self.operacoes: List[Tuple[str, str, Callable[[Ocorrencia], None]]] = []
+    
+    def __len__(self) -> int:
+        return len(self.novas) + len(self.operacoes)
+    
+    def adicionar(self, ocorrencia: Ocorrencia) -> None:
+        """Inclui uma ocorrência nova."""
+        self.novas.append(ocorrencia)
+    
+    def atualizar(self, id_ocorrencia: str, atualizacoes: Dict[str, Any]) -> None:
+        """
+        Altera campos de uma ocorrência.
+        
+        Chaves que não são campos de ``Ocorrencia`` são gravadas como estão
+        (em ``extras``). O id e a fonte não podem ser alterados.
+        """
+        protegidos = set(atualizacoes) & _CAMPOS_PROTEGIDOS
+        if protegidos:
+            raise ValueError(f"Campos que não podem ser alterados: {', '.join(sorted(protegidos))}")
+        
+        def _alterar(ocorrencia: Ocorrencia) -> None:
+            for campo, valor in atualizacoes.items():
+                if campo in CAMPOS_GRAVADOS:
+                    setattr(ocorrencia, campo, valor)
+                else:
+                    ocorrencia.extras[campo] = valor
+            ocorrencia.data_atualizacao = datetime.now()
+        
+        self.operacoes.append((str(id_ocorrencia), "atualizada", _alterar))
+    
+    def comentar(self, id_ocorrencia: str, texto: str, autor: str = "Anonimo") -> None:
+        """Acrescenta um comentário a uma ocorrência."""
+        comentario = Comentario(texto, autor, datetime.now())
+        self.operacoes.append((str(id_ocorrencia), "comentada", lambda oc: oc.comentarios.append(comentario)))
+    
+    def votar(self, id_ocorrencia: str) -> None:
+        """Soma um voto a uma ocorrência."""
+        def _alterar(ocorrencia: Ocorrencia) -> None:
+            ocorrencia.votos += 1
+        
+        self.operacoes.append((str(id_ocorrencia), "votada", _alterar))
 
 
 class DataManager:
     """Gerenciador centralizado de dados de ocorrências."""
     
     def __init__(self):
-        self._cache_csv: Optional[pd.DataFrame] = None
-        self._cache_json: Optional[List[Dict]] = None
-        self._last_load: Optional[datetime] = None
+        # Snapshot imutável compartilhado por todas as sessões: (versão, DataFrame)
+        self._snapshot: Optional[Tuple[str, pd.DataFrame]] = None
+        # Protege snapshot, versão aplicada e posição no log de alterações
+        self._lock_snapshot = threading.RLock()
+        # Parte do CSV, reaproveitada quando só o JSON muda: (versão do CSV, DataFrame)
+        self._cache_csv: Optional[Tuple[str, pd.DataFrame]] = None
+        self._observadores: List[Callable[[str, Dict, Optional[Dict]], None]] = []
+        self._lock_notificacao = threading.RLock()
+        # Versão dos arquivos já refletida neste processo (snapshot e observadores)
+        self._versao_aplicada: Optional[str] = None
+        # Posição lida no log de alterações compartilhado: (inode, byte)
+        self._posicao_log: Tuple[int, int] = (0, 0)
+        # Alterações aplicadas ao snapshot e ainda não repassadas aos observadores:
+        # (evento, ocorrência, anterior, versão antes, versão depois)
+        self._pendentes: List[Tuple[str, Dict, Optional[Dict], str, str]] = []
+        # Versões dos dados antes e depois da escrita sendo notificada
+        self.versao_antes_da_escrita: Optional[str] = None
+        self.versao_depois_da_escrita: Optional[str] = None
+        # Colunas NumPy do snapshot: (DataFrame de origem, colunas)
+        self._colunas: Optional[Tuple[pd.DataFrame, ColunasOcorrencias]] = None
+        # Datas das ocorrências em ordem crescente (datetime64[ns]) e sua versão
+        self._datas_ordenadas: Optional[np.ndarray] = None
+        self._versao_datas: Optional[str] = None
+        self.registrar_observador(self._atualizar_datas_ordenadas)
+    
+    def registrar_observador(self, callback: Callable[[str, Dict, Optional[Dict]], None]) -> None:
+        """
+        Registra uma função chamada após cada escrita bem-sucedida.
+        
+        A função recebe o evento ("adicionada", "atualizada", "votada" ou
+        "comentada"), a ocorrência já gravada e, em atualizações, uma cópia
+        da ocorrência antes da alteração (ou None). Escritas feitas por
+        outros processos também são repassadas, na ordem em que ocorreram.
+        Caches incrementais comparam sua versão com ``versao_antes_da_escrita``
+        para saber se estavam atualizados antes desta escrita e, depois de
+        aplicá-la, passam a ``versao_depois_da_escrita``.
+        """
+        if callback not in self._observadores:
+            self._observadores.append(callback)
+    
+    def _notificar(self, evento: str, ocorrencia: Dict, anterior: Optional[Dict] = None) -> None:
+        """Repassa uma escrita aos observadores registrados."""
+        for callback in list(self._observadores):
+            try:
+                callback(evento, ocorrencia, anterior)
+            except Exception as e:
+                print(f"Erro ao notificar observador: {e}")
+    
+    def _entregar_pendentes(self) -> None:
+        """Notifica, em ordem, as alterações já aplicadas ao snapshot."""
+        with self._lock_notificacao:
+            while True:
+                with self._lock_snapshot:
+                    if not self._pendentes:
+                        return
+                    evento, ocorrencia, anterior, antes, depois = self._pendentes.pop(0)
+                self.versao_antes_da_escrita, self.versao_depois_da_escrita = antes, depois
+                self._notificar(evento, ocorrencia, anterior)
     
     def _carregar_csv(self) -> pd.DataFrame:
         """Carrega dados do CSV de ocorrências mock."""
@@ -55,7 +204,7 @@ class DataManager:
                 df["data"] = pd.to_datetime(df["data"], errors="coerce")
             
             return df
-            
+        
         except Exception as e:
             print(f"Erro ao carregar CSV: {e}")
             return pd.DataFrame()
@@ -73,33 +222,296 @@ class DataManager:
             return []
     
     def _salvar_reportes(self, reportes: List[Dict]) -> bool:
-        """Salva reportes no JSON."""
+        """
+        Grava uma alteração em massa dos reportes (sem eventos por ocorrência).
+        
+        O snapshot é remontado e os caches dos observadores são reconstruídos
+        quando forem usados. Alterações pontuais passam por ``transacao``.
+        """
         try:
-            with open(REPORTES_JSON, "w", encoding="utf-8") as f:
-                json.dump(reportes, f, indent=2, ensure_ascii=False, default=str)
-            self._cache_json = None  # Invalida cache
-            return True
+            with self._lock_snapshot, self._trava_arquivos(exclusiva=True):
+                # Alterações de outros processos entram antes desta
+                self._sincronizar(travado=True)
+                self._gravar_reportes(reportes, None)
         except Exception as e:
             print(f"Erro ao salvar reportes: {e}")
             return False
+        
+        self._entregar_pendentes()
+        return True
+    
+    def _gravar_reportes(self, reportes: List[Dict], alteracoes: Optional[List[Tuple[str, Dict, Optional[Dict]]]]) -> None:
+        """
+        Grava o JSON, registra a escrita no log e publica o novo snapshot.
+        
+        Chamado com ``_lock_snapshot`` e a trava exclusiva entre processos. O
+        arquivo é substituído de uma vez: uma falha no meio não deixa o JSON
+        pela metade.
+        
+        Args:
+            alteracoes: (evento, ocorrência, anterior) de cada reporte alterado,
+                ou None em alterações em massa
+        """
+        conteudo = json.dumps(reportes, indent=2, ensure_ascii=False, default=str)
+        antes = self._versao_aplicada
+        temporario = REPORTES_JSON.with_name(REPORTES_JSON.name + ".tmp")
+        with open(temporario, "w", encoding="utf-8") as f:
+            f.write(conteudo)
+        os.replace(temporario, REPORTES_JSON)
+        depois = self._versao_arquivos()
+        
+        self._registrar_alteracao({"alteracoes": alteracoes, "versao_antes": antes, "versao_depois": depois})
+        self._aplicar_lote(alteracoes, antes, depois)
+        if self._snapshot is None or self._snapshot[0] != depois:
+            # O snapshot é montado a partir do que foi gravado, sem reler o arquivo
+            self._snapshot = (depois, self._montar_dataframe(json.loads(conteudo)))
+        self._versao_aplicada = depois
+    
+    # ==================== COERÊNCIA ENTRE PROCESSOS ====================
+    
+    @contextmanager
+    def _trava_arquivos(self, exclusiva: bool):
+        """
+        Trava entre processos sobre os arquivos de dados e o log de alterações.
+        
+        Escritas usam a trava exclusiva (JSON e log mudam juntos); leituras do
+        log só a pedem quando ele parece incompleto.
+        """
+        if fcntl is None:
+            yield
+            return
+        
+        fd = os.open(SINCRONIZACAO_CONFIG["trava"], os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if exclusiva else fcntl.LOCK_SH)
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+    
+    def _registrar_alteracao(self, registro: Dict) -> None:
+        """Acrescenta uma escrita ao log compartilhado (com a trava exclusiva)."""
+        caminho = Path(SINCRONIZACAO_CONFIG["log"])
+        linha = (json.dumps(registro, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+        
+        # Log grande demais: recomeça em um arquivo novo (inode novo); quem
+        # ainda não tinha lido o fim do anterior recarrega tudo uma vez
+        if caminho.exists() and caminho.stat().st_size > SINCRONIZACAO_CONFIG["max_bytes_log"]:
+            temporario = caminho.with_suffix(".tmp")
+            temporario.write_bytes(b"")
+            os.replace(temporario, caminho)
+        
+        fd = os.open(caminho, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, linha)
+            info = os.fstat(fd)
+        finally:
+            os.close(fd)
+        self._posicao_log = (info.st_ino, info.st_size)
+    
+    def _ler_alteracoes(self) -> Iterator[Dict]:
+        """Registros do log ainda não lidos; a posição avança a cada registro completo."""
+        caminho = Path(SINCRONIZACAO_CONFIG["log"])
+        try:
+            with open(caminho, "rb") as f:
+                info = os.fstat(f.fileno())
+                inode, posicao = self._posicao_log
+                if info.st_ino != inode or info.st_size < posicao:
+                    posicao = 0  # log reiniciado: a cadeia de versões diz se dá para continuar
+                f.seek(posicao)
+                for linha in f:
+                    if not linha.endswith(b"\n"):
+                        break  # escrita em andamento
+                    posicao += len(linha)
+                    self._posicao_log = (info.st_ino, posicao)
+                    yield json.loads(linha)
+        except FileNotFoundError:
+            return
+    
+    def _aplicar_log(self) -> Optional[bool]:
+        """
+        Aplica ao snapshot as escritas registradas a partir da versão aplicada.
+        
+        Returns:
+            True se os arquivos atuais ficaram refletidos, False se o log
+            ainda não chegou a eles e None se uma escrita não continua a
+            versão aplicada (houve alteração fora do log: é preciso recarregar)
+        """
+        for registro in self._ler_alteracoes():
+            if registro.get("versao_antes") != self._versao_aplicada or "alteracoes" not in registro:
+                return None
+            self._aplicar_lote(registro["alteracoes"], registro["versao_antes"], registro["versao_depois"])
+            self._versao_aplicada = registro["versao_depois"]
+        return self._versao_aplicada == self._versao_arquivos()
+    
+    def _adotar_versao_arquivos(self) -> None:
+        """Descarta o que não pôde ser aplicado: tudo é remontado a partir dos arquivos."""
+        self._versao_aplicada = self._versao_arquivos()
+        self._pendentes.clear()
+        try:
+            info = os.stat(SINCRONIZACAO_CONFIG["log"])
+            self._posicao_log = (info.st_ino, info.st_size)
+        except FileNotFoundError:
+            self._posicao_log = (0, 0)
+    
+    def _sincronizar(self, travado: bool = False) -> None:
+        """
+        Traz este processo para a versão atual dos arquivos (com ``_lock_snapshot``).
+        
+        Escritas de outros processos são lidas do log e aplicadas ao snapshot
+        (inclusive reportes novos, acrescentados sem reler o JSON); as
+        notificações ficam pendentes até ``_entregar_pendentes``. Só uma
+        alteração fora do log (CSV editado, log reiniciado) força a recarga.
+        
+        Args:
+            travado: Se a trava exclusiva entre processos já está com o chamador
+        """
+        aplicado = None if self._versao_aplicada is None else self._aplicar_log()
+        if aplicado:
+            return
+        # JSON já gravado e log ainda não: a trava espera a escrita terminar
+        with nullcontext() if travado else self._trava_arquivos(exclusiva=False):
+            if aplicado is False:
+                aplicado = self._aplicar_log()
+            if not aplicado:
+                self._adotar_versao_arquivos()
+    
+    def _aplicar_lote(self, alteracoes: Optional[List[Tuple[str, Dict, Optional[Dict]]]], antes: str, depois: str) -> None:
+        """
+        Aplica ao snapshot as alterações de uma escrita e as deixa pendentes para os observadores.
+        
+        Os observadores recebem uma alteração por vez; entre a versão antes e
+        a depois da escrita são usadas versões intermediárias ("<depois>#i").
+        """
+        if alteracoes is None:
+            # Alteração em massa: os observadores reconstroem seus caches
+            self._pendentes.clear()
+            return
+        
+        self._aplicar_ao_snapshot(alteracoes, antes, depois)
+        versoes = [antes] + [f"{depois}#{i}" for i in range(1, len(alteracoes))] + [depois]
+        for i, (evento, ocorrencia, anterior) in enumerate(alteracoes):
+            self._pendentes.append((evento, ocorrencia, anterior, versoes[i], versoes[i + 1]))
+    
+    def _aplicar_ao_snapshot(self, alteracoes: List[Tuple[str, Dict, Optional[Dict]]], antes: str, depois: str) -> None:
+        """
+        Troca o snapshot pela versão com as alterações aplicadas, se ele estava em ``antes``.
+        
+        Reportes novos vão para o fim e os alterados são trocados na mesma
+        posição, com uma única concatenação para o lote inteiro.
+        """
+        snapshot = self._snapshot
+        if snapshot is None or snapshot[0] != antes or not alteracoes:
+            return
+        
+        df = snapshot[1]
+        linhas = self._completar_dataframe(self._dataframe_reportes([oc for _, oc, _ in alteracoes]))
+        adicionadas = [i for i, (evento, _, _) in enumerate(alteracoes) if evento == "adicionada"]
+        trocadas = [i for i, (evento, _, _) in enumerate(alteracoes) if evento != "adicionada"]
+        
+        posicoes = []
+        if trocadas:
+            if "fonte" not in df.columns or "id" not in df.columns:
+                self._snapshot = None
+                return
+            do_usuario = np.flatnonzero((df["fonte"] == FONTE_USUARIO).to_numpy(dtype=bool, na_value=False))
+            posicao = dict(zip(df["id"].iloc[do_usuario].astype(str), do_usuario))
+            posicoes = [posicao.get(str(alteracoes[i][1].get("id"))) for i in trocadas]
+            if None in posicoes or len(set(posicoes)) != len(posicoes):
+                self._snapshot = None  # não localizada: remonta quando for pedido
+                return
+        
+        pedacos, inicio = [], 0
+        for p, i in sorted(zip(posicoes, trocadas)):
+            pedacos += [df.iloc[inicio:p], linhas.iloc[[i]]]
+            inicio = p + 1
+        pedacos += [df.iloc[inicio:], linhas.iloc[adicionadas]]
+        self._snapshot = (depois, pd.concat([p for p in pedacos if len(p)], ignore_index=True))
+    
+    @staticmethod
+    def _versao_arquivo(caminho: Path) -> str:
+        try:
+            info = caminho.stat()
+            return f"{info.st_mtime_ns}-{info.st_size}"
+        except FileNotFoundError:
+            return "0"
+    
+    def _versao_arquivos(self) -> str:
+        return ":".join(self._versao_arquivo(c) for c in (OCORRENCIAS_CSV, REPORTES_JSON))
+    
+    def obter_versao(self) -> str:
+        """
+        Retorna um identificador da versão atual dos dados.
+        
+        A versão muda sempre que o CSV ou o JSON de reportes é alterado
+        (data de modificação ou tamanho) e serve como chave de caches. Se
+        outro processo alterou os arquivos, suas escritas são aplicadas e
+        repassadas aos observadores antes de a nova versão ser retornada.
+        """
+        if self._versao_arquivos() != self._versao_aplicada:
+            with self._lock_snapshot:
+                if self._versao_arquivos() != self._versao_aplicada:
+                    self._sincronizar()
+        if self._pendentes:
+            self._entregar_pendentes()
+        return self._versao_aplicada
     
     def carregar_todas_ocorrencias(self, force_reload: bool = False) -> pd.DataFrame:
         """
         Carrega todas as ocorrências (CSV + JSON) em um DataFrame unificado.
+        
+        O DataFrame é um snapshot da versão atual dos dados compartilhado por
+        todas as sessões do processo e NÃO deve ser alterado: filtre com
+        máscaras (``selecionar_ocorrencias``) e crie colunas com ``assign``.
+        Escritas (deste ou de outros processos) trocam o snapshot de uma vez,
+        e quem ainda usa o anterior continua com uma versão consistente.
         """
-        # Carregar CSV
-        df_csv = self._carregar_csv()
+        snapshot = self._snapshot
+        if snapshot is None or snapshot[0] != self._versao_arquivos() or force_reload:
+            with self._lock_snapshot:
+                # Sem notificar: quem chama pode estar com a trava de um observador,
+                # e as alterações pendentes são repassadas no próximo obter_versao
+                if self._versao_arquivos() != self._versao_aplicada:
+                    self._sincronizar()
+                snapshot = self._snapshot
+                if snapshot is None or snapshot[0] != self._versao_aplicada or force_reload:
+                    with self._trava_arquivos(exclusiva=False):
+                        if self._versao_arquivos() != self._versao_aplicada:
+                            self._adotar_versao_arquivos()
+                        snapshot = (self._versao_aplicada, self._montar_dataframe(self._carregar_reportes()))
+                    self._snapshot = snapshot
+        return snapshot[1]
+    
+    @staticmethod
+    def _dataframe_reportes(reportes: List[Dict]) -> pd.DataFrame:
+        """Reportes do JSON no formato das colunas do CSV."""
+        df_json = pd.DataFrame(reportes)
+        df_json["fonte"] = FONTE_USUARIO
         
-        # Carregar reportes JSON
-        reportes = self._carregar_reportes()
+        # Normalizar colunas do JSON
+        if "data_envio" in df_json.columns:
+            # ISO8601: com e sem microssegundos (isoformat omite os zeros), o
+            # mesmo resultado ao converter um reporte ou todos de uma vez
+            df_json["data"] = pd.to_datetime(df_json["data_envio"], format="ISO8601", errors="coerce")
+        return df_json
+    
+    @staticmethod
+    def _completar_dataframe(df: pd.DataFrame) -> pd.DataFrame:
+        """Preenche valores nulos (em um novo DataFrame: df pode ser o CSV em cache)."""
+        return df.assign(
+            status=df.get("status", pd.Series(["Pendente"] * len(df))).fillna("Pendente"),
+            prioridade=df.get("prioridade", pd.Series(["Media"] * len(df))).fillna("Media")
+        )
+    
+    def _montar_dataframe(self, reportes: List[Dict]) -> pd.DataFrame:
+        """Une o CSV (em cache por versão do arquivo) aos reportes."""
+        versao_csv = self._versao_arquivo(OCORRENCIAS_CSV)
+        if self._cache_csv is None or self._cache_csv[0] != versao_csv:
+            self._cache_csv = (versao_csv, self._carregar_csv())
+        df_csv = self._cache_csv[1]
         
         if reportes:
-            df_json = pd.DataFrame(reportes)
-            df_json["fonte"] = "Usuário"
-            
-            # Normalizar colunas do JSON
-            if "data_envio" in df_json.columns:
-                df_json["data"] = pd.to_datetime(df_json["data_envio"], errors="coerce")
+            df_json = self._dataframe_reportes(reportes)
             
             # Unificar DataFrames
             if not df_csv.empty:
@@ -109,11 +521,170 @@ class DataManager:
         else:
             df = df_csv
         
-        # Preencher valores nulos
-        df["status"] = df.get("status", pd.Series(["Pendente"] * len(df))).fillna("Pendente")
-        df["prioridade"] = df.get("prioridade", pd.Series(["Media"] * len(df))).fillna("Media")
+        return self._completar_dataframe(df)
+    
+    def mascara_ocorrencias(
+        self,
+        df: pd.DataFrame,
+        filtros: Optional[Dict[str, Any]] = None,
+        bbox: Optional[tuple] = None,
+        inicio: Optional[datetime] = None,
+        fim: Optional[datetime] = None
+    ) -> np.ndarray:
+        """
+        Máscara booleana das linhas de ``df`` que atendem aos filtros.
+        
+        Sobre o snapshot atual, categorias, coordenadas e datas são avaliadas
+        nas colunas NumPy (``obter_colunas``); só filtros por outros campos
+        comparam colunas do DataFrame.
+        
+        Args:
+            filtros: Campo -> valor exigido ("Todos"/"Todas"/None não filtram)
+            bbox: Recorte (lat_min, lon_min, lat_max, lon_max)
+            inicio, fim: Intervalo de datas [inicio, fim)
+        """
+        filtros = dict(filtros or {})
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot[1] is df:
+            colunas = self._colunas_do_snapshot(df)
+            categoricos = {c: filtros.pop(c) for c in CAMPOS_CATEGORICOS if c in filtros and c in df.columns}
+            tem_datas = "data" in df.columns  # sem a coluna, datas não filtram
+            mascara = colunas.mascara(categoricos, bbox, inicio if tem_datas else None, fim if tem_datas else None)
+            bbox = inicio = fim = None
+        else:
+            mascara = np.ones(len(df), dtype=bool)
+        
+        for campo, valor in filtros.items():
+            if valor not in (None, "", "Todos", "Todas") and campo in df.columns:
+                mascara &= (df[campo] == valor).to_numpy(dtype=bool, na_value=False)
+        
+        if bbox is not None:
+            lat_min, lon_min, lat_max, lon_max = bbox
+            lat = pd.to_numeric(df.get("latitude"), errors="coerce").to_numpy(dtype=float)
+            lon = pd.to_numeric(df.get("longitude"), errors="coerce").to_numpy(dtype=float)
+            mascara &= (lat >= lat_min) & (lat <= lat_max) & (lon >= lon_min) & (lon <= lon_max)
+        
+        if (inicio is not None or fim is not None) and "data" in df.columns:
+            datas = pd.to_datetime(df["data"], errors="coerce")
+            if inicio is not None:
+                mascara &= (datas >= pd.Timestamp(inicio)).to_numpy()
+            if fim is not None:
+                mascara &= (datas < pd.Timestamp(fim)).to_numpy()
+        
+        return mascara
+    
+    def _colunas_do_snapshot(self, df: pd.DataFrame) -> ColunasOcorrencias:
+        """Colunas NumPy do snapshot ``df``, montadas na primeira vez que são pedidas."""
+        colunas = self._colunas
+        if colunas is None or colunas[0] is not df:
+            colunas = (df, ColunasOcorrencias(df))
+            self._colunas = colunas
+        return colunas[1]
+    
+    def obter_colunas(self) -> ColunasOcorrencias:
+        """
+        Armazenamento colunar do snapshot atual (ver ``colunas_ocorrencias``).
+        
+        Categorias como códigos int8, coordenadas float32 e datas int64: é o
+        que filtros, estatísticas e o índice dos tiles percorrem. Como o
+        snapshot, é compartilhado e não deve ser alterado.
+        """
+        return self._colunas_do_snapshot(self.carregar_todas_ocorrencias())
+    
+    def selecionar_ocorrencias(self, filtros: Optional[Dict[str, Any]] = None, **kwargs) -> pd.DataFrame:
+        """
+        Ocorrências do snapshot atual que atendem aos filtros.
+        
+        Sem filtros efetivos retorna o próprio snapshot, sem cópia; com
+        filtros, só as linhas selecionadas são copiadas. Aceita os mesmos
+        argumentos de ``mascara_ocorrencias``.
+        """
+        df = self.carregar_todas_ocorrencias()
+        mascara = self.mascara_ocorrencias(df, filtros, **kwargs)
+        return df if mascara.all() else df[mascara]
+    
+    def iterar_ocorrencias(
+        self,
+        tamanho_bloco: int = 50_000,
+        filtros: Optional[Dict[str, Any]] = None,
+        bbox: Optional[tuple] = None,
+        inicio: Optional[datetime] = None,
+        fim: Optional[datetime] = None
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Percorre as ocorrências em blocos, já filtradas.
+        
+        Os filtros são avaliados como máscaras vetorizadas antes de qualquer
+        bloco ser montado, então só as linhas selecionadas são copiadas.
+        
+        Args:
+            tamanho_bloco: Linhas por bloco
+            filtros, bbox, inicio, fim: Como em ``mascara_ocorrencias``
+        """
+        df = self.carregar_todas_ocorrencias()
+        if df.empty:
+            return
+        
+        posicoes = np.flatnonzero(self.mascara_ocorrencias(df, filtros, bbox, inicio, fim))
+        for i in range(0, len(posicoes), tamanho_bloco):
+            yield df.iloc[posicoes[i:i + tamanho_bloco]]
+    
+    # ==================== JANELAS DE TEMPO ====================
+    
+    def _obter_datas_ordenadas(self) -> np.ndarray:
+        """Datas de todas as ocorrências em ordem crescente, sem datas ausentes."""
+        versao = self.obter_versao()
+        if self._datas_ordenadas is None or self._versao_datas != versao:
+            self._datas_ordenadas, self._versao_datas = self.obter_colunas().datas_ordenadas(), versao
+        return self._datas_ordenadas
+    
+    def _atualizar_datas_ordenadas(self, evento: str, ocorrencia: Dict, anterior: Optional[Dict]) -> None:
+        """Observador interno: insere a data de novos reportes sem recarregar os dados."""
+        if self._datas_ordenadas is None or self._versao_datas != self.versao_antes_da_escrita:
+            return
+        
+        if evento == "adicionada":
+            data = pd.to_datetime(ocorrencia.get("data_envio"), errors="coerce")
+            if not pd.isna(data):
+                data = np.datetime64(data.tz_localize(None) if data.tzinfo else data, "ns")
+                posicao = np.searchsorted(self._datas_ordenadas, data, side="right")
+                self._datas_ordenadas = np.insert(self._datas_ordenadas, posicao, data)
+        elif evento == "atualizada" and anterior and anterior.get("data_envio") != ocorrencia.get("data_envio"):
+            self._datas_ordenadas = None
+            return
+        
+        self._versao_datas = self.versao_depois_da_escrita
+    
+    def contar_no_periodo(self, inicio: Optional[datetime] = None, fim: Optional[datetime] = None) -> int:
+        """
+        Quantidade de ocorrências com data em [inicio, fim).
+        
+        São duas buscas binárias sobre as datas ordenadas.
+        """
+        datas = self._obter_datas_ordenadas()
+        a = 0 if inicio is None else np.searchsorted(datas, np.datetime64(pd.Timestamp(inicio), "ns"), side="left")
+        b = len(datas) if fim is None else np.searchsorted(datas, np.datetime64(pd.Timestamp(fim), "ns"), side="left")
+        return int(max(b - a, 0))
+    
+    def obter_kpi_periodo(self, dias: int = 7, referencia: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Ocorrências nos últimos ``dias`` dias comparadas ao período anterior de mesmo tamanho.
+        
+        Returns:
+            Dict com "atual", "anterior", "delta" e "variacao" (percentual,
+            ou None se o período anterior não tiver ocorrências)
+        """
+        referencia = referencia or datetime.now()
+        janela = pd.Timedelta(days=dias)
+        atual = self.contar_no_periodo(referencia - janela, referencia)
+        anterior = self.contar_no_periodo(referencia - 2 * janela, referencia - janela)
         
-        return df
+        return {
+            "atual": atual,
+            "anterior": anterior,
+            "delta": atual - anterior,
+            "variacao": round((atual - anterior) / anterior * 100, 1) if anterior else None
+        }
     
     def adicionar_ocorrencia(
         self,
@@ -125,82 +696,171 @@ class DataManager:
         prioridade: str = "Media",
         fotos: Optional[List[str]] = None,
         usuario: str = "Anonimo"
-    ) -> Dict[str, Any]:
+    ) -> Ocorrencia:
         """
         Adiciona uma nova ocorrência ao sistema.
         
         Returns:
-            Dict com os dados da ocorrência criada
+            A ocorrência criada (sem bairro informado, preenchido pela localização)
         """
+        # O bairro escolhido pelo usuário é mantido; só o vazio é preenchido
+        if bairro in (None, ""):
+            bairro = geo_bairros.identificar_bairro(latitude, longitude) or bairro
+        
         # Gerar ID único
-        id_ocorrencia = datetime.now().strftime("%Y%m%d%H%M%S") + "_" + uuid.uuid4().hex[:6]
-        
-        ocorrencia = {
-            "id": id_ocorrencia,
-            "tipo": tipo,
-            "descricao": descricao,
-            "latitude": latitude,
-            "longitude": longitude,
-            "bairro": bairro,
-            "status": "Pendente",
-            "prioridade": prioridade,
-            "fotos": fotos or [],
-            "usuario": usuario,
-            "data_envio": datetime.now().isoformat(),
-            "data_atualizacao": datetime.now().isoformat(),
-            "votos": 0,
-            "comentarios": []
-        }
+        agora = datetime.now()
+        ocorrencia = Ocorrencia(
+            id=agora.strftime("%Y%m%d%H%M%S") + "_" + uuid.uuid4().hex[:6],
+            tipo=tipo,
+            descricao=descricao,
+            latitude=latitude,
+            longitude=longitude,
+            bairro=bairro,
+            prioridade=prioridade,
+            fotos=fotos,
+            usuario=usuario,
+            data_envio=agora,
+            data_atualizacao=agora
+        )
         
-        # Carregar reportes existentes e adicionar novo
-        reportes = self._carregar_reportes()
-        reportes.append(ocorrencia)
+        try:
+            with self.transacao() as tx:
+                tx.adicionar(ocorrencia)
+        except Exception as e:
+            raise Exception("Falha ao salvar ocorrência") from e
+        return ocorrencia
+    
+    def obter_ocorrencia(self, id_ocorrencia: str) -> Optional[Ocorrencia]:
+        """Uma ocorrência do snapshot atual (CSV ou reporte), ou None se não existir."""
+        df = self.carregar_todas_ocorrencias()
+        if df.empty or "id" not in df.columns:
+            return None
         
-        if self._salvar_reportes(reportes):
-            return ocorrencia
-        else:
-            raise Exception("Falha ao salvar ocorrência")
+        posicoes = np.flatnonzero((df["id"].astype(str) == str(id_ocorrencia)).to_numpy(dtype=bool, na_value=False))
+        return Ocorrencia.de_linha(df.iloc[posicoes[0]]) if len(posicoes) else None
     
-    def atualizar_ocorrencia(self, id_ocorrencia: str, atualizacoes: Dict) -> bool:
-        """Atualiza uma ocorrência existente."""
-        reportes = self._carregar_reportes()
+    # ==================== TRANSAÇÕES ====================
+    
+    @contextmanager
+    def transacao(self) -> Iterator["Transacao"]:
+        """
+        Agrupa alterações de reportes em uma única gravação.
+        
+        Uso::
         
-        for i, rep in enumerate(reportes):
-            if rep.get("id") == id_ocorrencia:
-                reportes[i].update(atualizacoes)
-                reportes[i]["data_atualizacao"] = datetime.now().isoformat()
-                return self._salvar_reportes(reportes)
+            with data_manager.transacao() as tx:
+                tx.atualizar(id_ocorrencia, {"status": "Em Analise"})
+                tx.comentar(id_ocorrencia, "Ocorrencia em analise.", "Administrador")
         
-        return False
+        Nada é gravado antes do fim do bloco. Se o bloco levantar uma exceção,
+        ou se uma alteração não puder ser aplicada (ocorrência inexistente,
+        id ou fonte alterados), nada é gravado e a exceção é repassada. A leitura
+        dos reportes, as alterações e a gravação acontecem com a trava entre
+        processos, então escritas concorrentes não se perdem. Os observadores
+        são notificados depois da gravação, uma vez por ocorrência alterada.
+        """
+        tx = Transacao()
+        yield tx
+        if tx:
+            self._confirmar(tx)
+    
+    def _confirmar(self, tx: "Transacao") -> None:
+        with self._lock_snapshot, self._trava_arquivos(exclusiva=True):
+            self._sincronizar(travado=True)
+            reportes = self._carregar_reportes()
+            indices = {str(rep.get("id")): i for i, rep in enumerate(reportes)}
+            
+            # id -> [ocorrência em edição, evento, reporte antes da transação]
+            alteradas: Dict[str, list] = {}
+            for ocorrencia in tx.novas:
+                alteradas[ocorrencia.id] = [ocorrencia, "adicionada", None]
+            for id_ocorrencia, evento, alterar in tx.operacoes:
+                if id_ocorrencia not in alteradas:
+                    if id_ocorrencia not in indices:
+                        raise KeyError(f"Reporte {id_ocorrencia} não encontrado")
+                    anterior = reportes[indices[id_ocorrencia]]
+                    alteradas[id_ocorrencia] = [Ocorrencia.de_dict(anterior), evento, anterior]
+                item = alteradas[id_ocorrencia]
+                alterar(item[0])
+                if _PESO_EVENTO[evento] > _PESO_EVENTO[item[1]]:
+                    item[1] = evento
+            
+            alteracoes = []
+            for id_ocorrencia, (ocorrencia, evento, anterior) in alteradas.items():
+                reporte = ocorrencia.para_dict()
+                if evento == "adicionada":
+                    reportes.append(reporte)
+                else:
+                    reportes[indices[id_ocorrencia]] = reporte
+                alteracoes.append((evento, reporte, anterior))
+            
+            self._gravar_reportes(reportes, alteracoes)
+        
+        self._entregar_pendentes()
+    
+    def _em_transacao(self, operacao: Callable[["Transacao"], None]) -> bool:
+        """Executa uma alteração isolada; False se a ocorrência não existir ou a gravação falhar."""
+        try:
+            with self.transacao() as tx:
+                operacao(tx)
+        except KeyError:
+            return False
+        except Exception as e:
+            print(f"Erro ao salvar reportes: {e}")
+            return False
+        return True
+    
+    def atualizar_ocorrencia(self, id_ocorrencia: str, atualizacoes: Dict) -> bool:
+        """Atualiza campos de uma ocorrência existente (veja ``Transacao.atualizar``)."""
+        return self._em_transacao(lambda tx: tx.atualizar(id_ocorrencia, atualizacoes))
     
     def votar_ocorrencia(self, id_ocorrencia: str) -> bool:
         """Incrementa o contador de votos de uma ocorrência."""
-        reportes = self._carregar_reportes()
-        
-        for i, rep in enumerate(reportes):
-            if rep.get("id") == id_ocorrencia:
-                reportes[i]["votos"] = reportes[i].get("votos", 0) + 1
-                return self._salvar_reportes(reportes)
-        
-        return False
+        return self._em_transacao(lambda tx: tx.votar(id_ocorrencia))
     
     def adicionar_comentario(self, id_ocorrencia: str, comentario: str, autor: str = "Anonimo") -> bool:
         """Adiciona um comentário a uma ocorrência."""
+        return self._em_transacao(lambda tx: tx.comentar(id_ocorrencia, comentario, autor))
+    
+    def reclassificar_bairros(self, apenas_indefinidos: bool = True, simular: bool = False) -> int:
+        """
+        Atribui o bairro dos reportes gravados pela localização (limites oficiais).
+        
+        As alterações são gravadas em uma única transação, que notifica os
+        observadores uma vez por reporte alterado.
+        
+        Args:
+            apenas_indefinidos: Se True, altera só reportes sem bairro; com False
+                sobrescreve também os bairros escolhidos pelos usuários
+            simular: Se True, só conta os reportes que seriam alterados
+        
+        Returns:
+            Quantidade de reportes alterados (ou que seriam alterados)
+        """
         reportes = self._carregar_reportes()
+        if not reportes:
+            return 0
+        
+        lat = pd.to_numeric(pd.Series([r.get("latitude") for r in reportes]), errors="coerce").to_numpy()
+        lon = pd.to_numeric(pd.Series([r.get("longitude") for r in reportes]), errors="coerce").to_numpy()
+        novos = geo_bairros.atribuir_bairros(lat, lon)
         
-        for i, rep in enumerate(reportes):
-            if rep.get("id") == id_ocorrencia:
-                if "comentarios" not in reportes[i]:
-                    reportes[i]["comentarios"] = []
-                
-                reportes[i]["comentarios"].append({
-                    "texto": comentario,
-                    "autor": autor,
-                    "data": datetime.now().isoformat()
-                })
-                return self._salvar_reportes(reportes)
+        alteracoes = {}
+        for rep, novo in zip(reportes, novos):
+            if novo is None or rep.get("bairro") == novo:
+                continue
+            if apenas_indefinidos and rep.get("bairro") not in (None, ""):
+                continue
+            alteracoes[str(rep.get("id"))] = novo
         
-        return False
+        if simular or not alteracoes:
+            return len(alteracoes)
+        
+        def _reclassificar(tx: "Transacao") -> None:
+            for id_ocorrencia, novo in alteracoes.items():
+                tx.atualizar(id_ocorrencia, {"bairro": novo})
+        
+        return len(alteracoes) if self._em_transacao(_reclassificar) else 0
     
     def obter_estatisticas(self) -> Dict[str, Any]:
         """Retorna estatísticas gerais das ocorrências."""
@@ -217,23 +877,15 @@ class DataManager:
                 "taxa_resolucao": 0
             }
         
-        # Por tipo
-        por_tipo = df["tipo"].value_counts().to_dict() if "tipo" in df.columns else {}
-        
-        # Por status
-        por_status = df["status"].value_counts().to_dict() if "status" in df.columns else {}
-        
-        # Por bairro
-        por_bairro = df["bairro"].value_counts().to_dict() if "bairro" in df.columns else {}
-        
-        # Por prioridade
-        por_prioridade = df["prioridade"].value_counts().to_dict() if "prioridade" in df.columns else {}
+        # Contagens sobre os códigos das colunas categóricas
+        colunas = self._colunas_do_snapshot(df)
+        por_tipo = colunas.contar_por("tipo")
+        por_status = colunas.contar_por("status")
+        por_bairro = colunas.contar_por("bairro")
+        por_prioridade = colunas.contar_por("prioridade")
         
         # Últimos 7 dias
-        ultimos_7_dias = 0
-        if "data" in df.columns:
-            data_limite = datetime.now() - pd.Timedelta(days=7)
-            ultimos_7_dias = len(df[df["data"] >= data_limite])
+        ultimos_7_dias = self.contar_no_periodo(datetime.now() - pd.Timedelta(days=7))
         
         # Taxa de resolução
         total = len(df)
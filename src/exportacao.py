@@ -0,0 +1,320 @@
+"""
+Exportação de ocorrências sob demanda, para planilhas e sistemas GIS.
+
+Formatos: CSV, GeoJSON por linha (GeoJSONSeq), GeoParquet (requer o pacote
+opcional ``pyarrow``) e FlatGeobuf. Os arquivos só são gerados quando alguém
+pede o download. As ocorrências vêm do DataManager em blocos já filtrados
+(filtros do mapa, recorte e período) e cada bloco é gravado assim que é
+lido, direto em um arquivo temporário. O resultado fica em disco por
+(versão dos dados, formato, filtros): downloads repetidos apenas releem o
+arquivo, em qualquer sessão ou processo.
+
+Extração pela linha de comando (executar a partir de ``src``):
+    python exportacao.py --formato fgb --bbox -11.46 -61.48 -11.42 -61.44 --inicio 2025-01-01 --saida extrato.fgb
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import flatgeobuf
+from config import EXPORTACAO_CONFIG
+from data_manager import data_manager, normalizar_filtros
+
+_lock = threading.Lock()
+
+# Propriedades das exportações geográficas (nome, tipo do FlatGeobuf)
+COLUNAS_GEO: List[Tuple[str, str]] = [
+    ("id", "string"),
+    ("tipo", "string"),
+    ("descricao", "string"),
+    ("bairro", "string"),
+    ("status", "string"),
+    ("prioridade", "string"),
+    ("votos", "long"),
+    ("data", "datetime"),
+    ("fonte", "string"),
+]
+
+
+# ==================== PREPARAÇÃO DOS BLOCOS ====================
+
+def _valores_bloco(bloco: pd.DataFrame) -> Dict[str, List[Any]]:
+    """Colunas de ``COLUNAS_GEO`` como listas Python (None para ausentes)."""
+    colunas = {}
+    for nome, tipo in COLUNAS_GEO:
+        if nome not in bloco.columns:
+            colunas[nome] = [None] * len(bloco)
+        elif tipo == "long":
+            serie = pd.to_numeric(bloco[nome], errors="coerce").astype("Int64")
+            colunas[nome] = [None if pd.isna(v) else int(v) for v in serie]
+        elif tipo == "datetime":
+            serie = pd.to_datetime(bloco[nome], errors="coerce").dt.strftime("%Y-%m-%dT%H:%M:%S")
+            colunas[nome] = serie.astype(object).where(serie.notna(), None).tolist()
+        else:
+            serie = bloco[nome].astype(object)
+            colunas[nome] = [None if pd.isna(v) else str(v) for v in serie]
+    return colunas
+
+
+def _coordenadas(bloco: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    lat = pd.to_numeric(bloco.get("latitude"), errors="coerce").to_numpy(dtype=float)
+    lon = pd.to_numeric(bloco.get("longitude"), errors="coerce").to_numpy(dtype=float)
+    return lat, lon
+
+
+# ==================== ESCRITORES ====================
+
+def _escrever_csv(caminho: Path, blocos: Iterator[pd.DataFrame]) -> None:
+    # "utf-8-sig" grava o BOM uma única vez, no início do arquivo (Excel)
+    with open(caminho, "w", encoding="utf-8-sig", newline="") as f:
+        primeiro = True
+        for bloco in blocos:
+            bloco.to_csv(f, index=False, header=primeiro)
+            primeiro = False
+
+
+def _escrever_geojsonl(caminho: Path, blocos: Iterator[pd.DataFrame]) -> None:
+    """Uma Feature GeoJSON por linha (RFC 8142 sem separador, lido pelo GDAL como GeoJSONSeq)."""
+    nomes = [nome for nome, _ in COLUNAS_GEO]
+    with open(caminho, "w", encoding="utf-8") as f:
+        for bloco in blocos:
+            valores = _valores_bloco(bloco)
+            lat, lon = _coordenadas(bloco)
+            linhas = []
+            for i, propriedades in enumerate(zip(*(valores[n] for n in nomes))):
+                geometria = None
+                if not (np.isnan(lat[i]) or np.isnan(lon[i])):
+                    geometria = {"type": "Point", "coordinates": [float(lon[i]), float(lat[i])]}
+                linhas.append(json.dumps(
+                    {"type": "Feature", "geometry": geometria, "properties": dict(zip(nomes, propriedades))},
+                    ensure_ascii=False
+                ))
+            if linhas:
+                f.write("\n".join(linhas) + "\n")
+
+
+def _escrever_flatgeobuf(caminho: Path, blocos: Iterator[pd.DataFrame]) -> None:
+    nomes = [nome for nome, _ in COLUNAS_GEO]
+
+    def _feicoes():
+        for bloco in blocos:
+            valores = _valores_bloco(bloco)
+            lat, lon = _coordenadas(bloco)
+            for i, propriedades in enumerate(zip(*(valores[n] for n in nomes))):
+                valido = not (np.isnan(lat[i]) or np.isnan(lon[i]))
+                yield (float(lon[i]) if valido else None, float(lat[i]) if valido else None, propriedades)
+
+    with open(caminho, "wb") as f:
+        flatgeobuf.escrever(f, "ocorrencias", COLUNAS_GEO, _feicoes())
+
+
+def _pontos_wkb(lat: np.ndarray, lon: np.ndarray):
+    """Coluna de geometrias WKB (Point, little-endian) montada sem laço por linha."""
+    import pyarrow as pa
+
+    registros = np.zeros(len(lat), dtype=[("ordem", "u1"), ("tipo", "<u4"), ("x", "<f8"), ("y", "<f8")])
+    registros["ordem"], registros["tipo"], registros["x"], registros["y"] = 1, 1, lon, lat
+    deslocamentos = np.arange(len(lat) + 1, dtype=np.int32) * registros.itemsize
+    validos = ~(np.isnan(lat) | np.isnan(lon))
+    return pa.Array.from_buffers(
+        pa.binary(),
+        len(lat),
+        [pa.array(validos).buffers()[1] if not validos.all() else None,
+         pa.py_buffer(deslocamentos.tobytes()),
+         pa.py_buffer(registros.tobytes())],
+        null_count=int((~validos).sum())
+    )
+
+
+def _escrever_geoparquet(caminho: Path, blocos: Iterator[pd.DataFrame]) -> None:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("A exportação GeoParquet requer o pacote opcional pyarrow (pip install pyarrow).")
+
+    tipos_arrow = {"string": pa.string(), "long": pa.int64(), "datetime": pa.timestamp("ms"), "double": pa.float64()}
+    metadados_geo = {
+        "version": "1.0.0",
+        "primary_column": "geometry",
+        "columns": {"geometry": {"encoding": "WKB", "geometry_types": ["Point"]}},
+    }
+    esquema = pa.schema(
+        [pa.field(nome, tipos_arrow[tipo]) for nome, tipo in COLUNAS_GEO] + [pa.field("geometry", pa.binary())],
+        metadata={"geo": json.dumps(metadados_geo)}
+    )
+
+    with pq.ParquetWriter(str(caminho), esquema, compression="zstd") as escritor:
+        for bloco in blocos:
+            valores = _valores_bloco(bloco)
+            lat, lon = _coordenadas(bloco)
+            colunas = []
+            for nome, tipo in COLUNAS_GEO:
+                if tipo == "datetime":
+                    colunas.append(pa.array(pd.to_datetime(pd.Series(valores[nome], dtype=object)), type=pa.timestamp("ms")))
+                else:
+                    colunas.append(pa.array(valores[nome], type=tipos_arrow[tipo]))
+            colunas.append(_pontos_wkb(lat, lon))
+            escritor.write_table(pa.Table.from_arrays(colunas, schema=esquema))
+
+
+# Formato -> (extensão, tipo MIME, rótulo, escritor)
+FORMATOS: Dict[str, Tuple[str, str, str, Callable[[Path, Iterator[pd.DataFrame]], None]]] = {
+    "csv": ("csv", "text/csv", "CSV", _escrever_csv),
+    "geojsonl": ("geojsonl", "application/geo+json-seq", "GeoJSON (uma feição por linha)", _escrever_geojsonl),
+    "parquet": ("parquet", "application/vnd.apache.parquet", "GeoParquet", _escrever_geoparquet),
+    "fgb": ("fgb", "application/flatgeobuf", "FlatGeobuf", _escrever_flatgeobuf),
+}
+
+
+# ==================== CACHE EM DISCO ====================
+
+def _resumo(texto: str) -> str:
+    return hashlib.sha1(texto.encode("utf-8")).hexdigest()[:16]
+
+
+def caminho_exportacao(
+    formato: str,
+    filtros: Optional[Dict[str, str]] = None,
+    bbox: Optional[tuple] = None,
+    inicio=None,
+    fim=None
+) -> Path:
+    """Arquivo de exportação da versão atual dos dados para os parâmetros."""
+    pasta_versao = Path(EXPORTACAO_CONFIG["diretorio"]) / _resumo(data_manager.obter_versao())
+    parametros = repr((normalizar_filtros(filtros), bbox, str(inicio), str(fim)))
+    return pasta_versao / f"{_resumo(parametros)}.{FORMATOS[formato][0]}"
+
+
+def _marcar_uso(pasta: Path) -> None:
+    """Renova o prazo de retenção da pasta de uma versão."""
+    try:
+        os.utime(pasta)
+    except OSError:
+        pass
+
+
+def _descartar_versoes_antigas(pasta_atual: Path) -> None:
+    """Apaga as pastas de outras versões sem uso há mais de ``retencao_s`` (chamar com ``_lock``)."""
+    limite = time.time() - EXPORTACAO_CONFIG["retencao_s"]
+    for pasta in pasta_atual.parent.iterdir():
+        try:
+            antiga = pasta.is_dir() and pasta != pasta_atual and pasta.stat().st_mtime < limite
+        except FileNotFoundError:
+            continue
+        if antiga:
+            shutil.rmtree(pasta, ignore_errors=True)
+
+
+def escrever_exportacao(
+    destino: Path,
+    formato: str,
+    filtros: Optional[Dict[str, str]] = None,
+    bbox: Optional[tuple] = None,
+    inicio=None,
+    fim=None
+) -> None:
+    """Grava a exportação diretamente em ``destino``, bloco a bloco."""
+    blocos = data_manager.iterar_ocorrencias(
+        EXPORTACAO_CONFIG["linhas_por_bloco"],
+        filtros=dict(normalizar_filtros(filtros)),
+        bbox=bbox,
+        inicio=inicio,
+        fim=fim
+    )
+    FORMATOS[formato][3](Path(destino), blocos)
+
+
+def exportar(
+    formato: str,
+    filtros: Optional[Dict[str, str]] = None,
+    bbox: Optional[tuple] = None,
+    inicio=None,
+    fim=None
+) -> Path:
+    """
+    Retorna o arquivo exportado, gerando-o apenas se ainda não existir.
+
+    Args:
+        formato: Chave de ``FORMATOS`` ("csv", "geojsonl", "parquet", "fgb")
+        filtros: Filtros do mapa (tipo, status, bairro, prioridade)
+        bbox: Recorte (lat_min, lon_min, lat_max, lon_max)
+        inicio, fim: Intervalo de datas [inicio, fim)
+    """
+    destino = caminho_exportacao(formato, filtros, bbox, inicio, fim)
+    if destino.exists():
+        _marcar_uso(destino.parent)
+        return destino
+
+    with _lock:
+        if destino.exists():
+            _marcar_uso(destino.parent)
+            return destino
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        _descartar_versoes_antigas(destino.parent)
+
+        temporario = destino.with_name(destino.name + ".tmp")
+        try:
+            escrever_exportacao(temporario, formato, filtros, bbox, inicio, fim)
+            temporario.replace(destino)
+        finally:
+            temporario.unlink(missing_ok=True)
+    return destino
+
+
+def abrir_exportacao(formato: str, filtros: Optional[Dict[str, str]] = None, **parametros) -> BinaryIO:
+    """
+    Abre o arquivo exportado para leitura, gerando-o se preciso.
+
+    O arquivo é aberto sob a mesma trava da limpeza de versões antigas; uma
+    vez aberto, continua legível mesmo que a pasta seja apagada depois.
+    """
+    while True:
+        destino = exportar(formato, filtros, **parametros)
+        with _lock:
+            try:
+                return open(destino, "rb")
+            except FileNotFoundError:
+                continue  # apagado por outro processo entre a geração e a abertura
+
+
+def baixar(formato: str, filtros: Optional[Dict[str, str]] = None, **parametros) -> Callable[[], BinaryIO]:
+    """
+    Função para o ``data`` de ``st.download_button``.
+
+    O Streamlit só a executa quando o usuário clica no botão e lê o arquivo
+    aberto que ela retorna.
+    """
+    filtros = dict(filtros or {})
+    return lambda: abrir_exportacao(formato, filtros, **parametros)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exporta as ocorrências para CSV ou formatos GIS.")
+    parser.add_argument("--formato", choices=list(FORMATOS.keys()), default="fgb")
+    parser.add_argument("--saida", required=True, help="Arquivo de destino")
+    parser.add_argument("--bbox", nargs=4, type=float, metavar=("LAT_MIN", "LON_MIN", "LAT_MAX", "LON_MAX"))
+    parser.add_argument("--inicio", help="Data inicial (AAAA-MM-DD)")
+    parser.add_argument("--fim", help="Data final, exclusiva (AAAA-MM-DD)")
+    for campo in ("tipo", "status", "bairro", "prioridade"):
+        parser.add_argument(f"--{campo}")
+    args = parser.parse_args()
+
+    escrever_exportacao(
+        Path(args.saida),
+        args.formato,
+        filtros={c: getattr(args, c) for c in ("tipo", "status", "bairro", "prioridade")},
+        bbox=tuple(args.bbox) if args.bbox else None,
+        inicio=args.inicio,
+        fim=args.fim
+    )
+    print(f"Exportacao gravada em {args.saida}")
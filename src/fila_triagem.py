@@ -0,0 +1,385 @@
+"""
+Fila de triagem incremental do painel administrativo.
+
+Cada ocorrência aberta recebe uma pontuação que combina o peso da
+prioridade, os votos, a densidade de reportes abertos próximos e o tempo de
+espera:
+
+    base = peso / peso_max
+           * (1 + peso_votos * log(1 + votos))
+           * (1 + peso_densidade * log(1 + vizinhos))
+    pontuação(agora) = base * 2 ** ((agora - data) / dias_para_dobrar)
+
+``vizinhos`` conta as ocorrências abertas no bloco de 3×3 células de lado
+``raio_m`` em volta da ocorrência (uma vizinhança quadrada, não um círculo),
+o que permite contar todas de uma vez na montagem da fila.
+
+Como o envelhecimento é exponencial, ``log2(pontuação)`` é a chave fixa
+``log2(base) - data / dias_para_dobrar`` mais um termo igual para todas:
+a ordem não muda com o passar do tempo e a fila pode ficar em um heap. As
+escritas do DataManager atualizam só as ocorrências afetadas (a alterada e
+as vizinhas cuja densidade mudou) e as próximas N saem do heap em
+O(N log N), sem ordenar o conjunto inteiro. Ocorrências fechadas vêm
+depois de todas as abertas, das mais recentes para as mais antigas.
+"""
+import heapq
+import itertools
+import math
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from colunas_ocorrencias import DATA_AUSENTE, ColunasOcorrencias
+from config import PRIORIDADES, TRIAGEM_CONFIG
+from data_manager import data_manager
+from indice_espacial import celula, chave_celula, projetar
+from ocorrencia import Ocorrencia
+
+_NS_POR_DIA = 86400 * 10**9
+
+# Entrada do heap: (grupo, chave, sequência, id). Grupo 0 = aberta, 1 = fechada;
+# a sequência desempata e marca a entrada vigente de cada id
+Entrada = Tuple[int, float, int, str]
+
+
+class _Item:
+    """Estado de uma ocorrência na fila."""
+
+    __slots__ = ("peso", "votos", "dias", "x", "y", "aberta", "vizinhos")
+
+    def __init__(self, peso: float, votos: float, dias: float, x: float, y: float, aberta: bool):
+        self.peso = peso
+        self.votos = votos
+        self.dias = dias  # data do envio, em dias desde 1970
+        self.x = x
+        self.y = y
+        self.aberta = aberta
+        self.vizinhos = 0  # ocorrências abertas nas células vizinhas (só para as abertas)
+
+    @property
+    def localizada(self) -> bool:
+        return not (math.isnan(self.x) or math.isnan(self.y))
+
+
+class FilaTriagem:
+    """Heap de ocorrências pela pontuação de triagem (ver docstring do módulo)."""
+
+    def __init__(
+        self,
+        raio_m: float,
+        dias_para_dobrar: float,
+        peso_votos: float,
+        peso_densidade: float,
+        status_abertos
+    ):
+        self.raio_m = float(raio_m)
+        self.dias_para_dobrar = float(dias_para_dobrar)
+        self.peso_votos = float(peso_votos)
+        self.peso_densidade = float(peso_densidade)
+        self.status_abertos = frozenset(status_abertos)
+
+        pesos = {p: info["peso"] for p, info in PRIORIDADES.items()}
+        self._pesos = {p: peso / max(pesos.values()) for p, peso in pesos.items()}
+        self._peso_padrao = self._pesos.get("Media", 1.0)
+
+        self._itens: Dict[str, _Item] = {}
+        self._vigentes: Dict[str, Entrada] = {}
+        self._heap: List[Entrada] = []
+        self._sequencia = itertools.count()
+        # Ocorrências abertas com coordenadas, por célula de lado raio_m; as
+        # vizinhas de uma ocorrência são as do bloco de 3×3 células em volta
+        self._grade: Dict[Tuple[int, int], Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._itens)
+
+    # ---------- pontuação ----------
+
+    def _log2_base(self, item: _Item) -> float:
+        return math.log2(
+            item.peso
+            * (1.0 + self.peso_votos * math.log1p(item.votos))
+            * (1.0 + self.peso_densidade * math.log1p(item.vizinhos))
+        )
+
+    def _entrada(self, id_ocorrencia: str, item: _Item) -> Entrada:
+        if item.aberta:
+            chave = item.dias / self.dias_para_dobrar - self._log2_base(item)
+            return (0, chave, next(self._sequencia), id_ocorrencia)
+        return (1, -item.dias, next(self._sequencia), id_ocorrencia)
+
+    def pontuacao(self, id_ocorrencia: str, agora: Optional[float] = None) -> Optional[float]:
+        """Pontuação de uma ocorrência aberta no instante ``agora`` (epoch em s); None se fechada."""
+        item = self._itens.get(str(id_ocorrencia))
+        if item is None or not item.aberta:
+            return None
+        agora_dias = (time.time() if agora is None else agora) / 86400.0
+        return 2.0 ** (self._log2_base(item) + (agora_dias - item.dias) / self.dias_para_dobrar)
+
+    # ---------- atualização ----------
+
+    def _reenfileirar(self, id_ocorrencia: str) -> None:
+        entrada = self._entrada(id_ocorrencia, self._itens[id_ocorrencia])
+        self._vigentes[id_ocorrencia] = entrada
+        heapq.heappush(self._heap, entrada)
+        # Entradas antigas só são descartadas ao sair do heap; compacta se acumularem
+        if len(self._heap) > 2 * len(self._vigentes) + 64:
+            self._compactar()
+
+    def _compactar(self) -> None:
+        self._vigentes = {i: self._entrada(i, item) for i, item in self._itens.items()}
+        self._heap = list(self._vigentes.values())
+        heapq.heapify(self._heap)
+
+    def _celula(self, x: float, y: float) -> Tuple[int, int]:
+        cx, cy = celula(x, y, self.raio_m)
+        return int(cx), int(cy)
+
+    def _vizinhos(self, id_ocorrencia: str, item: _Item) -> List[str]:
+        """Ocorrências abertas no bloco de 3×3 células do item (sem ele mesmo)."""
+        cx, cy = self._celula(item.x, item.y)
+        proximos = []
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                proximos.extend(o for o in self._grade.get((cx + dx, cy + dy), ()) if o != id_ocorrencia)
+        return proximos
+
+    def _inserir(self, id_ocorrencia: str, item: _Item) -> None:
+        self._itens[id_ocorrencia] = item
+        if item.aberta and item.localizada:
+            proximos = self._vizinhos(id_ocorrencia, item)
+            item.vizinhos = len(proximos)
+            for outro in proximos:
+                self._itens[outro].vizinhos += 1
+                self._reenfileirar(outro)
+            self._grade.setdefault(self._celula(item.x, item.y), set()).add(id_ocorrencia)
+        self._reenfileirar(id_ocorrencia)
+
+    def _remover(self, id_ocorrencia: str) -> None:
+        item = self._itens.pop(id_ocorrencia)
+        self._vigentes.pop(id_ocorrencia, None)
+        if item.aberta and item.localizada:
+            self._grade[self._celula(item.x, item.y)].discard(id_ocorrencia)
+            for outro in self._vizinhos(id_ocorrencia, item):
+                self._itens[outro].vizinhos -= 1
+                self._reenfileirar(outro)
+
+    def _novo_item(self, prioridade: Any, votos: Any, data_ns: Optional[int], x: float, y: float, status: Any) -> _Item:
+        votos = 0.0 if votos is None or votos != votos else max(float(votos), 0.0)
+        # Sem data, a espera conta a partir de quando a fila viu a ocorrência
+        dias = time.time() / 86400.0 if data_ns is None else data_ns / _NS_POR_DIA
+        return _Item(self._pesos.get(prioridade, self._peso_padrao), votos, dias, x, y, status in self.status_abertos)
+
+    def atualizar(self, ocorrencia: Ocorrencia) -> None:
+        """Insere ou atualiza uma ocorrência e a densidade das vizinhas afetadas."""
+        data_ns = None
+        if ocorrencia.data_envio is not None:
+            data = pd.Timestamp(ocorrencia.data_envio)
+            data_ns = (data.tz_localize(None) if data.tzinfo else data).value
+        # Em lista, coordenadas ausentes (None) viram NaN
+        x, y = projetar([ocorrencia.latitude], [ocorrencia.longitude])
+        item = self._novo_item(
+            ocorrencia.prioridade, ocorrencia.votos, data_ns,
+            float(x[0]), float(y[0]), ocorrencia.status
+        )
+
+        anterior = self._itens.get(ocorrencia.id)
+        mesma_posicao = anterior is not None and anterior.aberta == item.aberta and (
+            not item.aberta
+            or (anterior.x, anterior.y) == (item.x, item.y)
+            or not (anterior.localizada or item.localizada)
+        )
+        if mesma_posicao:
+            # Só prioridade, votos ou data mudaram: as vizinhas não são afetadas
+            item.vizinhos = anterior.vizinhos
+            self._itens[ocorrencia.id] = item
+            self._reenfileirar(ocorrencia.id)
+            return
+
+        if anterior is not None:
+            self._remover(ocorrencia.id)
+        self._inserir(ocorrencia.id, item)
+
+    # ---------- consulta ----------
+
+    def proximos(self, n: int, ids: Optional[Set[str]] = None) -> List[str]:
+        """
+        Ids das ``n`` próximas ocorrências da fila (abertas primeiro).
+
+        O heap é percorrido em ordem a partir da raiz, com um heap auxiliar
+        das entradas de fronteira: só os nós visitados são comparados. Se
+        ``ids`` restringe a fila a uma pequena parte dela, as entradas
+        dessas ocorrências são comparadas diretamente.
+
+        Args:
+            n: Quantidade de ids
+            ids: Restringe a fila a estas ocorrências (ex.: os filtros da tela)
+        """
+        heap, vigentes = self._heap, self._vigentes
+        if ids is not None and 4 * len(ids) < len(vigentes):
+            entradas = (vigentes[i] for i in ids if i in vigentes)
+            return [entrada[3] for entrada in heapq.nsmallest(n, entradas)]
+
+        resultado: List[str] = []
+        fronteira = [(heap[0], 0)] if heap else []
+        while fronteira and len(resultado) < n:
+            entrada, posicao = heapq.heappop(fronteira)
+            id_ocorrencia = entrada[3]
+            if vigentes.get(id_ocorrencia) is entrada and (ids is None or id_ocorrencia in ids):
+                resultado.append(id_ocorrencia)
+            for filho in (2 * posicao + 1, 2 * posicao + 2):
+                if filho < len(heap):
+                    heapq.heappush(fronteira, (heap[filho], filho))
+        return resultado
+
+    @classmethod
+    def de_dataframe(
+        cls,
+        df: pd.DataFrame,
+        colunas: Optional[ColunasOcorrencias] = None,
+        **parametros
+    ) -> "FilaTriagem":
+        """
+        Monta a fila e ordena o heap de uma vez (heapify).
+
+        A densidade de todas as ocorrências abertas é contada de forma
+        vetorizada (``_contar_vizinhos``); a inserção item a item, com a
+        busca de vizinhas, fica só para as atualizações incrementais.
+
+        Com ``colunas`` (as colunas NumPy de ``df``), prioridade, status,
+        coordenadas e datas são lidos delas em vez do DataFrame.
+        """
+        fila = cls(**parametros)
+        if df.empty:
+            return fila
+
+        if colunas is not None:
+            prioridades = colunas.rotulos("prioridade")
+            status = colunas.rotulos("status")
+            lat, lon, datas = colunas.latitude.astype(float), colunas.longitude.astype(float), colunas.data
+        else:
+            prioridades = df["prioridade"].to_numpy(dtype=object)
+            status = df["status"].to_numpy(dtype=object)
+            lat = pd.to_numeric(df.get("latitude"), errors="coerce").to_numpy(dtype=float)
+            lon = pd.to_numeric(df.get("longitude"), errors="coerce").to_numpy(dtype=float)
+            datas = pd.to_datetime(df["data"], errors="coerce").to_numpy(dtype="datetime64[ns]").view(np.int64)
+        votos = pd.to_numeric(df["votos"], errors="coerce").to_numpy(dtype=float) if "votos" in df.columns \
+            else np.zeros(len(df))
+
+        # Ids repetidos: vale a última linha, como nas atualizações
+        ids = df["id"].astype(str).to_numpy(dtype=object)
+        ultimas = ~pd.Index(ids).duplicated(keep="last")
+        x, y = projetar(lat[ultimas], lon[ultimas])
+        for id_ocorrencia, p, v, d, xi, yi, s in zip(
+            ids[ultimas].tolist(), prioridades[ultimas].tolist(), votos[ultimas].tolist(),
+            datas[ultimas].tolist(), x.tolist(), y.tolist(), status[ultimas].tolist()
+        ):
+            fila._itens[id_ocorrencia] = fila._novo_item(p, v, None if d == DATA_AUSENTE else d, xi, yi, s)
+
+        na_grade = [(i, item) for i, item in fila._itens.items() if item.aberta and item.localizada]
+        if na_grade:
+            cx, cy = celula(
+                np.fromiter((item.x for _, item in na_grade), dtype=float, count=len(na_grade)),
+                np.fromiter((item.y for _, item in na_grade), dtype=float, count=len(na_grade)),
+                fila.raio_m
+            )
+            for (id_ocorrencia, item), vizinhos, i, j in zip(
+                na_grade, _contar_vizinhos(cx, cy).tolist(), cx.tolist(), cy.tolist()
+            ):
+                item.vizinhos = vizinhos
+                fila._grade.setdefault((i, j), set()).add(id_ocorrencia)
+
+        fila._compactar()
+        return fila
+
+
+def _contar_vizinhos(cx: np.ndarray, cy: np.ndarray) -> np.ndarray:
+    """
+    Quantidade de outros pontos no bloco de 3×3 células em volta da célula de cada ponto.
+
+    Conta-se a ocupação de cada célula uma vez (``np.unique``) e, para cada
+    um dos 9 deslocamentos, soma-se a ocupação da célula vizinha, achada por
+    busca binária: O(n log n), qualquer que seja a densidade.
+    """
+    celulas, ocupacao = np.unique(chave_celula(cx, cy), return_counts=True)
+
+    contagem = np.full(len(cx), -1, dtype=np.int64)  # o próprio ponto
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            alvo = chave_celula(cx + dx, cy + dy)
+            posicoes = np.minimum(np.searchsorted(celulas, alvo), len(celulas) - 1)
+            contagem += np.where(celulas[posicoes] == alvo, ocupacao[posicoes], 0)
+    return contagem
+
+
+# ==================== FILA COMPARTILHADA ====================
+
+_lock = threading.Lock()
+_estado: Dict[str, Any] = {"versao": None, "fila": None}
+
+
+def _parametros() -> Dict[str, Any]:
+    return {
+        "raio_m": TRIAGEM_CONFIG["raio_densidade_m"],
+        "dias_para_dobrar": TRIAGEM_CONFIG["dias_para_dobrar"],
+        "peso_votos": TRIAGEM_CONFIG["peso_votos"],
+        "peso_densidade": TRIAGEM_CONFIG["peso_densidade"],
+        "status_abertos": TRIAGEM_CONFIG["status_abertos"],
+    }
+
+
+def obter_fila() -> FilaTriagem:
+    """
+    Retorna a fila das ocorrências atuais, compartilhada entre sessões.
+
+    Escritas feitas pelo DataManager são aplicadas de forma incremental; a
+    fila só é remontada se os dados mudarem por outro caminho. Consultas e
+    alterações da fila devem ser feitas com ``_lock``.
+    """
+    versao = data_manager.obter_versao()
+    with _lock:
+        if _estado["fila"] is None or _estado["versao"] != versao:
+            df = data_manager.carregar_todas_ocorrencias()
+            _estado["fila"] = FilaTriagem.de_dataframe(df, data_manager.obter_colunas(), **_parametros())
+            _estado["versao"] = versao
+        return _estado["fila"]
+
+
+def ordenar_para_triagem(df: pd.DataFrame, n: Optional[int] = None) -> pd.DataFrame:
+    """
+    As ``n`` primeiras linhas de ``df`` na ordem da fila de triagem.
+
+    ``df`` deve conter só ocorrências do snapshot atual (por exemplo, o
+    resultado de ``selecionar_ocorrencias``). Sem ``n``, devolve todas.
+
+    A fila é compartilhada entre sessões; escritas feitas pelo DataManager
+    são aplicadas a ela de forma incremental.
+    """
+    if df.empty:
+        return df
+    n = len(df) if n is None else n
+
+    posicoes = {id_ocorrencia: i for i, id_ocorrencia in enumerate(df["id"].astype(str).tolist())}
+    fila = obter_fila()
+    with _lock:
+        ordem = fila.proximos(n, None if len(posicoes) >= len(fila) else posicoes.keys())
+    return df.iloc[[posicoes[i] for i in ordem if i in posicoes]]
+
+
+def _ao_alterar_dados(evento: str, ocorrencia: Dict, anterior: Optional[Dict]) -> None:
+    """Observador do DataManager: reposiciona só as ocorrências afetadas."""
+    with _lock:
+        fila = _estado["fila"]
+        if fila is None or _estado["versao"] != data_manager.versao_antes_da_escrita:
+            return
+
+        if evento in ("adicionada", "atualizada", "votada"):
+            fila.atualizar(Ocorrencia.de_dict(ocorrencia))
+
+        _estado["versao"] = data_manager.versao_depois_da_escrita
+
+
+data_manager.registrar_observador(_ao_alterar_dados)
@@ -0,0 +1,216 @@
+"""
+Codificador mínimo de FlatGeobuf (pontos, sem índice espacial).
+
+Um arquivo FlatGeobuf é o número mágico, um cabeçalho e as feições, cada
+um em FlatBuffers precedido pelo tamanho (uint32). Sem índice
+(``index_node_size = 0``) as feições podem ser gravadas à medida que são
+lidas, o que permite exportar grandes volumes em fluxo. Como em
+``tiles_vetoriais``, a serialização é feita à mão para não exigir
+dependências extras.
+
+Especificação: https://github.com/flatgeobuf/flatgeobuf (header.fbs, feature.fbs)
+"""
+import struct
+from typing import Any, BinaryIO, Callable, Iterable, List, Optional, Sequence, Tuple
+
+MAGICO = b"fgb\x03fgb\x00"
+
+TIPO_PONTO = 1
+
+# ColumnType do FlatGeobuf
+TIPOS_COLUNA = {
+    "long": 7,
+    "double": 10,
+    "string": 11,
+    "datetime": 13,
+}
+
+
+class _Construtor:
+    """
+    Monta um buffer FlatBuffers da frente para trás.
+
+    Cada tabela é gravada com sua vtable logo antes dela; os filhos
+    (strings, vetores, subtabelas) vêm depois, de modo que os deslocamentos
+    são sempre positivos como exige o formato.
+    """
+
+    def __init__(self):
+        self.buf = bytearray(4)  # deslocamento da tabela raiz
+
+    def _alinhar(self, n: int, adiante: int = 0) -> None:
+        while (len(self.buf) + adiante) % n:
+            self.buf.append(0)
+
+    def string(self, texto: str) -> int:
+        dados = texto.encode("utf-8")
+        self._alinhar(4)
+        posicao = len(self.buf)
+        self.buf += struct.pack("<I", len(dados)) + dados + b"\x00"
+        return posicao
+
+    def vetor(self, formato: str, valores: Sequence) -> int:
+        tamanho = struct.calcsize("<" + formato)
+        # Os elementos (após o comprimento) ficam alinhados ao seu tamanho
+        self._alinhar(max(tamanho, 4), adiante=4)
+        posicao = len(self.buf)
+        self.buf += struct.pack(f"<I{len(valores)}{formato}", len(valores), *valores)
+        return posicao
+
+    def vetor_bytes(self, dados: bytes) -> int:
+        self._alinhar(4)
+        posicao = len(self.buf)
+        self.buf += struct.pack("<I", len(dados)) + dados
+        return posicao
+
+    def vetor_tabelas(self, construtores: Sequence[Callable[[], int]]) -> int:
+        self._alinhar(4)
+        posicao = len(self.buf)
+        self.buf += struct.pack("<I", len(construtores)) + bytes(4 * len(construtores))
+        for i, construir in enumerate(construtores):
+            campo = posicao + 4 + 4 * i
+            struct.pack_into("<I", self.buf, campo, construir() - campo)
+        return posicao
+
+    def tabela(self, campos: List[Tuple[int, str, Any]]) -> int:
+        """
+        Grava uma tabela.
+
+        Args:
+            campos: (índice do campo, formato struct ou "offset", valor); para
+                "offset" o valor é uma função que grava o filho e retorna sua posição
+        """
+        itens = sorted(
+            ((i, f, v, 4 if f == "offset" else struct.calcsize("<" + f)) for i, f, v in campos),
+            key=lambda item: -item[3]
+        )
+        relativos = []
+        fim = 4  # soffset para a vtable
+        for item in itens:
+            fim += -fim % item[3]
+            relativos.append(fim)
+            fim += item[3]
+
+        quantidade_campos = max((i for i, _, _ in campos), default=-1) + 1
+        entradas = [0] * quantidade_campos
+        for (indice, _, _, _), relativo in zip(itens, relativos):
+            entradas[indice] = relativo
+
+        self._alinhar(2)
+        posicao_vtable = len(self.buf)
+        self.buf += struct.pack(f"<HH{quantidade_campos}H", 4 + 2 * quantidade_campos, fim, *entradas)
+
+        self._alinhar(8)
+        posicao = len(self.buf)
+        self.buf += bytes(fim)
+        struct.pack_into("<i", self.buf, posicao, posicao - posicao_vtable)
+
+        filhos = []
+        for (indice, formato, valor, _), relativo in zip(itens, relativos):
+            if formato == "offset":
+                filhos.append((posicao + relativo, valor))
+            else:
+                struct.pack_into("<" + formato, self.buf, posicao + relativo, valor)
+        for campo, construir in filhos:
+            struct.pack_into("<I", self.buf, campo, construir() - campo)
+        return posicao
+
+    def finalizar(self, construir_raiz: Callable[[], int]) -> bytes:
+        struct.pack_into("<I", self.buf, 0, construir_raiz())
+        return bytes(self.buf)
+
+
+def _com_tamanho(dados: bytes) -> bytes:
+    return struct.pack("<I", len(dados)) + dados
+
+
+def codificar_cabecalho(nome: str, colunas: Sequence[Tuple[str, str]], quantidade: int = 0) -> bytes:
+    """
+    Cabeçalho de uma camada de pontos em WGS 84.
+
+    Args:
+        nome: Nome da camada
+        colunas: (nome, tipo) com tipos de ``TIPOS_COLUNA``
+        quantidade: Número de feições (0 se desconhecido)
+    """
+    c = _Construtor()
+
+    def _coluna(nome_coluna: str, tipo: str) -> Callable[[], int]:
+        return lambda: c.tabela([
+            (0, "offset", lambda: c.string(nome_coluna)),
+            (1, "B", TIPOS_COLUNA[tipo]),
+        ])
+
+    cabecalho = c.finalizar(lambda: c.tabela([
+        (0, "offset", lambda: c.string(nome)),
+        (2, "B", TIPO_PONTO),
+        (7, "offset", lambda: c.vetor_tabelas([_coluna(n, t) for n, t in colunas])),
+        (8, "Q", quantidade),
+        (9, "H", 0),  # sem índice espacial
+        (10, "offset", lambda: c.tabela([
+            (0, "offset", lambda: c.string("EPSG")),
+            (1, "i", 4326),
+        ])),
+    ]))
+    return _com_tamanho(cabecalho)
+
+
+def codificar_propriedades(colunas: Sequence[Tuple[str, str]], valores: Sequence[Any]) -> bytes:
+    """Propriedades no formato do FlatGeobuf: (índice uint16, valor) por coluna não nula."""
+    partes = []
+    for indice, ((_, tipo), valor) in enumerate(zip(colunas, valores)):
+        if valor is None:
+            continue
+        if tipo == "long":
+            partes.append(struct.pack("<Hq", indice, int(valor)))
+        elif tipo == "double":
+            partes.append(struct.pack("<Hd", indice, float(valor)))
+        else:
+            dados = str(valor).encode("utf-8")
+            partes.append(struct.pack("<HI", indice, len(dados)) + dados)
+    return b"".join(partes)
+
+
+def codificar_feicao(
+    lon: Optional[float],
+    lat: Optional[float],
+    colunas: Sequence[Tuple[str, str]],
+    valores: Sequence[Any]
+) -> bytes:
+    """Feição de ponto (geometria nula se faltar coordenada)."""
+    c = _Construtor()
+    campos = [(1, "offset", lambda: c.vetor_bytes(codificar_propriedades(colunas, valores)))]
+    if lon is not None and lat is not None:
+        campos.insert(0, (0, "offset", lambda: c.tabela([
+            (1, "offset", lambda: c.vetor("d", (lon, lat))),
+        ])))
+    return _com_tamanho(c.finalizar(lambda: c.tabela(campos)))
+
+
+def escrever(
+    arquivo: BinaryIO,
+    nome: str,
+    colunas: Sequence[Tuple[str, str]],
+    feicoes: Iterable[Tuple[Optional[float], Optional[float], Sequence[Any]]],
+    quantidade: int = 0
+) -> int:
+    """
+    Grava um FlatGeobuf completo em fluxo.
+
+    Args:
+        arquivo: Arquivo binário aberto para escrita
+        nome: Nome da camada
+        colunas: (nome, tipo) das propriedades
+        feicoes: (lon, lat, valores na ordem das colunas)
+        quantidade: Número de feições, se conhecido
+
+    Returns:
+        Quantidade de feições gravadas
+    """
+    arquivo.write(MAGICO)
+    arquivo.write(codificar_cabecalho(nome, colunas, quantidade))
+    gravadas = 0
+    for lon, lat, valores in feicoes:
+        arquivo.write(codificar_feicao(lon, lat, colunas, valores))
+        gravadas += 1
+    return gravadas
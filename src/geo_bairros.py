@@ -0,0 +1,437 @@
+"""
+Polígonos dos bairros: carga, simplificação em cache, identificação do
+bairro de um ponto e geração aproximada.
+
+O arquivo ``GEO_CONFIG["arquivo_bairros"]`` é o GeoJSON com os limites
+oficiais (uma feature por bairro, propriedade ``bairro``), obtido da
+prefeitura; ele não acompanha o repositório. Só ele é usado para identificar
+o bairro de um ponto: pontos fora dos polígonos ficam sem bairro (None).
+
+Sem os limites oficiais, o mapa de bairros pode exibir um substituto
+aproximado, gerado a partir das ocorrências existentes (células de Voronoi
+dos centróides de cada bairro, recortadas pelo limite do mapa) em
+``GEO_CONFIG["arquivo_aproximado"]``:
+
+    python geo_bairros.py --gerar
+
+Esse substituto cobre todo o recorte do mapa e serve apenas para
+visualização; ele nunca é usado para atribuir bairros.
+
+Para preencher, pelos limites oficiais, o bairro dos reportes gravados sem
+bairro (``--simular`` só conta os que seriam alterados):
+
+    python geo_bairros.py --reclassificar --simular
+    python geo_bairros.py --reclassificar
+    python geo_bairros.py --reclassificar --todos   # sobrescreve também os escolhidos
+"""
+import argparse
+import json
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import BAIRROS, GEO_CONFIG, MAP_CONFIG, PROCESSED_DATA_DIR
+
+_lock = threading.Lock()
+_cache_simplificados: Dict[float, Dict[str, Any]] = {}
+_versao_arquivo: Optional[int] = None
+_indice_poligonos: Tuple[Optional[int], Optional["IndicePoligonos"]] = (None, None)
+
+
+# ==================== CARGA ====================
+
+def _mtime_arquivo(caminho: Optional[Path] = None) -> Optional[int]:
+    try:
+        return Path(caminho or GEO_CONFIG["arquivo_bairros"]).stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def _arquivo_exibicao() -> Optional[Path]:
+    """Arquivo exibido no mapa: os limites oficiais ou, na falta deles, o substituto aproximado."""
+    for chave in ("arquivo_bairros", "arquivo_aproximado"):
+        if _mtime_arquivo(GEO_CONFIG[chave]) is not None:
+            return Path(GEO_CONFIG[chave])
+    return None
+
+
+def versao_poligonos() -> Optional[str]:
+    """Versão do arquivo exibido no mapa (nome e mtime), ou None sem arquivo; serve de chave de cache."""
+    arquivo = _arquivo_exibicao()
+    mtime = _mtime_arquivo(arquivo) if arquivo is not None else None
+    return None if mtime is None else f"{arquivo.stem}_{mtime}"
+
+
+def poligonos_disponiveis() -> bool:
+    """Indica se há polígonos de bairros para exibir (oficiais ou aproximados)."""
+    return _arquivo_exibicao() is not None
+
+
+def poligonos_aproximados() -> bool:
+    """Indica se o mapa exibe o substituto aproximado (sem limites oficiais)."""
+    arquivo = _arquivo_exibicao()
+    return arquivo is not None and arquivo == Path(GEO_CONFIG["arquivo_aproximado"])
+
+
+def carregar_geojson(caminho: Optional[Path] = None) -> Dict[str, Any]:
+    """Carrega um GeoJSON de bairros (padrão: os limites oficiais; coleção vazia se não existir)."""
+    caminho = Path(caminho or GEO_CONFIG["arquivo_bairros"])
+    if not caminho.exists():
+        return {"type": "FeatureCollection", "features": []}
+
+    try:
+        with open(caminho, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Erro ao carregar poligonos de bairros: {e}")
+        return {"type": "FeatureCollection", "features": []}
+
+
+# ==================== SIMPLIFICAÇÃO ====================
+
+def simplificar_anel(pontos: np.ndarray, tolerancia: float) -> np.ndarray:
+    """
+    Simplifica um anel (N x 2, fechado) com o algoritmo de Douglas-Peucker.
+    """
+    if tolerancia <= 0 or len(pontos) <= 4:
+        return pontos
+
+    manter = np.zeros(len(pontos), dtype=bool)
+    manter[0] = manter[-1] = True
+    pilha = [(0, len(pontos) - 1)]
+
+    while pilha:
+        inicio, fim = pilha.pop()
+        if fim - inicio < 2:
+            continue
+
+        a, b = pontos[inicio], pontos[fim]
+        trecho = pontos[inicio + 1:fim]
+        ab = b - a
+        comprimento = np.hypot(ab[0], ab[1])
+        if comprimento == 0:
+            distancias = np.hypot(trecho[:, 0] - a[0], trecho[:, 1] - a[1])
+        else:
+            distancias = np.abs(ab[0] * (trecho[:, 1] - a[1]) - ab[1] * (trecho[:, 0] - a[0])) / comprimento
+
+        i = int(np.argmax(distancias))
+        if distancias[i] > tolerancia:
+            meio = inicio + 1 + i
+            manter[meio] = True
+            pilha.append((inicio, meio))
+            pilha.append((meio, fim))
+
+    resultado = pontos[manter]
+    # Um anel precisa de pelo menos 4 posições (triângulo fechado)
+    return resultado if len(resultado) >= 4 else pontos
+
+
+def _simplificar_geometria(geometria: Dict[str, Any], tolerancia: float) -> Dict[str, Any]:
+    def anel(coords):
+        return np.round(simplificar_anel(np.asarray(coords, dtype=float), tolerancia), 6).tolist()
+
+    if geometria["type"] == "Polygon":
+        return {"type": "Polygon", "coordinates": [anel(r) for r in geometria["coordinates"]]}
+    if geometria["type"] == "MultiPolygon":
+        return {
+            "type": "MultiPolygon",
+            "coordinates": [[anel(r) for r in poligono] for poligono in geometria["coordinates"]]
+        }
+    return geometria
+
+
+def obter_geojson_simplificado(tolerancia: float) -> Dict[str, Any]:
+    """
+    Retorna os bairros simplificados na tolerância pedida.
+
+    A tolerância é arredondada para a mais próxima de ``GEO_CONFIG["tolerancias"]``.
+    Os resultados ficam em memória e em ``PROCESSED_DATA_DIR`` até o arquivo
+    original mudar.
+    """
+    global _versao_arquivo
+
+    tolerancia = min(GEO_CONFIG["tolerancias"], key=lambda t: abs(t - tolerancia))
+    arquivo = _arquivo_exibicao()
+    versao = versao_poligonos()
+
+    with _lock:
+        if versao != _versao_arquivo:
+            _cache_simplificados.clear()
+            _versao_arquivo = versao
+
+        if tolerancia in _cache_simplificados:
+            return _cache_simplificados[tolerancia]
+
+        caminho_cache = PROCESSED_DATA_DIR / f"bairros_simplificados_{versao}_{tolerancia:g}.geojson"
+        if versao is not None and caminho_cache.exists():
+            with open(caminho_cache, "r", encoding="utf-8") as f:
+                geojson = json.load(f)
+        else:
+            original = carregar_geojson(arquivo) if arquivo is not None else {"features": []}
+            geojson = {
+                "type": "FeatureCollection",
+                "features": [
+                    {
+                        "type": "Feature",
+                        "properties": dict(feature.get("properties") or {}),
+                        "geometry": _simplificar_geometria(feature["geometry"], tolerancia),
+                    }
+                    for feature in original.get("features", [])
+                ],
+            }
+            if versao is not None:
+                for antigo in PROCESSED_DATA_DIR.glob(f"bairros_simplificados_*_{tolerancia:g}.geojson"):
+                    antigo.unlink(missing_ok=True)
+                with open(caminho_cache, "w", encoding="utf-8") as f:
+                    json.dump(geojson, f, ensure_ascii=False)
+
+        _cache_simplificados[tolerancia] = geojson
+        return geojson
+
+
+def tolerancia_para_zoom(zoom: int) -> float:
+    """Escolhe a tolerância adequada (~1 pixel) para o nível de zoom."""
+    grau_por_pixel = 360.0 / (256 * 2 ** zoom)
+    candidatas = [t for t in GEO_CONFIG["tolerancias"] if t <= grau_por_pixel]
+    return max(candidatas) if candidatas else 0.0
+
+
+# ==================== PONTO EM POLÍGONO ====================
+
+class IndicePoligonos:
+    """
+    Localiza em qual polígono cada ponto está (teste par-ímpar de cruzamentos).
+
+    Uma grade regular sobre a extensão dos polígonos guarda, por célula, os
+    polígonos cuja caixa envolvente a toca; só esses são testados para os
+    pontos da célula. Buracos e multipolígonos são tratados pela regra
+    par-ímpar sobre todos os anéis da feature.
+    """
+
+    def __init__(self, geojson: Dict[str, Any], resolucao: int = 64):
+        self.nomes: List[str] = []
+        self._arestas: List[np.ndarray] = []
+        caixas = []
+
+        for feature in geojson.get("features", []):
+            geometria = feature.get("geometry") or {}
+            if geometria.get("type") == "Polygon":
+                aneis = geometria["coordinates"]
+            elif geometria.get("type") == "MultiPolygon":
+                aneis = [anel for poligono in geometria["coordinates"] for anel in poligono]
+            else:
+                continue
+            if (feature.get("properties") or {}).get("aproximado"):
+                # Polígonos aproximados cobrem o recorte inteiro: não identificam bairros
+                continue
+
+            segmentos = []
+            for anel in aneis:
+                pontos = np.asarray(anel, dtype=np.float64)[:, :2]
+                segmentos.append(np.hstack([pontos, np.roll(pontos, -1, axis=0)]))
+            arestas = np.vstack(segmentos)
+
+            self.nomes.append((feature.get("properties") or {}).get("bairro", ""))
+            self._arestas.append(arestas)
+            caixas.append([arestas[:, 0].min(), arestas[:, 1].min(), arestas[:, 0].max(), arestas[:, 1].max()])
+
+        self._caixas = np.array(caixas, dtype=np.float64).reshape(-1, 4)
+        self._resolucao = resolucao
+
+        if len(self._caixas):
+            self._origem = self._caixas[:, :2].min(axis=0)
+            extensao = self._caixas[:, 2:].max(axis=0) - self._origem
+            self._passo = np.where(extensao > 0, extensao / resolucao, 1.0)
+
+            # Intervalo de células tocado por cada caixa envolvente
+            c0 = np.floor((self._caixas[:, :2] - self._origem) / self._passo).astype(int)
+            c1 = np.floor((self._caixas[:, 2:] - self._origem) / self._passo).astype(int)
+            c0, c1 = np.clip(c0, 0, resolucao - 1), np.clip(c1, 0, resolucao - 1)
+
+            self._grade = np.zeros((resolucao, resolucao, len(self._caixas)), dtype=bool)
+            for p, ((x0, y0), (x1, y1)) in enumerate(zip(c0, c1)):
+                self._grade[x0:x1 + 1, y0:y1 + 1, p] = True
+
+    def localizar(self, lat, lon) -> np.ndarray:
+        """
+        Retorna, para cada ponto, a posição do polígono que o contém (-1 se nenhum).
+        """
+        lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+        lon = np.atleast_1d(np.asarray(lon, dtype=np.float64))
+        resultado = np.full(len(lat), -1, dtype=np.int64)
+        if not len(self._caixas) or not len(lat):
+            return resultado
+
+        cx = np.floor((lon - self._origem[0]) / self._passo[0])
+        cy = np.floor((lat - self._origem[1]) / self._passo[1])
+        na_grade = (cx >= 0) & (cx < self._resolucao) & (cy >= 0) & (cy < self._resolucao)
+        cx = np.where(na_grade, cx, 0).astype(int)
+        cy = np.where(na_grade, cy, 0).astype(int)
+        candidatos_celula = self._grade[cx, cy]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for p, arestas in enumerate(self._arestas):
+                candidatos = np.flatnonzero(na_grade & (resultado < 0) & candidatos_celula[:, p])
+                if not len(candidatos):
+                    continue
+
+                px, py = lon[candidatos], lat[candidatos]
+                dentro = np.zeros(len(candidatos), dtype=bool)
+                for x1, y1, x2, y2 in arestas:
+                    cruza = ((y1 > py) != (y2 > py)) & (px < (x2 - x1) * (py - y1) / (y2 - y1) + x1)
+                    dentro ^= cruza
+
+                resultado[candidatos[dentro]] = p
+
+        return resultado
+
+
+def obter_indice_poligonos() -> "IndicePoligonos":
+    """Índice dos limites oficiais, recriado quando o arquivo muda (vazio sem eles)."""
+    global _indice_poligonos
+
+    versao = _mtime_arquivo()
+    with _lock:
+        versao_cache, indice = _indice_poligonos
+        if indice is None or versao_cache != versao:
+            indice = IndicePoligonos(carregar_geojson())
+            _indice_poligonos = (versao, indice)
+    return indice
+
+
+def atribuir_bairros(lat, lon) -> np.ndarray:
+    """
+    Identifica o bairro de muitos pontos de uma vez, pelos limites oficiais.
+
+    Returns:
+        Vetor de nomes de bairro (None para pontos fora dos polígonos ou
+        se os limites oficiais não estiverem disponíveis)
+    """
+    indice = obter_indice_poligonos()
+    posicoes = indice.localizar(lat, lon)
+    nomes = np.array(indice.nomes + [None], dtype=object)
+    return nomes[posicoes]
+
+
+def identificar_bairro(lat: float, lon: float) -> Optional[str]:
+    """Retorna o bairro que contém o ponto, ou None."""
+    try:
+        return atribuir_bairros([float(lat)], [float(lon)])[0]
+    except (TypeError, ValueError):
+        return None
+
+
+# ==================== GERAÇÃO APROXIMADA ====================
+
+def _recortar_semiplano(poligono: List[np.ndarray], normal: np.ndarray, limite: float) -> List[np.ndarray]:
+    """Sutherland-Hodgman: mantém a parte do polígono com normal·p <= limite."""
+    resultado = []
+    for i in range(len(poligono)):
+        atual, proximo = poligono[i], poligono[(i + 1) % len(poligono)]
+        d_atual = normal @ atual - limite
+        d_proximo = normal @ proximo - limite
+        if d_atual <= 0:
+            resultado.append(atual)
+        if (d_atual <= 0) != (d_proximo <= 0):
+            t = d_atual / (d_atual - d_proximo)
+            resultado.append(atual + t * (proximo - atual))
+    return resultado
+
+
+def gerar_poligonos_aproximados(df: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Gera polígonos aproximados dos bairros a partir das ocorrências.
+
+    Cada bairro com ocorrências vira a célula de Voronoi do seu centróide,
+    recortada pelo ``MAP_CONFIG["bbox"]``. Bairros sem ocorrências e "Outro"
+    ficam de fora. As features levam ``"aproximado": true`` e servem só
+    para visualização.
+    """
+    lat_min, lon_min, lat_max, lon_max = MAP_CONFIG["bbox"]
+    escala = np.cos(np.radians((lat_min + lat_max) / 2))
+
+    df = df.dropna(subset=["latitude", "longitude", "bairro"])
+    df = df[df["bairro"].isin([b for b in BAIRROS if b != "Outro"])]
+    centroides = df.groupby("bairro")[["longitude", "latitude"]].mean()
+
+    # Projeção local simples para que as distâncias sejam isotrópicas
+    sitios = centroides.to_numpy() * np.array([escala, 1.0])
+    caixa = [
+        np.array([lon_min * escala, lat_min]),
+        np.array([lon_max * escala, lat_min]),
+        np.array([lon_max * escala, lat_max]),
+        np.array([lon_min * escala, lat_max]),
+    ]
+
+    features = []
+    for i, bairro in enumerate(centroides.index):
+        poligono = list(caixa)
+        for j in range(len(sitios)):
+            if i == j or not poligono:
+                continue
+            normal = sitios[j] - sitios[i]
+            limite = normal @ ((sitios[i] + sitios[j]) / 2)
+            poligono = _recortar_semiplano(poligono, normal, limite)
+
+        if len(poligono) < 3:
+            continue
+
+        anel = np.array(poligono) / np.array([escala, 1.0])
+        anel = np.vstack([anel, anel[:1]])
+        features.append({
+            "type": "Feature",
+            "properties": {"bairro": bairro, "aproximado": True},
+            "geometry": {"type": "Polygon", "coordinates": [np.round(anel, 6).tolist()]},
+        })
+
+    return {"type": "FeatureCollection", "features": features}
+
+
+def salvar_geojson(geojson: Dict[str, Any], caminho: Optional[Path] = None) -> None:
+    """Grava um GeoJSON de bairros (padrão: o substituto aproximado)."""
+    caminho = Path(caminho or GEO_CONFIG["arquivo_aproximado"])
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump(geojson, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ferramentas dos poligonos de bairros.")
+    parser.add_argument(
+        "--gerar", action="store_true",
+        help="Gera poligonos aproximados (so para exibicao) a partir das ocorrencias"
+    )
+    parser.add_argument(
+        "--reclassificar", action="store_true",
+        help="Preenche pela localizacao o bairro dos reportes gravados sem bairro"
+    )
+    parser.add_argument(
+        "--todos", action="store_true",
+        help="Com --reclassificar, sobrescreve tambem os bairros escolhidos pelos usuarios"
+    )
+    parser.add_argument(
+        "--simular", action="store_true",
+        help="Com --reclassificar, so mostra quantos reportes seriam alterados"
+    )
+    args = parser.parse_args()
+
+    if args.gerar:
+        from data_manager import data_manager
+
+        geojson = gerar_poligonos_aproximados(data_manager.carregar_todas_ocorrencias())
+        salvar_geojson(geojson)
+        print(f"{len(geojson['features'])} bairros aproximados gravados em {GEO_CONFIG['arquivo_aproximado']}")
+
+    if args.reclassificar:
+        from data_manager import data_manager
+
+        if _mtime_arquivo() is None:
+            parser.error(f"limites oficiais nao encontrados em {GEO_CONFIG['arquivo_bairros']}")
+        alterados = data_manager.reclassificar_bairros(apenas_indefinidos=not args.todos, simular=args.simular)
+        if args.simular:
+            print(f"{alterados} reportes teriam o bairro alterado (nada foi gravado).")
+        else:
+            print(f"{alterados} reportes tiveram o bairro alterado.")
@@ -0,0 +1,273 @@
+"""
+Agrupamento incremental de reportes em incidentes.
+
+Reportes do mesmo tipo a até ``distancia_m`` metros e ``janela_dias`` dias
+um do outro descrevem o mesmo problema físico. Os vínculos são mantidos em
+uma estrutura união-busca (union-find): cada novo reporte consulta apenas as
+células vizinhas de uma grade espacial e é unido aos reportes compatíveis em
+tempo amortizado quase constante, sem reagrupar o conjunto inteiro.
+"""
+import math
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import INCIDENTES_CONFIG
+from data_manager import data_manager
+from indice_espacial import projetar
+
+
+class UniaoBusca:
+    """Conjuntos disjuntos com compressão de caminho e união por tamanho."""
+
+    def __init__(self):
+        self._pai: List[int] = []
+        self._tamanho: List[int] = []
+        self.quantidade_conjuntos = 0
+
+    def __len__(self) -> int:
+        return len(self._pai)
+
+    def adicionar(self) -> int:
+        """Cria um novo conjunto unitário e retorna seu elemento."""
+        elemento = len(self._pai)
+        self._pai.append(elemento)
+        self._tamanho.append(1)
+        self.quantidade_conjuntos += 1
+        return elemento
+
+    def encontrar(self, elemento: int) -> int:
+        """Retorna o representante do conjunto do elemento."""
+        pai = self._pai
+        while pai[elemento] != elemento:
+            # Compressão por divisão de caminho (path halving)
+            pai[elemento] = pai[pai[elemento]]
+            elemento = pai[elemento]
+        return elemento
+
+    def unir(self, a: int, b: int) -> int:
+        """Une os conjuntos de a e b e retorna o novo representante."""
+        raiz_a, raiz_b = self.encontrar(a), self.encontrar(b)
+        if raiz_a == raiz_b:
+            return raiz_a
+        if self._tamanho[raiz_a] < self._tamanho[raiz_b]:
+            raiz_a, raiz_b = raiz_b, raiz_a
+        self._pai[raiz_b] = raiz_a
+        self._tamanho[raiz_a] += self._tamanho[raiz_b]
+        self.quantidade_conjuntos -= 1
+        return raiz_a
+
+    def tamanho(self, elemento: int) -> int:
+        """Quantidade de elementos no conjunto do elemento."""
+        return self._tamanho[self.encontrar(elemento)]
+
+
+class AgrupadorIncidentes:
+    """Vincula reportes próximos no espaço e no tempo e do mesmo tipo."""
+
+    def __init__(self, distancia_m: float, janela_dias: float):
+        self.distancia_m = float(distancia_m)
+        self.janela_s = float(janela_dias) * 86400.0
+
+        self._uniao = UniaoBusca()
+        self._x: List[float] = []
+        self._y: List[float] = []
+        self._t: List[Optional[float]] = []
+        self._posicoes: Dict[str, int] = {}
+        self._grade: Dict[Tuple[Any, int, int], List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._uniao)
+
+    @property
+    def quantidade_incidentes(self) -> int:
+        return self._uniao.quantidade_conjuntos
+
+    def adicionar(self, id_ocorrencia: str, tipo: Any, lat: float, lon: float, data=None) -> int:
+        """
+        Insere um reporte e o une aos reportes compatíveis já inseridos.
+
+        Returns:
+            Representante do incidente do reporte
+        """
+        t = None
+        if data is not None and not pd.isna(data):
+            t = pd.Timestamp(data).timestamp()
+
+        try:
+            lat, lon = float(lat), float(lon)
+        except (TypeError, ValueError):
+            lat = lon = float("nan")
+        x, y = projetar(lat, lon)
+
+        return self._inserir(id_ocorrencia, tipo, float(x), float(y), t)
+
+    def _inserir(self, id_ocorrencia: Any, tipo: Any, x: float, y: float, t: Optional[float]) -> int:
+        elemento = self._uniao.adicionar()
+        self._posicoes[str(id_ocorrencia)] = elemento
+        self._x.append(x)
+        self._y.append(y)
+        self._t.append(t)
+
+        # Sem coordenadas o reporte forma um incidente isolado
+        if math.isnan(x) or math.isnan(y):
+            return elemento
+
+        cx, cy = int(x // self.distancia_m), int(y // self.distancia_m)
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for outro in self._grade.get((tipo, cx + dx, cy + dy), ()):
+                    if math.hypot(self._x[outro] - x, self._y[outro] - y) > self.distancia_m:
+                        continue
+                    t_outro = self._t[outro]
+                    if t is not None and t_outro is not None and abs(t - t_outro) > self.janela_s:
+                        continue
+                    self._uniao.unir(elemento, outro)
+
+        self._grade.setdefault((tipo, cx, cy), []).append(elemento)
+        return self._uniao.encontrar(elemento)
+
+    def adicionar_registro(self, registro: Dict[str, Any]) -> int:
+        """Insere um reporte a partir de um dicionário no formato armazenado."""
+        return self.adicionar(
+            registro.get("id"),
+            registro.get("tipo"),
+            registro.get("latitude"),
+            registro.get("longitude"),
+            registro.get("data", registro.get("data_envio"))
+        )
+
+    def incidente_de(self, id_ocorrencia: str) -> Optional[int]:
+        """Representante do incidente de um reporte (None se desconhecido)."""
+        elemento = self._posicoes.get(str(id_ocorrencia))
+        return None if elemento is None else self._uniao.encontrar(elemento)
+
+    def rotular(self, ids) -> np.ndarray:
+        """Representante do incidente de cada id (-1 para ids desconhecidos)."""
+        rotulos = np.empty(len(ids), dtype=np.int64)
+        for i, id_ocorrencia in enumerate(ids):
+            elemento = self._posicoes.get(str(id_ocorrencia))
+            rotulos[i] = -1 if elemento is None else self._uniao.encontrar(elemento)
+        return rotulos
+
+    @classmethod
+    def de_dataframe(cls, df: pd.DataFrame, distancia_m: float, janela_dias: float) -> "AgrupadorIncidentes":
+        """Constrói o agrupador inserindo os reportes em ordem cronológica."""
+        agrupador = cls(distancia_m, janela_dias)
+        if df.empty:
+            return agrupador
+
+        if "data" in df.columns:
+            df = df.sort_values("data", kind="stable", na_position="last")
+            datas = pd.to_datetime(df["data"], errors="coerce")
+            segundos = (datas - pd.Timestamp(0)) // pd.Timedelta(seconds=1)
+            tempos = [None if pd.isna(v) else float(v) for v in segundos]
+        else:
+            tempos = [None] * len(df)
+
+        # Projeção vetorizada; a inserção em si é incremental
+        lat = pd.to_numeric(df.get("latitude"), errors="coerce").to_numpy(dtype=float)
+        lon = pd.to_numeric(df.get("longitude"), errors="coerce").to_numpy(dtype=float)
+        xs, ys = projetar(lat, lon)
+
+        ids = df["id"].tolist() if "id" in df.columns else list(range(len(df)))
+        tipos = df["tipo"].tolist() if "tipo" in df.columns else [None] * len(df)
+        for id_ocorrencia, tipo, x, y, t in zip(ids, tipos, xs.tolist(), ys.tolist(), tempos):
+            agrupador._inserir(id_ocorrencia, tipo, x, y, t)
+        return agrupador
+
+
+# ==================== AGRUPADOR COMPARTILHADO ====================
+
+_lock = threading.Lock()
+_estado: Dict[str, Any] = {"versao": None, "agrupador": None}
+
+
+def _agrupador_atual(versao: Optional[str]) -> AgrupadorIncidentes:
+    """Agrupador da versão informada, reconstruído se preciso (chamar com ``_lock``)."""
+    if _estado["agrupador"] is None or _estado["versao"] != versao:
+        _estado["agrupador"] = AgrupadorIncidentes.de_dataframe(
+            data_manager.carregar_todas_ocorrencias(),
+            INCIDENTES_CONFIG["distancia_m"],
+            INCIDENTES_CONFIG["janela_dias"]
+        )
+        _estado["versao"] = versao
+    return _estado["agrupador"]
+
+
+def obter_agrupador() -> AgrupadorIncidentes:
+    """
+    Retorna o agrupador das ocorrências atuais, compartilhado entre sessões.
+
+    Escritas feitas pelo DataManager são aplicadas de forma incremental; o
+    agrupador só é reconstruído se os dados mudarem por outro caminho. Os
+    observadores alteram o agrupador sob ``_lock``: consultas que percorrem
+    a união-busca devem usar ``rotular_incidentes``, que segura a trava.
+    """
+    versao = data_manager.obter_versao()
+    with _lock:
+        return _agrupador_atual(versao)
+
+
+def rotular_incidentes(df: pd.DataFrame) -> np.ndarray:
+    """Rótulo de incidente de cada linha do DataFrame."""
+    if df.empty or "id" not in df.columns:
+        return np.empty(0, dtype=np.int64)
+    ids = df["id"].tolist()
+    versao = data_manager.obter_versao()
+    # encontrar() comprime caminhos, então até a leitura altera o estado
+    with _lock:
+        return _agrupador_atual(versao).rotular(ids)
+
+
+def contar_incidentes(df: pd.DataFrame) -> int:
+    """Quantidade de incidentes distintos entre as ocorrências do DataFrame."""
+    return int(len(np.unique(rotular_incidentes(df))))
+
+
+def representantes_incidentes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Reduz o DataFrame a uma linha por incidente.
+
+    Fica o reporte mais apoiado de cada incidente, com a coluna
+    "reportes_incidente" indicando quantos reportes ele reúne.
+    """
+    if df.empty:
+        return df.assign(reportes_incidente=pd.Series(dtype=int))
+
+    rotulos = rotular_incidentes(df)
+    if "votos" in df.columns:
+        votos = pd.to_numeric(df["votos"], errors="coerce").fillna(0).to_numpy()
+    else:
+        votos = np.zeros(len(df))
+    auxiliar = pd.DataFrame({"incidente": rotulos, "votos": votos}, index=df.index)
+
+    contagem = auxiliar.groupby("incidente")["incidente"].transform("size")
+    ordem = auxiliar.sort_values("votos", ascending=False, kind="stable")
+    principais = ordem.drop_duplicates("incidente").index
+
+    return df.loc[principais].assign(reportes_incidente=contagem.loc[principais].to_numpy())
+
+
+def _ao_alterar_dados(evento: str, ocorrencia: Dict, anterior: Optional[Dict]) -> None:
+    """Observador do DataManager: mantém o agrupador atualizado sem reconstruí-lo."""
+    with _lock:
+        agrupador = _estado["agrupador"]
+        if agrupador is None or _estado["versao"] != data_manager.versao_antes_da_escrita:
+            return
+
+        if evento == "adicionada":
+            agrupador.adicionar_registro(ocorrencia)
+        elif evento == "atualizada" and anterior and any(
+            anterior.get(campo) != ocorrencia.get(campo) for campo in ("tipo", "latitude", "longitude")
+        ):
+            # Vínculos desfeitos exigem reconstrução (união-busca não separa conjuntos)
+            _estado["versao"] = None
+            return
+
+        _estado["versao"] = data_manager.versao_depois_da_escrita
+
+
+data_manager.registrar_observador(_ao_alterar_dados)
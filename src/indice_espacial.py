@@ -0,0 +1,239 @@
+"""
+Índice espacial em grade para consultas de vizinhança entre ocorrências.
+
+Os pontos são projetados em metros (projeção equiretangular local, precisa
+na escala de uma cidade), agrupados em células quadradas e ordenados pela
+chave da célula. Uma consulta por raio visita apenas as células vizinhas,
+cada coluna de células resolvida com duas buscas binárias.
+"""
+import math
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import DUPLICADOS_CONFIG, MAP_CONFIG
+from data_manager import data_manager
+
+RAIO_TERRA_M = 6_371_000.0
+
+# Deslocamento que mantém as linhas de células positivas na chave combinada
+_DESLOCAMENTO_LINHA = 1 << 31
+
+
+def _escala_lon(lat_referencia: Optional[float]) -> float:
+    return math.cos(math.radians(MAP_CONFIG["center_lat"] if lat_referencia is None else lat_referencia))
+
+
+def projetar(lat, lon, lat_referencia: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Converte lat/lon em metros no plano local (projeção equiretangular).
+
+    A referência padrão é o centro do mapa; todos os módulos que comparam
+    distâncias ou células em metros usam esta mesma projeção.
+    """
+    x = np.radians(np.asarray(lon, dtype=np.float64)) * RAIO_TERRA_M * _escala_lon(lat_referencia)
+    y = np.radians(np.asarray(lat, dtype=np.float64)) * RAIO_TERRA_M
+    return x, y
+
+
+def celula(x, y, tamanho_m: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Coluna e linha da célula de lado ``tamanho_m`` que contém cada ponto projetado."""
+    return (
+        np.floor(np.asarray(x) / tamanho_m).astype(np.int64),
+        np.floor(np.asarray(y) / tamanho_m).astype(np.int64),
+    )
+
+
+def chave_celula(cx, cy):
+    """Chave inteira única de cada célula, crescente por coluna e depois por linha."""
+    return (np.asarray(cx, dtype=np.int64) << 32) + (np.asarray(cy, dtype=np.int64) + _DESLOCAMENTO_LINHA)
+
+
+def limites_celula(chaves, tamanho_m: float, lat_referencia: Optional[float] = None) -> Dict[str, np.ndarray]:
+    """Limites em lat/lon (lat_min, lon_min, lat_max, lon_max) das células de ``chave_celula``."""
+    chaves = np.asarray(chaves, dtype=np.int64)
+    x0 = (chaves >> 32) * tamanho_m
+    y0 = ((chaves & 0xFFFFFFFF) - _DESLOCAMENTO_LINHA) * tamanho_m
+    metros_por_grau_lon = math.radians(1) * RAIO_TERRA_M * _escala_lon(lat_referencia)
+    metros_por_grau_lat = math.radians(1) * RAIO_TERRA_M
+    return {
+        "lat_min": y0 / metros_por_grau_lat,
+        "lon_min": x0 / metros_por_grau_lon,
+        "lat_max": (y0 + tamanho_m) / metros_por_grau_lat,
+        "lon_max": (x0 + tamanho_m) / metros_por_grau_lon,
+    }
+
+
+class IndiceEspacial:
+    """Grade uniforme sobre coordenadas em metros com busca por raio e k vizinhos."""
+
+    def __init__(self, lat, lon, tamanho_celula_m: float = 100.0, lat_referencia: Optional[float] = None):
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+
+        self.tamanho_celula = float(tamanho_celula_m)
+        self.lat_referencia = MAP_CONFIG["center_lat"] if lat_referencia is None else lat_referencia
+
+        self.x, self.y = self.projetar(lat, lon)
+        validos = ~(np.isnan(self.x) | np.isnan(self.y))
+
+        chaves = chave_celula(*self._celula(self.x[validos], self.y[validos]))
+        ordem = np.argsort(chaves, kind="stable")
+
+        # Posições originais dos pontos válidos, na ordem das células
+        self._indices = np.flatnonzero(validos)[ordem]
+        self._chaves = chaves[ordem]
+
+    def __len__(self) -> int:
+        return len(self._indices)
+
+    def projetar(self, lat, lon) -> Tuple[np.ndarray, np.ndarray]:
+        """Converte lat/lon em metros no plano local."""
+        return projetar(lat, lon, self.lat_referencia)
+
+    def _celula(self, x, y) -> Tuple[np.ndarray, np.ndarray]:
+        return celula(x, y, self.tamanho_celula)
+
+    def candidatos(self, lat: float, lon: float, raio_m: float) -> np.ndarray:
+        """Índices dos pontos nas células que cobrem o círculo de busca."""
+        x, y = self.projetar(lat, lon)
+        cx, cy = self._celula(x, y)
+        alcance = int(math.ceil(raio_m / self.tamanho_celula))
+
+        colunas = np.arange(cx - alcance, cx + alcance + 1)
+        inicios = np.searchsorted(self._chaves, chave_celula(colunas, cy - alcance), side="left")
+        fins = np.searchsorted(self._chaves, chave_celula(colunas, cy + alcance), side="right")
+
+        fatias = [self._indices[i:f] for i, f in zip(inicios, fins) if f > i]
+        return np.concatenate(fatias) if fatias else np.empty(0, dtype=np.int64)
+
+    def vizinhos(
+        self,
+        lat: float,
+        lon: float,
+        raio_m: float,
+        k: Optional[int] = None,
+        mascara: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Retorna os pontos a até ``raio_m`` metros, do mais próximo ao mais distante.
+
+        Args:
+            lat, lon: Centro da busca
+            raio_m: Raio máximo em metros
+            k: Quantidade máxima de vizinhos (todos se None)
+            mascara: Vetor booleano (por posição original) de pontos elegíveis
+
+        Returns:
+            Tupla (índices originais, distâncias em metros)
+        """
+        idx = self.candidatos(lat, lon, raio_m)
+        if mascara is not None and len(idx):
+            idx = idx[mascara[idx]]
+
+        x, y = self.projetar(lat, lon)
+        distancias = np.hypot(self.x[idx] - x, self.y[idx] - y)
+        dentro = distancias <= raio_m
+        idx, distancias = idx[dentro], distancias[dentro]
+
+        if k is not None and len(idx) > k:
+            parcial = np.argpartition(distancias, k - 1)[:k]
+            idx, distancias = idx[parcial], distancias[parcial]
+
+        ordem = np.argsort(distancias, kind="stable")
+        return idx[ordem], distancias[ordem]
+
+
+# ==================== ÍNDICE DAS OCORRÊNCIAS ====================
+
+_lock = threading.Lock()
+# (versão dos dados, índice): o índice vale para as posições das linhas do
+# snapshot dessa versão
+_cache_indice: Tuple[Optional[str], Optional[IndiceEspacial]] = (None, None)
+
+
+def obter_indice_ocorrencias() -> Tuple[pd.DataFrame, IndiceEspacial]:
+    """
+    Retorna o DataFrame de ocorrências e seu índice espacial.
+
+    O índice é compartilhado por todas as sessões do processo. Escritas que
+    não movem nenhum ponto (votos, comentários, mudanças de status...) só
+    avançam a versão do índice; ele é reconstruído quando um ponto é
+    adicionado ou movido, ou quando os dados mudam por outro caminho.
+    """
+    global _cache_indice
+
+    versao = data_manager.obter_versao()
+    df = data_manager.carregar_todas_ocorrencias()
+    with _lock:
+        versao_cache, indice = _cache_indice
+        if versao_cache != versao or indice is None:
+            if df.empty or "latitude" not in df.columns:
+                lat = lon = np.empty(0)
+            else:
+                lat = pd.to_numeric(df["latitude"], errors="coerce").to_numpy()
+                lon = pd.to_numeric(df["longitude"], errors="coerce").to_numpy()
+            indice = IndiceEspacial(lat, lon, DUPLICADOS_CONFIG["celula_m"])
+            _cache_indice = (versao, indice)
+    return df, indice
+
+
+def _ao_alterar_dados(evento: str, ocorrencia: Dict, anterior: Optional[Dict]) -> None:
+    """Observador do DataManager: mantém o índice se nenhum ponto mudou de lugar."""
+    global _cache_indice
+
+    with _lock:
+        versao_cache, indice = _cache_indice
+        if indice is None or versao_cache != data_manager.versao_antes_da_escrita:
+            return
+
+        # Alterações trocam a linha na mesma posição do snapshot; novas vão para o fim
+        move_ponto = evento == "adicionada" or (
+            evento == "atualizada" and (anterior is None or any(
+                anterior.get(campo) != ocorrencia.get(campo) for campo in ("latitude", "longitude")
+            ))
+        )
+        _cache_indice = (None if move_ponto else data_manager.versao_depois_da_escrita, indice)
+
+
+def buscar_ocorrencias_proximas(
+    lat: float,
+    lon: float,
+    tipo: Optional[str] = None,
+    raio_m: Optional[float] = None,
+    k: Optional[int] = None,
+    apenas_abertas: bool = True
+) -> pd.DataFrame:
+    """
+    Busca as ocorrências mais próximas de um ponto (possíveis duplicatas).
+
+    Args:
+        lat, lon: Ponto clicado no mapa
+        tipo: Se informado, considera apenas ocorrências do mesmo tipo
+        raio_m: Raio de busca (padrão do DUPLICADOS_CONFIG)
+        k: Máximo de resultados (padrão do DUPLICADOS_CONFIG)
+        apenas_abertas: Ignora ocorrências resolvidas ou arquivadas
+
+    Returns:
+        DataFrame das ocorrências encontradas com a coluna "distancia_m"
+    """
+    raio_m = DUPLICADOS_CONFIG["raio_m"] if raio_m is None else raio_m
+    k = DUPLICADOS_CONFIG["max_sugestoes"] if k is None else k
+
+    df, indice = obter_indice_ocorrencias()
+    if df.empty or len(indice) == 0:
+        return df.assign(distancia_m=pd.Series(dtype=float))
+
+    mascara = np.ones(len(df), dtype=bool)
+    if tipo is not None and "tipo" in df.columns:
+        mascara &= (df["tipo"] == tipo).to_numpy()
+    if apenas_abertas and "status" in df.columns:
+        mascara &= df["status"].isin(DUPLICADOS_CONFIG["status_abertos"]).to_numpy()
+
+    idx, distancias = indice.vizinhos(lat, lon, raio_m, k=k, mascara=mascara)
+    return df.iloc[idx].assign(distancia_m=distancias)
+
+
+data_manager.registrar_observador(_ao_alterar_dados)
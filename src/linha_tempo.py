@@ -0,0 +1,90 @@
+"""
+Agregação adaptativa da linha do tempo.
+
+A resolução (dia, semana, mês, trimestre ou ano) é escolhida pelo tamanho do
+intervalo exibido, de modo que o gráfico nunca passe de
+``TIMELINE_CONFIG["max_pontos"]`` pontos. As contagens de cada intervalo saem
+de duas buscas binárias sobre datas ordenadas e de uma soma acumulada,
+sem percorrer as ocorrências uma a uma.
+"""
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import TIMELINE_CONFIG
+
+# Resolução -> (frequência de período do pandas, nome exibido, dias aproximados)
+RESOLUCOES = {
+    "dia": ("D", "Dia", 1),
+    "semana": ("W", "Semana", 7),
+    "mes": ("M", "Mês", 30.44),
+    "trimestre": ("Q", "Trimestre", 91.3),
+    "ano": ("Y", "Ano", 365.25),
+}
+
+
+def escolher_resolucao(inicio, fim, max_pontos: Optional[int] = None) -> str:
+    """Resolução mais fina que cabe em ``max_pontos`` pontos no intervalo."""
+    max_pontos = TIMELINE_CONFIG["max_pontos"] if max_pontos is None else max_pontos
+    dias = (pd.Timestamp(fim) - pd.Timestamp(inicio)).days + 1
+    for resolucao, (_, _, dias_por_ponto) in RESOLUCOES.items():
+        if dias / dias_por_ponto <= max_pontos:
+            return resolucao
+    return "ano"
+
+
+def intervalo_do_balde(data, resolucao: str) -> Tuple[pd.Timestamp, pd.Timestamp]:
+    """Primeiro e último dia do intervalo da resolução que contém a data."""
+    periodo = pd.Timestamp(data).to_period(RESOLUCOES[resolucao][0])
+    return periodo.start_time.normalize(), periodo.end_time.normalize()
+
+
+def agregar(
+    datas,
+    valores=None,
+    inicio=None,
+    fim=None,
+    resolucao: Optional[str] = None,
+    max_pontos: Optional[int] = None
+) -> Tuple[pd.DataFrame, str]:
+    """
+    Conta ocorrências por intervalo de tempo.
+
+    Args:
+        datas: Datas em ordem crescente (dias de uma série diária ou
+            timestamps individuais)
+        valores: Peso de cada data (1 por data se None)
+        inicio, fim: Intervalo exibido (padrão: primeira e última data)
+        resolucao: Força uma resolução em vez de escolhê-la pelo intervalo
+        max_pontos: Limite de pontos (padrão do TIMELINE_CONFIG)
+
+    Returns:
+        Tupla (DataFrame com "inicio", "fim" e "quantidade", resolução usada)
+    """
+    datas = pd.DatetimeIndex(datas)
+    if len(datas) == 0:
+        return pd.DataFrame({"inicio": [], "fim": [], "quantidade": []}), resolucao or "dia"
+
+    inicio = datas[0] if inicio is None else pd.Timestamp(inicio)
+    fim = datas[-1] if fim is None else pd.Timestamp(fim)
+    resolucao = resolucao or escolher_resolucao(inicio, fim, max_pontos)
+
+    periodos = pd.period_range(inicio, fim, freq=RESOLUCOES[resolucao][0])
+    inicios = periodos.start_time.normalize()
+    fins = periodos.end_time.normalize()
+
+    valores = np.ones(len(datas), dtype=np.int64) if valores is None else np.asarray(valores, dtype=np.int64)
+    acumulado = np.concatenate([[0], np.cumsum(valores)])
+
+    # O primeiro e o último intervalo são recortados ao intervalo exibido
+    limites_a = inicios.where(inicios > inicio.normalize(), inicio.normalize())
+    limites_b = fins.where(fins < fim.normalize(), fim.normalize()) + pd.Timedelta(days=1)
+    a = datas.searchsorted(limites_a, side="left")
+    b = datas.searchsorted(limites_b, side="left")
+
+    return pd.DataFrame({
+        "inicio": inicios,
+        "fim": fins,
+        "quantidade": acumulado[b] - acumulado[a],
+    }), resolucao
@@ -1,53 +1,66 @@
 """
 Utilitários para criação e manipulação de mapas com Folium.
 """
+import copy
+import json
+import threading
 import folium
 from folium import plugins
+from branca.colormap import LinearColormap
 import pandas as pd
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Callable, Hashable, Tuple
 
-from config import MAP_CONFIG, TIPOS_OCORRENCIA, STATUS_OCORRENCIA
+from config import MAP_CONFIG, TIPOS_OCORRENCIA, STATUS_OCORRENCIA, CACHE_CONFIG, TILES_BASE_CONFIG
+from cache_utils import CacheLRU
+from ocorrencia import Ocorrencia
+from servidor_tiles import iniciar_servidor
+from tiles_base import modo_local
 
 
-def criar_mapa_base(
-    center_lat: Optional[float] = None,
-    center_lon: Optional[float] = None,
-    zoom: int = None
-) -> folium.Map:
+# Cache de mapas prontos (objeto + HTML), compartilhado entre sessões
+_cache_mapas = CacheLRU(max_bytes=CACHE_CONFIG["mapas_max_bytes"])
+
+
+def criar_camada_base(estilo: str, **kwargs) -> folium.TileLayer:
     """
-    Cria um mapa base configurado com tiles e controles.
+    Cria a camada de tiles de fundo de um estilo do TILES_BASE_CONFIG.
+    
+    Em modo local a camada aponta para o cache de tiles servido pelo
+    servidor de tiles; caso contrário (ou se o servidor não tiver URL
+    pública configurada) usa o provedor original.
     """
-    lat = center_lat or MAP_CONFIG["center_lat"]
-    lon = center_lon or MAP_CONFIG["center_lon"]
-    zoom_level = zoom or MAP_CONFIG["zoom_start"]
+    config_estilo = TILES_BASE_CONFIG["estilos"][estilo]
     
+    url_servidor = iniciar_servidor() if modo_local() else None
+    if url_servidor:
+        url = url_servidor + f"/base/{estilo}/{{z}}/{{x}}/{{y}}.png"
+        return folium.TileLayer(tiles=url, attr=config_estilo["attr"], **kwargs)
+    if modo_local():
+        print("Tiles de fundo locais indisponiveis (MAPA_TILES_URL nao configurada); usando o provedor online")
+    
+    return folium.TileLayer(
+        tiles=config_estilo["provedor"],
+        attr=config_estilo["attr"],
+        **kwargs
+    )
+
+
+def _construir_template_padrao() -> folium.Map:
+    """
+    Monta o esqueleto do mapa base: tiles, controle de camadas e plugins.
+    """
     # Criar mapa com tile customizado
     mapa = folium.Map(
-        location=[lat, lon],
-        zoom_start=zoom_level,
+        location=[MAP_CONFIG["center_lat"], MAP_CONFIG["center_lon"]],
+        zoom_start=MAP_CONFIG["zoom_start"],
         min_zoom=MAP_CONFIG["min_zoom"],
         max_zoom=MAP_CONFIG["max_zoom"],
         tiles=None
     )
     
     # Adicionar múltiplos tiles
-    folium.TileLayer(
-        tiles="CartoDB positron",
-        name="Claro",
-        attr="CartoDB"
-    ).add_to(mapa)
-    
-    folium.TileLayer(
-        tiles="CartoDB dark_matter",
-        name="Escuro",
-        attr="CartoDB"
-    ).add_to(mapa)
-    
-    folium.TileLayer(
-        tiles="OpenStreetMap",
-        name="Padrão",
-        attr="OpenStreetMap"
-    ).add_to(mapa)
+    for estilo, config_estilo in TILES_BASE_CONFIG["estilos"].items():
+        criar_camada_base(estilo, name=config_estilo["nome"]).add_to(mapa)
     
     # Adicionar controle de camadas
     folium.LayerControl(position="topright").add_to(mapa)
@@ -68,6 +81,106 @@ def criar_mapa_base(
     return mapa
 
 
+def _construir_template_calor() -> folium.Map:
+    """
+    Monta o esqueleto do mapa de calor (tile escuro e tela cheia).
+    """
+    # Mapa simples com tile escuro para melhor visualizacao do heatmap
+    mapa = folium.Map(
+        location=[MAP_CONFIG["center_lat"], MAP_CONFIG["center_lon"]],
+        zoom_start=MAP_CONFIG["zoom_start"],
+        tiles=None
+    )
+    criar_camada_base("escuro").add_to(mapa)
+    
+    # Adicionar controle de tela cheia
+    plugins.Fullscreen(
+        position="topleft",
+        title="Tela Cheia",
+        title_cancel="Sair"
+    ).add_to(mapa)
+    
+    return mapa
+
+
+def _construir_template_seletor() -> folium.Map:
+    """
+    Monta o esqueleto do mapa de seleção de localização.
+    """
+    mapa = _construir_template_padrao()
+    
+    # Adicionar popup de lat/lng ao clicar
+    mapa.add_child(folium.LatLngPopup())
+    
+    # Adicionar instruções
+    folium.Marker(
+        location=[MAP_CONFIG["center_lat"], MAP_CONFIG["center_lon"]],
+        popup="Clique no mapa para selecionar a localização",
+        icon=folium.Icon(color="gray", icon="info", prefix="fa")
+    ).add_to(mapa)
+    
+    return mapa
+
+
+_CONSTRUTORES_TEMPLATE: Dict[str, Callable[[], folium.Map]] = {
+    "padrao": _construir_template_padrao,
+    "calor": _construir_template_calor,
+    "seletor": _construir_template_seletor,
+}
+
+# Esqueletos montados uma única vez por processo
+_templates_mapa: Dict[str, folium.Map] = {}
+_lock_templates = threading.Lock()
+
+
+def instanciar_mapa(
+    modelo: str = "padrao",
+    center_lat: Optional[float] = None,
+    center_lon: Optional[float] = None,
+    zoom: Optional[int] = None
+) -> folium.Map:
+    """
+    Cria um mapa a partir de um esqueleto pré-montado.
+    
+    O esqueleto (tiles, controles e plugins) é construído na primeira
+    chamada e depois apenas copiado; cada instância difere somente no
+    centro, no zoom e nas camadas adicionadas em seguida.
+    
+    Args:
+        modelo: Nome do esqueleto ("padrao", "calor" ou "seletor")
+        center_lat: Latitude do centro (padrão do MAP_CONFIG)
+        center_lon: Longitude do centro (padrão do MAP_CONFIG)
+        zoom: Nível de zoom inicial (padrão do MAP_CONFIG)
+    """
+    template = _templates_mapa.get(modelo)
+    if template is None:
+        with _lock_templates:
+            template = _templates_mapa.get(modelo)
+            if template is None:
+                template = _CONSTRUTORES_TEMPLATE[modelo]()
+                _templates_mapa[modelo] = template
+    
+    mapa = copy.deepcopy(template)
+    mapa.location = [
+        center_lat or MAP_CONFIG["center_lat"],
+        center_lon or MAP_CONFIG["center_lon"]
+    ]
+    mapa.options["zoom"] = zoom or MAP_CONFIG["zoom_start"]
+    
+    return mapa
+
+
+def criar_mapa_base(
+    center_lat: Optional[float] = None,
+    center_lon: Optional[float] = None,
+    zoom: int = None
+) -> folium.Map:
+    """
+    Cria um mapa base configurado com tiles e controles.
+    """
+    return instanciar_mapa("padrao", center_lat, center_lon, zoom)
+
+
 def criar_icone_marcador(tipo: str, status: str = "Pendente") -> folium.Icon:
     """
     Cria um ícone personalizado baseado no tipo e status da ocorrência.
@@ -101,23 +214,24 @@ def criar_icone_marcador(tipo: str, status: str = "Pendente") -> folium.Icon:
     )
 
 
-def criar_popup_ocorrencia(row: pd.Series) -> folium.Popup:
+def criar_popup_ocorrencia(ocorrencia: Ocorrencia, reportes_incidente: int = 1) -> folium.Popup:
     """
     Cria um popup HTML formatado para uma ocorrência.
+    
+    Args:
+        reportes_incidente: Reportes do mesmo problema físico (ver incidentes.py)
     """
-    tipo = row.get("tipo", row.get("tipo_ocorrencia", "Não informado"))
-    descricao = row.get("descricao", "Sem descrição")
-    bairro = row.get("bairro", "Não informado")
-    data = row.get("data", "Não informada")
-    status = row.get("status", "Pendente")
-    prioridade = row.get("prioridade", "Media")
-    votos = row.get("votos", 0)
+    tipo = ocorrencia.tipo or "Não informado"
+    descricao = ocorrencia.descricao or "Sem descrição"
+    bairro = ocorrencia.bairro or "Não informado"
+    status = ocorrencia.status
+    prioridade = ocorrencia.prioridade
+    votos = ocorrencia.votos
+    texto_incidente = f" • 🔗 {reportes_incidente} reportes deste problema" if reportes_incidente > 1 else ""
     
     # Formatar data
-    if pd.notna(data) and hasattr(data, 'strftime'):
-        data_formatada = data.strftime("%d/%m/%Y")
-    else:
-        data_formatada = str(data) if pd.notna(data) else "Não informada"
+    data = ocorrencia.data_envio
+    data_formatada = data.strftime("%d/%m/%Y") if data else "Não informada"
     
     # Cores de status e prioridade
     status_config = STATUS_OCORRENCIA.get(status, {"cor": "#7f8c8d", "icone": "❓"})
@@ -159,7 +273,7 @@ def criar_popup_ocorrencia(row: pd.Series) -> folium.Popup:
         </div>
         
         <div style="margin-top: 10px; text-align: center; color: #7f8c8d; font-size: 11px;">
-            👍 {votos} apoios
+            👍 {votos} apoios{texto_incidente}
         </div>
     </div>
     """
@@ -198,21 +312,18 @@ def adicionar_marcadores(
         marker_cluster = folium.FeatureGroup(name="Ocorrências")
     
     # Adicionar cada marcador
-    for _, row in df.iterrows():
-        lat = row.get("latitude")
-        lon = row.get("longitude")
-        
-        if pd.isna(lat) or pd.isna(lon):
+    for linha in df.to_dict("records"):
+        ocorrencia = Ocorrencia.de_linha(linha)
+        if ocorrencia.latitude is None or ocorrencia.longitude is None:
             continue
         
-        tipo = row.get("tipo", row.get("tipo_ocorrencia", "Outro"))
-        status = row.get("status", "Pendente")
+        tipo = ocorrencia.tipo or "Outro"
         
         marcador = folium.Marker(
-            location=[lat, lon],
-            popup=criar_popup_ocorrencia(row),
-            tooltip=f"{tipo} - {row.get('bairro', 'Local não informado')}",
-            icon=criar_icone_marcador(tipo, status)
+            location=[ocorrencia.latitude, ocorrencia.longitude],
+            popup=criar_popup_ocorrencia(ocorrencia, int(linha.get("reportes_incidente", 1))),
+            tooltip=f"{tipo} - {ocorrencia.bairro or 'Local não informado'}",
+            icon=criar_icone_marcador(tipo, ocorrencia.status)
         )
         
         marcador.add_to(marker_cluster)
@@ -222,6 +333,163 @@ def adicionar_marcadores(
     return mapa
 
 
+def adicionar_camada_vetorial(
+    mapa: folium.Map,
+    url_tiles: str,
+    nome: str = "Ocorrências"
+) -> folium.Map:
+    """
+    Adiciona as ocorrências como tiles vetoriais (MVT) servidos localmente.
+    
+    O navegador busca apenas os tiles visíveis; cada ponto é colorido pelo
+    tipo da ocorrência.
+    
+    Args:
+        mapa: Mapa Folium base
+        url_tiles: URL no formato .../{z}/{x}/{y}.pbf
+        nome: Nome da camada no controle de camadas
+    """
+    cores = {tipo: cfg["cor"] for tipo, cfg in TIPOS_OCORRENCIA.items()}
+    
+    options = """{
+        "interactive": true,
+        "maxNativeZoom": %(max_zoom)d,
+        "vectorTileLayerStyles": {
+            "ocorrencias": function(props) {
+                var cores = %(cores)s;
+                var raio = props.quantidade > 1 ? Math.min(4 + Math.log(props.quantidade) * 2, 14) : 5;
+                return {
+                    "radius": raio,
+                    "fill": true,
+                    "fillColor": cores[props.tipo] || "#7f8c8d",
+                    "fillOpacity": 0.8,
+                    "color": "#ffffff",
+                    "weight": 1
+                };
+            }
+        }
+    }""" % {"cores": json.dumps(cores), "max_zoom": MAP_CONFIG["max_zoom"]}
+    
+    plugins.VectorGridProtobuf(url_tiles, nome, options).add_to(mapa)
+    
+    return mapa
+
+
+def adicionar_coropletico(
+    mapa: folium.Map,
+    geojson: Dict[str, Any],
+    contagens: Dict[str, int],
+    nome: str = "Ocorrências por Bairro"
+) -> folium.Map:
+    """
+    Adiciona uma camada de polígonos de bairros coloridos pela contagem.
+    
+    Args:
+        mapa: Mapa Folium base
+        geojson: FeatureCollection com a propriedade "bairro" em cada feature
+        contagens: Quantidade de ocorrências por bairro
+        nome: Nome da camada no controle de camadas
+    """
+    maximo = max(contagens.values(), default=0) or 1
+    escala = LinearColormap(
+        ["#ffffb2", "#fecc5c", "#fd8d3c", "#e31a1c"],
+        vmin=0,
+        vmax=maximo,
+        caption="Ocorrências por bairro"
+    )
+    
+    # Copiar as features para anexar a contagem sem alterar o cache
+    features = []
+    for feature in geojson.get("features", []):
+        bairro = feature.get("properties", {}).get("bairro", "")
+        features.append({
+            "type": "Feature",
+            "geometry": feature["geometry"],
+            "properties": {"bairro": bairro, "quantidade": int(contagens.get(bairro, 0))}
+        })
+    
+    folium.GeoJson(
+        {"type": "FeatureCollection", "features": features},
+        name=nome,
+        style_function=lambda f: {
+            "fillColor": escala(f["properties"]["quantidade"]),
+            "color": "#2c3e50",
+            "weight": 1,
+            "fillOpacity": 0.65
+        },
+        highlight_function=lambda f: {"weight": 3, "fillOpacity": 0.85},
+        tooltip=folium.GeoJsonTooltip(
+            fields=["bairro", "quantidade"],
+            aliases=["Bairro", "Ocorrências"]
+        )
+    ).add_to(mapa)
+    
+    escala.add_to(mapa)
+    
+    return mapa
+
+
+def adicionar_camada_urgencia(
+    mapa: folium.Map,
+    celulas: pd.DataFrame,
+    nome: str = "Índice de Urgência"
+) -> folium.Map:
+    """
+    Adiciona as células da grade de urgência coloridas pelo índice.
+    
+    Args:
+        mapa: Mapa Folium base
+        celulas: Resultado "celulas" de ``urgencia.calcular_urgencia``
+        nome: Nome da camada no controle de camadas
+    """
+    escala = LinearColormap(
+        ["#fff5eb", "#fdae6b", "#e6550d", "#7f2704"],
+        vmin=0,
+        vmax=100,
+        caption="Índice de urgência (%)"
+    )
+    
+    features = [
+        {
+            "type": "Feature",
+            "geometry": {
+                "type": "Polygon",
+                "coordinates": [[
+                    [c.lon_min, c.lat_min], [c.lon_max, c.lat_min],
+                    [c.lon_max, c.lat_max], [c.lon_min, c.lat_max],
+                    [c.lon_min, c.lat_min]
+                ]]
+            },
+            "properties": {
+                "indice": float(c.indice),
+                "quantidade": int(c.quantidade),
+                "carga": float(c.carga)
+            }
+        }
+        for c in celulas.itertuples(index=False)
+    ]
+    
+    folium.GeoJson(
+        {"type": "FeatureCollection", "features": features},
+        name=nome,
+        style_function=lambda f: {
+            "fillColor": escala(f["properties"]["indice"]),
+            "color": "#7f2704",
+            "weight": 0.5,
+            "fillOpacity": 0.6
+        },
+        highlight_function=lambda f: {"weight": 2, "fillOpacity": 0.85},
+        tooltip=folium.GeoJsonTooltip(
+            fields=["indice", "quantidade", "carga"],
+            aliases=["Índice (%)", "Ocorrências abertas", "Carga"]
+        )
+    ).add_to(mapa)
+    
+    escala.add_to(mapa)
+    
+    return mapa
+
+
 def criar_mapa_calor(df: pd.DataFrame, center_lat: Optional[float] = None, center_lon: Optional[float] = None) -> folium.Map:
     """
     Cria um mapa de calor das ocorrências.
@@ -233,12 +501,7 @@ def criar_mapa_calor(df: pd.DataFrame, center_lat: Optional[float] = None, cente
     lat = center_lat or df["latitude"].mean()
     lon = center_lon or df["longitude"].mean()
     
-    # Criar mapa simples com tile escuro para melhor visualizacao do heatmap
-    mapa = folium.Map(
-        location=[lat, lon],
-        zoom_start=MAP_CONFIG["zoom_start"],
-        tiles="CartoDB dark_matter"
-    )
+    mapa = instanciar_mapa("calor", lat, lon)
     
     # Preparar dados para heatmap - garantir que sao floats validos
     heat_data = []
@@ -271,13 +534,6 @@ def criar_mapa_calor(df: pd.DataFrame, center_lat: Optional[float] = None, cente
             }
         ).add_to(mapa)
     
-    # Adicionar controle de tela cheia
-    plugins.Fullscreen(
-        position="topleft",
-        title="Tela Cheia",
-        title_cancel="Sair"
-    ).add_to(mapa)
-    
     return mapa
 
 
@@ -285,16 +541,34 @@ def criar_mapa_seletor() -> folium.Map:
     """
     Cria um mapa para seleção de localização (usado no formulário de reporte).
     """
-    mapa = criar_mapa_base()
-    
-    # Adicionar popup de lat/lng ao clicar
-    mapa.add_child(folium.LatLngPopup())
+    return instanciar_mapa("seletor")
+
+
+def renderizar_html(mapa: folium.Map) -> str:
+    """
+    Serializa o mapa para um documento HTML completo.
+    """
+    return mapa.get_root().render()
+
+
+def obter_mapa_em_cache(
+    chave: Hashable,
+    construir: Callable[[], folium.Map]
+) -> Tuple[folium.Map, str]:
+    """
+    Retorna o mapa e seu HTML a partir do cache, construindo-os se necessário.
     
-    # Adicionar instruções
-    folium.Marker(
-        location=[MAP_CONFIG["center_lat"], MAP_CONFIG["center_lon"]],
-        popup="Clique no mapa para selecionar a localização",
-        icon=folium.Icon(color="gray", icon="info", prefix="fa")
-    ).add_to(mapa)
+    Args:
+        chave: Tupla com filtros, opções de exibição e versão dos dados
+        construir: Função que monta o mapa quando não há entrada em cache
+    """
+    def _criar() -> Tuple[folium.Map, str]:
+        mapa = construir()
+        return mapa, renderizar_html(mapa)
     
-    return mapa
+    # O objeto do mapa ocupa aproximadamente o mesmo que seu HTML
+    return _cache_mapas.obter_ou_criar(
+        chave,
+        _criar,
+        lambda item: 2 * len(item[1].encode("utf-8"))
+    )
@@ -0,0 +1,218 @@
+"""
+Registro tipado de uma ocorrência, para operações sobre um único registro.
+
+Cadastro, atualização, votos e comentários, a tela de detalhe do admin e os
+popups do mapa trabalham com ``Ocorrencia`` em vez de dicts soltos ou linhas
+do DataFrame. As classes usam ``__slots__`` (sem ``__dict__`` por instância)
+e convertem direto do/para o formato gravado em ``reportes.json``:
+
+    ocorrencia = Ocorrencia.de_dict(reporte)     # formato gravado -> registro
+    reporte = ocorrencia.para_dict()             # registro -> formato gravado
+    ocorrencia = Ocorrencia.de_linha(linha)      # linha do DataFrame (CSV ou JSON)
+
+Valores ausentes viram None (ou a lista vazia) na decodificação; quem exibe
+o registro não precisa testar NaN nem strings JSON. Chaves do reporte que
+não são campos de ``Ocorrencia`` ficam em ``extras`` e voltam intactas em
+``para_dict``. Análises em massa continuam sobre o DataFrame.
+"""
+import math
+from datetime import datetime
+from typing import Any, Dict, List, Mapping, Optional
+
+# Origem dos registros do reportes.json no DataFrame unificado
+FONTE_USUARIO = "Usuário"
+
+
+def _ausente(valor: Any) -> bool:
+    """None, NaN/NaT/NA do pandas ou texto vazio."""
+    if valor is None:
+        return True
+    if isinstance(valor, str):
+        return not valor.strip()
+    try:
+        return bool(valor != valor)
+    except (TypeError, ValueError):  # pd.NA não tem valor de verdade
+        return True
+
+
+def _texto(valor: Any) -> Optional[str]:
+    return None if _ausente(valor) else str(valor)
+
+
+def _real(valor: Any) -> Optional[float]:
+    try:
+        valor = float(valor)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(valor) else valor
+
+
+def _data(valor: Any) -> Optional[datetime]:
+    """datetime a partir de texto ISO 8601 ou Timestamp do pandas."""
+    if _ausente(valor):
+        return None
+    if isinstance(valor, datetime):
+        # pd.Timestamp é subclasse de datetime
+        return valor.to_pydatetime() if hasattr(valor, "to_pydatetime") else valor
+    try:
+        return datetime.fromisoformat(str(valor))
+    except ValueError:
+        return None
+
+
+def _iso(valor: Optional[datetime]) -> Optional[str]:
+    return None if valor is None else valor.isoformat()
+
+
+# Chaves do reporte gravado decodificadas em campos; as demais vão para ``extras``
+CAMPOS_GRAVADOS = frozenset((
+    "id", "tipo", "descricao", "latitude", "longitude", "bairro", "status",
+    "prioridade", "fotos", "usuario", "data_envio", "data_atualizacao",
+    "votos", "comentarios",
+))
+
+
+class Comentario:
+    """Comentário (ou registro de ação do administrador) de uma ocorrência."""
+
+    __slots__ = ("texto", "autor", "data")
+
+    def __init__(self, texto: str, autor: str = "Anonimo", data: Optional[datetime] = None):
+        self.texto = texto
+        self.autor = autor
+        self.data = data
+
+    @classmethod
+    def de_dict(cls, dados: Mapping[str, Any]) -> "Comentario":
+        return cls(dados.get("texto") or "", dados.get("autor") or "Anonimo", _data(dados.get("data")))
+
+    def para_dict(self) -> Dict[str, Any]:
+        return {"texto": self.texto, "autor": self.autor, "data": _iso(self.data)}
+
+    def __repr__(self) -> str:
+        return f"Comentario(autor={self.autor!r}, data={self.data!r})"
+
+
+class Ocorrencia:
+    """Uma ocorrência, com os campos do formato gravado em ``reportes.json``."""
+
+    __slots__ = (
+        "id", "tipo", "descricao", "latitude", "longitude", "bairro", "status",
+        "prioridade", "fotos", "usuario", "data_envio", "data_atualizacao",
+        "votos", "comentarios", "fonte", "extras",
+    )
+
+    def __init__(
+        self,
+        id: str,
+        tipo: Optional[str] = None,
+        descricao: Optional[str] = None,
+        latitude: Optional[float] = None,
+        longitude: Optional[float] = None,
+        bairro: Optional[str] = None,
+        status: str = "Pendente",
+        prioridade: str = "Media",
+        fotos: Optional[List[str]] = None,
+        usuario: str = "Anonimo",
+        data_envio: Optional[datetime] = None,
+        data_atualizacao: Optional[datetime] = None,
+        votos: int = 0,
+        comentarios: Optional[List[Comentario]] = None,
+        fonte: str = FONTE_USUARIO,
+        extras: Optional[Dict[str, Any]] = None
+    ):
+        self.id = id
+        self.tipo = tipo
+        self.descricao = descricao
+        self.latitude = latitude
+        self.longitude = longitude
+        self.bairro = bairro
+        self.status = status
+        self.prioridade = prioridade
+        self.fotos = fotos if fotos is not None else []
+        self.usuario = usuario
+        self.data_envio = data_envio
+        self.data_atualizacao = data_atualizacao
+        self.votos = votos
+        self.comentarios = comentarios if comentarios is not None else []
+        self.fonte = fonte
+        # Chaves do reporte gravado que não são campos acima
+        self.extras = extras if extras is not None else {}
+
+    @classmethod
+    def de_dict(cls, dados: Mapping[str, Any]) -> "Ocorrencia":
+        """Decodifica um reporte no formato gravado em ``reportes.json``."""
+        return cls(
+            id=str(dados["id"]),
+            tipo=dados.get("tipo"),
+            descricao=dados.get("descricao"),
+            latitude=_real(dados.get("latitude")),
+            longitude=_real(dados.get("longitude")),
+            bairro=dados.get("bairro"),
+            status=dados.get("status") or "Pendente",
+            prioridade=dados.get("prioridade") or "Media",
+            fotos=list(dados.get("fotos") or ()),
+            usuario=dados.get("usuario") or "Anonimo",
+            data_envio=_data(dados.get("data_envio")),
+            data_atualizacao=_data(dados.get("data_atualizacao")),
+            votos=int(dados.get("votos") or 0),
+            comentarios=[Comentario.de_dict(c) for c in dados.get("comentarios") or ()],
+            extras={chave: valor for chave, valor in dados.items() if chave not in CAMPOS_GRAVADOS}
+        )
+
+    @classmethod
+    def de_linha(cls, linha: Mapping[str, Any]) -> "Ocorrencia":
+        """
+        Decodifica uma linha do DataFrame unificado (Series ou dict).
+
+        Linhas do CSV não têm fotos, comentários nem usuário: as colunas vêm
+        como NaN e viram os valores padrão. A data do envio é a coluna
+        ``data_envio`` (reportes) ou ``data`` (CSV).
+        """
+        fotos, comentarios = linha.get("fotos"), linha.get("comentarios")
+        votos = _real(linha.get("votos"))
+        return cls(
+            id=str(linha.get("id")),
+            tipo=_texto(linha.get("tipo")) or _texto(linha.get("tipo_ocorrencia")),
+            descricao=_texto(linha.get("descricao")),
+            latitude=_real(linha.get("latitude")),
+            longitude=_real(linha.get("longitude")),
+            bairro=_texto(linha.get("bairro")),
+            status=_texto(linha.get("status")) or "Pendente",
+            prioridade=_texto(linha.get("prioridade")) or "Media",
+            fotos=list(fotos) if isinstance(fotos, list) else [],
+            usuario=_texto(linha.get("usuario")) or "Anonimo",
+            data_envio=_data(linha.get("data_envio")) or _data(linha.get("data")),
+            data_atualizacao=_data(linha.get("data_atualizacao")),
+            votos=int(votos) if votos is not None else 0,
+            comentarios=[Comentario.de_dict(c) for c in comentarios] if isinstance(comentarios, list) else [],
+            fonte=_texto(linha.get("fonte")) or FONTE_USUARIO
+        )
+
+    def para_dict(self) -> Dict[str, Any]:
+        """Codifica no formato gravado em ``reportes.json`` (sem a fonte, com os extras)."""
+        return {
+            **self.extras,
+            "id": self.id,
+            "tipo": self.tipo,
+            "descricao": self.descricao,
+            "latitude": self.latitude,
+            "longitude": self.longitude,
+            "bairro": self.bairro,
+            "status": self.status,
+            "prioridade": self.prioridade,
+            "fotos": list(self.fotos),
+            "usuario": self.usuario,
+            "data_envio": _iso(self.data_envio),
+            "data_atualizacao": _iso(self.data_atualizacao),
+            "votos": self.votos,
+            "comentarios": [c.para_dict() for c in self.comentarios]
+        }
+
+    @property
+    def editavel(self) -> bool:
+        """Só reportes do JSON podem ser alterados; o CSV original é somente leitura."""
+        return self.fonte == FONTE_USUARIO
+
+    def __repr__(self) -> str:
+        return f"Ocorrencia(id={self.id!r}, tipo={self.tipo!r}, status={self.status!r})"
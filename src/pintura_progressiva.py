@@ -0,0 +1,52 @@
+"""
+Pintura progressiva das páginas.
+
+O Streamlit envia cada elemento ao navegador assim que ele é criado. As
+páginas desenham primeiro os indicadores baratos (contadores pré-calculados)
+e reservam espaços para mapas, gráficos e tabelas; as construções pesadas
+(folium, agrupamentos, índices) são disparadas em threads de fundo logo no
+início e cada espaço é preenchido quando seu resultado fica pronto.
+
+As threads apenas calculam (HTML, figuras, tabelas); os comandos do
+Streamlit continuam na thread da sessão.
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+import streamlit as st
+
+from config import PINTURA_CONFIG
+
+_executor = ThreadPoolExecutor(max_workers=PINTURA_CONFIG["threads"], thread_name_prefix="pintura")
+
+
+def adiar(funcao: Callable[..., Any], *args, **kwargs) -> Future:
+    """
+    Dispara ``funcao`` em segundo plano.
+
+    Com ``PINTURA_CONFIG["progressiva"]`` desligado, a função é executada
+    na hora e o Future já volta resolvido.
+    """
+    if PINTURA_CONFIG["progressiva"]:
+        return _executor.submit(funcao, *args, **kwargs)
+
+    futuro: Future = Future()
+    try:
+        futuro.set_result(funcao(*args, **kwargs))
+    except Exception as e:
+        futuro.set_exception(e)
+    return futuro
+
+
+def reservar(mensagem: str = "⏳ Carregando..."):
+    """Espaço a ser preenchido depois, com um aviso enquanto isso."""
+    espaco = st.empty()
+    espaco.caption(mensagem)
+    return espaco
+
+
+def preencher(espaco, futuro: Future, desenhar: Callable[[Any], None]) -> None:
+    """Espera o resultado do Future e o desenha no espaço reservado."""
+    resultado = futuro.result()
+    with espaco.container():
+        desenhar(resultado)
@@ -0,0 +1,156 @@
+"""
+Servidor HTTP de tiles, executado em uma thread do processo Streamlit.
+
+Rotas:
+    /mvt/{z}/{x}/{y}.pbf?tipo=...&status=...  Tiles vetoriais das ocorrências
+    /base/{estilo}/{z}/{x}/{y}.png            Tiles de fundo do cache local
+    /saude                                    Identificação do servidor
+
+O navegador acessa o servidor por ``TILES_CONFIG["url_publica"]``
+(``MAPA_TILES_URL``): sem ela, os recursos que dependem dos tiles ficam
+desligados, porque um endereço como ``http://127.0.0.1:8765`` só funciona
+no navegador da própria máquina do servidor. Exportações não passam por
+aqui: a porta de tiles não tem autenticação.
+"""
+import threading
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+from config import TILES_CONFIG
+
+# Resposta de /saude: confirma que quem ocupa a porta é este servidor de tiles
+IDENTIFICACAO = b"mapa-digital-urbano/servidor-tiles"
+
+_servidor: Optional[ThreadingHTTPServer] = None
+# None: ainda não iniciado; True: servidor deste processo ou de outro
+# processo do app; False: porta ocupada por outro programa
+_disponivel: Optional[bool] = None
+_lock_servidor = threading.Lock()
+
+
+class _ManipuladorTiles(BaseHTTPRequestHandler):
+    """Atende requisições de tiles no formato z/x/y."""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        partes = url.path.strip("/").split("/")
+
+        try:
+            if len(partes) == 4 and partes[0] == "mvt" and partes[3].endswith(".pbf"):
+                import tiles_vetoriais
+
+                z, x, y = int(partes[1]), int(partes[2]), int(partes[3][:-4])
+                filtros = {k: v[0] for k, v in parse_qs(url.query).items()}
+                dados = tiles_vetoriais.obter_tile(z, x, y, filtros)
+                # Lidos por fetch() na página do app: só ela recebe permissão de CORS
+                self._responder(200, dados, "application/x-protobuf", origem=self._origem_permitida())
+            elif len(partes) == 5 and partes[0] == "base" and partes[4].endswith(".png"):
+                import tiles_base
+
+                z, x, y = int(partes[2]), int(partes[3]), int(partes[4][:-4])
+                dados = tiles_base.obter_tile(partes[1], z, x, y)
+                if dados is None:
+                    self._responder(404, b"", "text/plain")
+                else:
+                    # Tiles de fundo não mudam: o navegador pode guardá-los
+                    self._responder(200, dados, "image/png", cache="public, max-age=604800")
+            elif partes == ["saude"]:
+                self._responder(200, IDENTIFICACAO, "text/plain")
+            else:
+                self._responder(404, b"", "text/plain")
+        except ValueError:
+            self._responder(400, b"", "text/plain")
+        except Exception as e:
+            print(f"Erro ao servir tile {self.path}: {e}")
+            self._responder(500, b"", "text/plain")
+
+    def _origem_permitida(self) -> Optional[str]:
+        """Origem da requisição, se for a do app (``TILES_CONFIG["origens"]``)."""
+        origem = self.headers.get("Origin")
+        if origem and origem.rstrip("/") in TILES_CONFIG["origens"]:
+            return origem
+        return None
+
+    def _responder(
+        self,
+        codigo: int,
+        dados: bytes,
+        tipo_conteudo: str,
+        cache: str = "no-cache",
+        origem: Optional[str] = None
+    ):
+        self.send_response(codigo)
+        self.send_header("Content-Type", tipo_conteudo)
+        self.send_header("Content-Length", str(len(dados)))
+        if origem:
+            self.send_header("Access-Control-Allow-Origin", origem)
+            self.send_header("Vary", "Origin")
+        self.send_header("Cache-Control", cache)
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def log_message(self, format, *args):
+        # Evita poluir o log do Streamlit com cada tile
+        pass
+
+
+def obter_url_base() -> Optional[str]:
+    """URL pela qual o navegador acessa o servidor de tiles (None se não configurada)."""
+    if TILES_CONFIG["url_publica"]:
+        return TILES_CONFIG["url_publica"].rstrip("/")
+    return None
+
+
+def _servidor_do_app_na_porta() -> bool:
+    """Verifica se o programa que ocupa a porta é um servidor de tiles do app."""
+    host = TILES_CONFIG["host"]
+    if host in ("", "0.0.0.0", "::"):
+        host = "127.0.0.1"
+    try:
+        with urllib.request.urlopen(f"http://{host}:{TILES_CONFIG['porta']}/saude", timeout=2) as resposta:
+            return resposta.status == 200 and resposta.read(len(IDENTIFICACAO) + 1) == IDENTIFICACAO
+    except (OSError, ValueError):
+        return False
+
+
+def iniciar_servidor() -> Optional[str]:
+    """
+    Inicia o servidor de tiles uma única vez por processo.
+
+    Se a porta já estiver ocupada por um servidor de tiles do app (por
+    exemplo, de outro processo do Streamlit no mesmo host), ele é
+    reaproveitado; se estiver ocupada por outro programa, os tiles ficam
+    indisponíveis.
+
+    Returns:
+        URL base do servidor, ou None se os tiles não estiverem disponíveis
+        (sem ``url_publica`` configurada ou porta ocupada por outro programa)
+    """
+    global _servidor, _disponivel
+
+    url = obter_url_base()
+    if url is None:
+        return None
+
+    with _lock_servidor:
+        if _disponivel is None:
+            try:
+                _servidor = ThreadingHTTPServer(
+                    (TILES_CONFIG["host"], TILES_CONFIG["porta"]),
+                    _ManipuladorTiles
+                )
+                _servidor.daemon_threads = True
+                threading.Thread(
+                    target=_servidor.serve_forever,
+                    name="servidor-tiles",
+                    daemon=True
+                ).start()
+                _disponivel = True
+            except OSError as e:
+                _disponivel = _servidor_do_app_na_porta()
+                if not _disponivel:
+                    print(f"Servidor de tiles nao iniciado: porta {TILES_CONFIG['porta']} ocupada por outro programa ({e})")
+
+    return url if _disponivel else None
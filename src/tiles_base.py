@@ -0,0 +1,254 @@
+"""
+Cache local de tiles de fundo (CartoDB/OpenStreetMap).
+
+Os tiles ficam em disco no formato XYZ (pastas ``estilo/z/x/y.png``) ou
+MBTiles (um arquivo SQLite por estilo) e são servidos pelo servidor local
+de tiles, permitindo usar o mapa em redes sem acesso externo. Só os tiles
+ficam locais: o Leaflet e os plugins do folium continuam vindo das CDNs.
+
+Semeadura do recorte configurado (executar a partir de ``src``):
+    python tiles_base.py --estilos claro escuro --zoom-max 16
+
+Respeite as políticas de uso dos provedores ao semear: o download em massa
+de tiles do OpenStreetMap só deve ser feito com autorização ou a partir de
+um servidor próprio (``url_origem`` no config).
+"""
+import argparse
+import math
+import os
+import queue
+import sqlite3
+import tempfile
+import threading
+import time
+import urllib.request
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from config import TILES_BASE_CONFIG
+
+USER_AGENT = "MapaDigitalUrbano/2.0 (cache de tiles local)"
+
+# Conexões somente leitura reaproveitadas entre requisições, por estilo
+_MAX_LEITORES = 8
+_leitores: Dict[str, "queue.SimpleQueue[sqlite3.Connection]"] = {}
+# Uma conexão de escrita por estilo, com o esquema já criado
+_escritores: Dict[str, sqlite3.Connection] = {}
+_lock_mbtiles = threading.Lock()
+
+
+def modo_local() -> bool:
+    """Indica se os mapas devem usar o cache local de tiles de fundo."""
+    return TILES_BASE_CONFIG["modo"] == "local"
+
+
+# ==================== ARMAZENAMENTO ====================
+
+def _caminho_xyz(estilo: str, z: int, x: int, y: int) -> Path:
+    return Path(TILES_BASE_CONFIG["diretorio"]) / estilo / str(z) / str(x) / f"{y}.png"
+
+
+def _caminho_mbtiles(estilo: str) -> Path:
+    return Path(TILES_BASE_CONFIG["diretorio"]) / f"{estilo}.mbtiles"
+
+
+def _metadados_mbtiles(estilo: str) -> Dict[str, str]:
+    """Metadados do MBTiles (``name`` e ``format`` são obrigatórios na especificação)."""
+    lat_min, lon_min, lat_max, lon_max = TILES_BASE_CONFIG["bbox"]
+    return {
+        "name": TILES_BASE_CONFIG["estilos"][estilo]["nome"],
+        "format": "png",
+        "type": "baselayer",
+        "bounds": f"{lon_min},{lat_min},{lon_max},{lat_max}",
+        "minzoom": str(TILES_BASE_CONFIG["zoom_min"]),
+        "maxzoom": str(TILES_BASE_CONFIG["zoom_max"]),
+        "attribution": TILES_BASE_CONFIG["estilos"][estilo]["attr"],
+    }
+
+
+def _escritor_mbtiles(estilo: str) -> sqlite3.Connection:
+    """Conexão de escrita do estilo; cria o arquivo e o esquema na primeira vez. Chamar com ``_lock_mbtiles``."""
+    conexao = _escritores.get(estilo)
+    if conexao is None:
+        caminho = _caminho_mbtiles(estilo)
+        caminho.parent.mkdir(parents=True, exist_ok=True)
+        conexao = sqlite3.connect(str(caminho), check_same_thread=False)
+        # WAL: leitores não são bloqueados durante a semeadura
+        conexao.execute("PRAGMA journal_mode=WAL")
+        conexao.execute(
+            "CREATE TABLE IF NOT EXISTS tiles ("
+            "zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB)"
+        )
+        conexao.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS tile_index ON tiles (zoom_level, tile_column, tile_row)"
+        )
+        conexao.execute("CREATE TABLE IF NOT EXISTS metadata (name TEXT, value TEXT)")
+        conexao.execute("CREATE UNIQUE INDEX IF NOT EXISTS metadata_index ON metadata (name)")
+        conexao.executemany(
+            "INSERT OR IGNORE INTO metadata VALUES (?, ?)",
+            list(_metadados_mbtiles(estilo).items())
+        )
+        conexao.commit()
+        _escritores[estilo] = conexao
+    return conexao
+
+
+def _ler_mbtiles(estilo: str, z: int, linha: int, x: int) -> Optional[bytes]:
+    """Consulta um tile com uma conexão somente leitura do pool do estilo."""
+    caminho = _caminho_mbtiles(estilo)
+    if not caminho.exists():
+        return None
+
+    leitores = _leitores.setdefault(estilo, queue.SimpleQueue())
+    try:
+        conexao = leitores.get_nowait()
+    except queue.Empty:
+        conexao = sqlite3.connect(f"{caminho.resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False)
+
+    try:
+        resultado = conexao.execute(
+            "SELECT tile_data FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?",
+            (z, x, linha)
+        ).fetchone()
+    except sqlite3.Error:
+        # Arquivo ainda sem esquema (semeadura começando): a conexão é descartada
+        conexao.close()
+        return None
+
+    if leitores.qsize() < _MAX_LEITORES:
+        leitores.put(conexao)
+    else:
+        conexao.close()
+    return resultado[0] if resultado else None
+
+
+def ler_tile(estilo: str, z: int, x: int, y: int) -> Optional[bytes]:
+    """Lê um tile do armazenamento local; retorna None se não existir."""
+    if TILES_BASE_CONFIG["formato"] == "mbtiles":
+        # MBTiles usa a convenção TMS (linha invertida)
+        return _ler_mbtiles(estilo, z, (2 ** z) - 1 - y, x)
+
+    caminho = _caminho_xyz(estilo, z, x, y)
+    return caminho.read_bytes() if caminho.exists() else None
+
+
+def gravar_tile(estilo: str, z: int, x: int, y: int, dados: bytes) -> None:
+    """Grava um tile no armazenamento local."""
+    if TILES_BASE_CONFIG["formato"] == "mbtiles":
+        linha = (2 ** z) - 1 - y
+        with _lock_mbtiles:
+            conexao = _escritor_mbtiles(estilo)
+            conexao.execute(
+                "INSERT OR REPLACE INTO tiles VALUES (?, ?, ?, ?)",
+                (z, x, linha, sqlite3.Binary(dados))
+            )
+            conexao.commit()
+        return
+
+    caminho = _caminho_xyz(estilo, z, x, y)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    # Temporário com nome único: vários processos podem gravar o mesmo tile
+    with tempfile.NamedTemporaryFile(dir=caminho.parent, suffix=".tmp", delete=False) as temporario:
+        temporario.write(dados)
+    try:
+        os.replace(temporario.name, caminho)
+    except OSError:
+        os.unlink(temporario.name)
+        raise
+
+
+def baixar_tile(estilo: str, z: int, x: int, y: int, timeout: float = 10.0) -> bytes:
+    """Baixa um tile do provedor de origem do estilo."""
+    url = TILES_BASE_CONFIG["estilos"][estilo]["url_origem"].format(z=z, x=x, y=y)
+    requisicao = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+    with urllib.request.urlopen(requisicao, timeout=timeout) as resposta:
+        return resposta.read()
+
+
+def obter_tile(estilo: str, z: int, x: int, y: int) -> Optional[bytes]:
+    """
+    Retorna o tile local; se configurado, baixa e guarda tiles ausentes.
+    """
+    if estilo not in TILES_BASE_CONFIG["estilos"]:
+        return None
+
+    dados = ler_tile(estilo, z, x, y)
+    if dados is None and TILES_BASE_CONFIG["buscar_ausentes"]:
+        try:
+            dados = baixar_tile(estilo, z, x, y)
+            gravar_tile(estilo, z, x, y, dados)
+        except Exception as e:
+            print(f"Erro ao buscar tile {estilo}/{z}/{x}/{y}: {e}")
+            return None
+    return dados
+
+
+# ==================== SEMEADURA ====================
+
+def _tile_xy(lat: float, lon: float, z: int) -> Tuple[int, int]:
+    n = 2 ** z
+    lat_rad = math.radians(lat)
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tiles_do_recorte(
+    bbox: Tuple[float, float, float, float],
+    zoom_min: int,
+    zoom_max: int
+) -> Iterator[Tuple[int, int, int]]:
+    """Enumera (z, x, y) de todos os tiles que cobrem o recorte."""
+    lat_min, lon_min, lat_max, lon_max = bbox
+    for z in range(zoom_min, zoom_max + 1):
+        x0, y0 = _tile_xy(lat_max, lon_min, z)
+        x1, y1 = _tile_xy(lat_min, lon_max, z)
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                yield z, x, y
+
+
+def semear(
+    estilos: Optional[List[str]] = None,
+    zoom_min: Optional[int] = None,
+    zoom_max: Optional[int] = None,
+    pausa: float = 0.1
+) -> int:
+    """
+    Baixa para o armazenamento local os tiles do recorte configurado.
+
+    Tiles já existentes são mantidos, então a semeadura pode ser retomada.
+
+    Returns:
+        Quantidade de tiles baixados
+    """
+    estilos = estilos or list(TILES_BASE_CONFIG["estilos"].keys())
+    zoom_min = TILES_BASE_CONFIG["zoom_min"] if zoom_min is None else zoom_min
+    zoom_max = TILES_BASE_CONFIG["zoom_max"] if zoom_max is None else zoom_max
+
+    baixados = 0
+    for estilo in estilos:
+        for z, x, y in tiles_do_recorte(TILES_BASE_CONFIG["bbox"], zoom_min, zoom_max):
+            if ler_tile(estilo, z, x, y) is not None:
+                continue
+            try:
+                gravar_tile(estilo, z, x, y, baixar_tile(estilo, z, x, y))
+                baixados += 1
+            except Exception as e:
+                print(f"Erro ao baixar {estilo}/{z}/{x}/{y}: {e}")
+            time.sleep(pausa)
+        print(f"Estilo '{estilo}' semeado ate o zoom {zoom_max}.")
+
+    return baixados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Semeia o cache local de tiles de fundo.")
+    parser.add_argument("--estilos", nargs="*", choices=list(TILES_BASE_CONFIG["estilos"].keys()))
+    parser.add_argument("--zoom-min", type=int, default=None)
+    parser.add_argument("--zoom-max", type=int, default=None)
+    parser.add_argument("--pausa", type=float, default=0.1, help="Pausa entre downloads (s)")
+    args = parser.parse_args()
+
+    total = semear(args.estilos, args.zoom_min, args.zoom_max, args.pausa)
+    print(f"{total} tiles baixados.")
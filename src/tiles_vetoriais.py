@@ -0,0 +1,345 @@
+"""
+Geração de tiles vetoriais (Mapbox Vector Tiles) das ocorrências.
+
+Os tiles ``z/x/y`` são gerados sob demanda a partir dos dados do
+DataManager e guardados em disco. Escritas feitas pelo DataManager removem
+apenas os tiles que contêm o ponto alterado; mudanças externas nos arquivos
+de dados descartam o cache inteiro.
+"""
+import hashlib
+import math
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import TILES_CONFIG
+from cache_utils import CacheLRU
+from data_manager import data_manager, normalizar_filtros
+
+NOME_CAMADA = "ocorrencias"
+PROPRIEDADES = ("tipo", "status", "prioridade", "bairro")
+
+_RAIZ_CACHE = Path(TILES_CONFIG["diretorio_cache"])
+_ARQUIVO_VERSAO = _RAIZ_CACHE / "versao.txt"
+# Reentrante: o observador invalida os tiles e avança a versão sob a mesma trava
+_lock_disco = threading.RLock()
+
+# Pontos projetados por (versão, filtros), compartilhados entre requisições
+_cache_indices = CacheLRU(max_bytes=256 * 1024 * 1024, max_entradas=32)
+
+
+# ==================== PROJEÇÃO ====================
+
+def projetar(lat, lon) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Converte lat/lon em coordenadas Web Mercator normalizadas em [0, 1).
+    """
+    lat = np.clip(np.asarray(lat, dtype=np.float64), -85.0511, 85.0511)
+    lon = np.asarray(lon, dtype=np.float64)
+    mx = (lon + 180.0) / 360.0
+    lat_rad = np.radians(lat)
+    my = (1.0 - np.log(np.tan(lat_rad) + 1.0 / np.cos(lat_rad)) / math.pi) / 2.0
+    return mx, my
+
+
+def tiles_do_ponto(lat: float, lon: float, z: int) -> List[Tuple[int, int]]:
+    """
+    Lista os tiles do zoom ``z`` cujo recorte (com buffer) contém o ponto.
+    """
+    n = 2 ** z
+    mx, my = projetar(lat, lon)
+    margem = TILES_CONFIG["buffer"] / TILES_CONFIG["extent"]
+    xs = range(int(math.floor(mx * n - margem)), int(math.floor(mx * n + margem)) + 1)
+    ys = range(int(math.floor(my * n - margem)), int(math.floor(my * n + margem)) + 1)
+    return [(x % n, y) for x in xs for y in ys if 0 <= y < n]
+
+
+# ==================== CODIFICAÇÃO PROTOBUF ====================
+
+def _varint(valor: int) -> bytes:
+    saida = bytearray()
+    while True:
+        byte = valor & 0x7F
+        valor >>= 7
+        if valor:
+            saida.append(byte | 0x80)
+        else:
+            saida.append(byte)
+            return bytes(saida)
+
+
+def _zigzag(valor: int) -> int:
+    return (valor << 1) ^ (valor >> 63)
+
+
+def _campo_varint(numero: int, valor: int) -> bytes:
+    return _varint(numero << 3) + _varint(valor)
+
+
+def _campo_bytes(numero: int, dados: bytes) -> bytes:
+    return _varint((numero << 3) | 2) + _varint(len(dados)) + dados
+
+
+def _campo_compactado(numero: int, valores: List[int]) -> bytes:
+    return _campo_bytes(numero, b"".join(_varint(v) for v in valores))
+
+
+def codificar_camada(
+    nome: str,
+    pontos: List[Tuple[int, int]],
+    propriedades: List[Dict[str, object]],
+    extent: int
+) -> bytes:
+    """
+    Codifica uma camada MVT de pontos (coordenadas já no espaço do tile).
+    """
+    chaves: Dict[str, int] = {}
+    valores: Dict[Tuple[str, object], int] = {}
+    features = []
+
+    for i, ((px, py), props) in enumerate(zip(pontos, propriedades)):
+        tags = []
+        for chave, valor in props.items():
+            if valor is None:
+                continue
+            idx_chave = chaves.setdefault(chave, len(chaves))
+            tipo_valor = "int" if isinstance(valor, (int, np.integer)) else "str"
+            idx_valor = valores.setdefault((tipo_valor, valor), len(valores))
+            tags.extend((idx_chave, idx_valor))
+
+        # MoveTo com um único ponto: comando 1, contagem 1
+        geometria = [(1 & 0x7) | (1 << 3), _zigzag(int(px)), _zigzag(int(py))]
+
+        feature = (
+            _campo_varint(1, i + 1)
+            + _campo_compactado(2, tags)
+            + _campo_varint(3, 1)  # GeomType.POINT
+            + _campo_compactado(4, geometria)
+        )
+        features.append(_campo_bytes(2, feature))
+
+    camada = bytearray()
+    camada += _campo_varint(15, 2)
+    camada += _campo_bytes(1, nome.encode("utf-8"))
+    for feature in features:
+        camada += feature
+    for chave in chaves:
+        camada += _campo_bytes(3, chave.encode("utf-8"))
+    for tipo_valor, valor in valores:
+        if tipo_valor == "int":
+            camada += _campo_bytes(4, _campo_varint(6, _zigzag(int(valor))))
+        else:
+            camada += _campo_bytes(4, _campo_bytes(1, str(valor).encode("utf-8")))
+    camada += _campo_varint(5, extent)
+
+    return _campo_bytes(3, bytes(camada))
+
+
+# ==================== ÍNDICE DE PONTOS ====================
+
+def _construir_indice(filtros: Tuple[Tuple[str, str], ...]) -> Dict[str, Any]:
+    """
+    Pontos projetados e ordenados por x, com as propriedades como códigos.
+
+    As propriedades ficam nos arrays de códigos das colunas NumPy; só viram
+    texto (``_propriedades``) para as features de cada tile gerado.
+    """
+    # Só as colunas NumPy do DataManager: códigos, coordenadas float32
+    colunas = data_manager.obter_colunas()
+    validos = colunas.mascara(dict(filtros)) & ~(np.isnan(colunas.latitude) | np.isnan(colunas.longitude))
+    posicoes = np.flatnonzero(validos)
+
+    lat = colunas.latitude[posicoes].astype(np.float64)
+    lon = colunas.longitude[posicoes].astype(np.float64)
+    mx, my = projetar(lat, lon)
+
+    # Ordenar por x permite recortar cada tile com busca binária
+    ordem = np.argsort(mx, kind="stable")
+    return {
+        "mx": mx[ordem],
+        "my": my[ordem],
+        "codigos": {c: colunas.codigos[c][posicoes[ordem]] for c in PROPRIEDADES},
+        "rotulos": {c: np.array(colunas.vocabularios[c] + [None], dtype=object) for c in PROPRIEDADES},
+    }
+
+
+def _obter_indice(filtros: Tuple[Tuple[str, str], ...]) -> Dict[str, Any]:
+    chave = (data_manager.obter_versao(), filtros)
+    return _cache_indices.obter_ou_criar(
+        chave,
+        lambda: _construir_indice(filtros),
+        lambda indice: len(indice["mx"]) * (16 + len(PROPRIEDADES) * 2) + 1024
+    )
+
+
+def _propriedades(indice: Dict[str, Any], posicoes: np.ndarray, quantidades) -> List[Dict[str, object]]:
+    """Propriedades das features nas posições do índice (códigos -> texto)."""
+    # Código -1 (ausente) indexa o None do fim da tabela de rótulos
+    colunas = [indice["rotulos"][c][indice["codigos"][c][posicoes]] for c in PROPRIEDADES]
+    return [
+        {**dict(zip(PROPRIEDADES, valores)), "quantidade": int(q)}
+        for valores, q in zip(zip(*colunas), quantidades)
+    ]
+
+
+def gerar_tile(z: int, x: int, y: int, filtros: Tuple[Tuple[str, str], ...] = ()) -> bytes:
+    """
+    Gera o tile MVT ``z/x/y`` com as ocorrências que passam nos filtros.
+
+    Em zooms baixos com muitos pontos, pontos que caem na mesma célula de
+    agregação são reunidos em uma feature com a propriedade ``quantidade``.
+    """
+    indice = _obter_indice(filtros)
+    extent = TILES_CONFIG["extent"]
+    n = 2 ** z
+    margem = TILES_CONFIG["buffer"] / extent / n
+
+    x0, x1 = x / n - margem, (x + 1) / n + margem
+    y0, y1 = y / n - margem, (y + 1) / n + margem
+
+    inicio, fim = np.searchsorted(indice["mx"], [x0, x1])
+    mx = indice["mx"][inicio:fim]
+    my = indice["my"][inicio:fim]
+    dentro = (my >= y0) & (my <= y1)
+    if not dentro.any():
+        return b""
+
+    px = np.round((mx[dentro] * n - x) * extent).astype(np.int64)
+    py = np.round((my[dentro] * n - y) * extent).astype(np.int64)
+    posicoes = inicio + np.flatnonzero(dentro)
+
+    if len(px) > TILES_CONFIG["max_pontos_tile"]:
+        # Nível de detalhe: uma feature por célula de 16x16 unidades
+        celulas = (px // 16) * (extent * 2) + (py // 16)
+        _, primeiro, contagem = np.unique(celulas, return_index=True, return_counts=True)
+        pontos = list(zip(px[primeiro], py[primeiro]))
+        propriedades = _propriedades(indice, posicoes[primeiro], contagem)
+    else:
+        pontos = list(zip(px, py))
+        propriedades = _propriedades(indice, posicoes, np.ones(len(posicoes), dtype=np.int64))
+
+    return codificar_camada(NOME_CAMADA, pontos, propriedades, extent)
+
+
+# ==================== CACHE EM DISCO ====================
+
+def _chave_filtros(filtros: Tuple[Tuple[str, str], ...]) -> str:
+    if not filtros:
+        return "todos"
+    return hashlib.md5(repr(filtros).encode("utf-8")).hexdigest()[:12]
+
+
+def _caminho_tile(filtros: Tuple[Tuple[str, str], ...], z: int, x: int, y: int) -> Path:
+    return _RAIZ_CACHE / _chave_filtros(filtros) / str(z) / str(x) / f"{y}.pbf"
+
+
+def _ler_versao_cache() -> Optional[str]:
+    try:
+        return _ARQUIVO_VERSAO.read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        return None
+
+
+def _gravar_versao_cache(versao: str) -> None:
+    _RAIZ_CACHE.mkdir(parents=True, exist_ok=True)
+    _ARQUIVO_VERSAO.write_text(versao, encoding="utf-8")
+
+
+def _garantir_versao() -> str:
+    """Descarta o cache se os dados mudaram sem passar pelo DataManager; retorna a versão."""
+    versao = data_manager.obter_versao()
+    if _ler_versao_cache() == versao:
+        return versao
+
+    with _lock_disco:
+        if _ler_versao_cache() == versao:
+            return versao
+        if _RAIZ_CACHE.exists():
+            for item in _RAIZ_CACHE.iterdir():
+                if item.is_dir():
+                    shutil.rmtree(item, ignore_errors=True)
+        _gravar_versao_cache(versao)
+    return versao
+
+
+def obter_tile(z: int, x: int, y: int, filtros: Optional[Dict[str, str]] = None) -> bytes:
+    """
+    Retorna o tile do cache em disco, gerando-o na primeira requisição.
+
+    O tile só é gravado se o cache ainda estiver na versão dos dados de que
+    foi gerado: uma escrita concorrente pode ter invalidado o mesmo tile
+    enquanto ele era montado.
+    """
+    filtros_norm = normalizar_filtros(filtros)
+    versao = _garantir_versao()
+
+    caminho = _caminho_tile(filtros_norm, z, x, y)
+    if caminho.exists():
+        return caminho.read_bytes()
+
+    # O índice usado é o da versão atual, igual ou posterior a ``versao``
+    dados = gerar_tile(z, x, y, filtros_norm)
+
+    with _lock_disco:
+        if _ler_versao_cache() == versao:
+            # Escrita atômica: outro processo pode ler o mesmo tile
+            caminho.parent.mkdir(parents=True, exist_ok=True)
+            temporario = caminho.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            temporario.write_bytes(dados)
+            os.replace(temporario, caminho)
+
+    return dados
+
+
+def invalidar_ponto(lat: float, lon: float) -> int:
+    """
+    Remove do disco os tiles (de todos os filtros e zooms) que contêm o ponto.
+
+    Returns:
+        Quantidade de arquivos removidos
+    """
+    removidos = 0
+    if not _RAIZ_CACHE.exists():
+        return removidos
+
+    with _lock_disco:
+        pastas_filtro = [p for p in _RAIZ_CACHE.iterdir() if p.is_dir()]
+        for z in range(TILES_CONFIG["min_zoom"], TILES_CONFIG["max_zoom"] + 1):
+            for x, y in tiles_do_ponto(lat, lon, z):
+                for pasta in pastas_filtro:
+                    caminho = pasta / str(z) / str(x) / f"{y}.pbf"
+                    try:
+                        caminho.unlink()
+                        removidos += 1
+                    except FileNotFoundError:
+                        pass
+    return removidos
+
+
+def _ao_alterar_dados(evento: str, ocorrencia: Dict, anterior: Optional[Dict]) -> None:
+    """Observador do DataManager: invalida só os tiles afetados pela escrita."""
+    with _lock_disco:
+        # Só é seguro avançar a versão se o cache refletia os dados antes da escrita
+        if _ler_versao_cache() != data_manager.versao_antes_da_escrita:
+            return
+
+        # Votos e comentários não aparecem nos tiles
+        if evento in ("adicionada", "atualizada"):
+            for registro in (anterior, ocorrencia):
+                if not registro:
+                    continue
+                try:
+                    lat = float(registro.get("latitude"))
+                    lon = float(registro.get("longitude"))
+                except (TypeError, ValueError):
+                    continue
+                invalidar_ponto(lat, lon)
+
+        _gravar_versao_cache(data_manager.versao_depois_da_escrita)
+
+
+data_manager.registrar_observador(_ao_alterar_dados)
@@ -0,0 +1,164 @@
+"""
+Índice de urgência por bairro e por célula de grade.
+
+Estende o antigo índice de urgência geral do dashboard (peso médio das
+prioridades) com os votos da comunidade e um decaimento pela idade do
+reporte; o índice geral passa a ser a média destas mesmas pontuações. A
+pontuação de cada ocorrência e as somas geral, por bairro e por célula são
+calculadas em uma única passada vetorizada (``np.bincount``), sem laços em
+Python, e guardadas por versão dos dados.
+"""
+import math
+from datetime import date, datetime
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from cache_utils import CacheLRU
+from config import PRIORIDADES, URGENCIA_CONFIG
+from data_manager import data_manager, normalizar_filtros
+from indice_espacial import celula, chave_celula, limites_celula, projetar
+
+_cache_urgencia = CacheLRU(max_bytes=32 * 1024 * 1024, max_entradas=64)
+
+
+def calcular_pontuacoes(df: pd.DataFrame, referencia: Optional[datetime] = None) -> np.ndarray:
+    """
+    Pontuação de urgência (0 a 1) de cada ocorrência.
+
+    A pontuação é o peso da prioridade multiplicado por
+    ``1 + peso_votos * log(1 + votos)`` (votos limitados a ``votos_max``) e
+    por ``0.5 ** (idade / meia_vida)`` (nunca abaixo de ``decaimento_minimo``:
+    um problema antigo ainda aberto continua contando), dividido pelo maior
+    valor possível. Assim os votos elevam também a pontuação de um reporte
+    crítico recente. Ocorrências fora de ``status_considerados`` valem zero.
+    """
+    if df.empty:
+        return np.zeros(0)
+
+    referencia = pd.Timestamp(referencia or datetime.now())
+    pesos = {p: info["peso"] for p, info in PRIORIDADES.items()}
+    peso_max = max(pesos.values())
+    padrao = pesos.get("Media", 1)
+
+    peso = df["prioridade"].map(pesos).fillna(padrao).to_numpy(dtype=float) if "prioridade" in df.columns \
+        else np.full(len(df), float(padrao))
+
+    if "votos" in df.columns:
+        votos = pd.to_numeric(df["votos"], errors="coerce").fillna(0).clip(0, URGENCIA_CONFIG["votos_max"]).to_numpy(dtype=float)
+    else:
+        votos = np.zeros(len(df))
+
+    if "data" in df.columns:
+        datas = pd.to_datetime(df["data"], errors="coerce")
+        idade = ((referencia - datas) / pd.Timedelta(days=1)).fillna(0).clip(lower=0).to_numpy(dtype=float)
+    else:
+        idade = np.zeros(len(df))
+
+    fator_votos_max = 1.0 + URGENCIA_CONFIG["peso_votos"] * math.log1p(URGENCIA_CONFIG["votos_max"])
+    pontuacoes = (
+        peso
+        * (1.0 + URGENCIA_CONFIG["peso_votos"] * np.log1p(votos))
+        * np.maximum(np.power(0.5, idade / URGENCIA_CONFIG["meia_vida_dias"]), URGENCIA_CONFIG["decaimento_minimo"])
+    ) / (peso_max * fator_votos_max)
+
+    if "status" in df.columns:
+        pontuacoes[~df["status"].isin(URGENCIA_CONFIG["status_considerados"]).to_numpy()] = 0.0
+    return pontuacoes
+
+
+def _agregar(codigos: np.ndarray, pontuacoes: np.ndarray, consideradas: np.ndarray, n: int) -> pd.DataFrame:
+    """Quantidade, carga (soma) e índice (média em %) por grupo."""
+    quantidade = np.bincount(codigos, weights=consideradas, minlength=n).astype(np.int64)
+    carga = np.bincount(codigos, weights=pontuacoes, minlength=n)
+    indice = np.divide(carga, quantidade, out=np.zeros(n), where=quantidade > 0) * 100
+    return pd.DataFrame({"quantidade": quantidade, "carga": carga.round(3), "indice": indice.round(1)})
+
+
+def calcular_urgencia(
+    df: pd.DataFrame,
+    referencia: Optional[datetime] = None,
+    celula_m: Optional[float] = None
+) -> Dict[str, pd.DataFrame]:
+    """
+    Calcula o índice de urgência geral, por bairro e por célula de grade.
+
+    Returns:
+        Dict com "geral" (uma linha: quantidade, carga, indice), "bairros" (bairro, quantidade, carga, indice) e "celulas"
+        (lat_min, lon_min, lat_max, lon_max, lat, lon, quantidade, carga,
+        indice), estes ordenados da maior para a menor carga e sem grupos
+        vazios. A carga soma as pontuações; o índice é a média em %.
+    """
+    celula_m = URGENCIA_CONFIG["celula_m"] if celula_m is None else celula_m
+    vazio = {
+        "geral": pd.DataFrame({"quantidade": [0], "carga": [0.0], "indice": [0.0]}),
+        "bairros": pd.DataFrame(columns=["bairro", "quantidade", "carga", "indice"]),
+        "celulas": pd.DataFrame(columns=["lat_min", "lon_min", "lat_max", "lon_max", "lat", "lon",
+                                         "quantidade", "carga", "indice"]),
+    }
+    if df.empty:
+        return vazio
+
+    pontuacoes = calcular_pontuacoes(df, referencia)
+    if "status" in df.columns:
+        consideradas = df["status"].isin(URGENCIA_CONFIG["status_considerados"]).to_numpy(dtype=float)
+    else:
+        consideradas = np.ones(len(df))
+
+    geral = _agregar(np.zeros(len(df), dtype=np.int64), pontuacoes, consideradas, 1)
+
+    # Por bairro
+    bairros = df["bairro"].fillna("Não informado") if "bairro" in df.columns else pd.Series(["Não informado"] * len(df))
+    codigos, rotulos = pd.factorize(bairros)
+    por_bairro = _agregar(codigos, pontuacoes, consideradas, len(rotulos))
+    por_bairro.insert(0, "bairro", np.asarray(rotulos, dtype=object))
+
+    # Por célula de grade (projeção local em metros, a mesma do índice espacial)
+    lat = pd.to_numeric(df.get("latitude"), errors="coerce").to_numpy(dtype=float)
+    lon = pd.to_numeric(df.get("longitude"), errors="coerce").to_numpy(dtype=float)
+    validos = ~(np.isnan(lat) | np.isnan(lon))
+    x, y = projetar(lat[validos], lon[validos])
+
+    # Fatoração por hash da chave combinada da célula (sem ordenar os pontos)
+    codigos_celula, chaves = pd.factorize(chave_celula(*celula(x, y, celula_m)))
+    por_celula = _agregar(codigos_celula, pontuacoes[validos], consideradas[validos], len(chaves))
+
+    limites = pd.DataFrame(limites_celula(chaves, celula_m))
+    limites["lat"] = (limites["lat_min"] + limites["lat_max"]) / 2
+    limites["lon"] = (limites["lon_min"] + limites["lon_max"]) / 2
+    por_celula = pd.concat([limites, por_celula], axis=1)
+
+    def _ordenar(resultado: pd.DataFrame) -> pd.DataFrame:
+        resultado = resultado[resultado["quantidade"] > 0]
+        return resultado.sort_values(["carga", "indice"], ascending=False, kind="stable").reset_index(drop=True)
+
+    return {"geral": geral, "bairros": _ordenar(por_bairro), "celulas": _ordenar(por_celula)}
+
+
+def obter_urgencia(filtros: Optional[Dict[str, str]] = None) -> Dict[str, pd.DataFrame]:
+    """
+    Índice de urgência das ocorrências atuais, compartilhado entre sessões.
+
+    Args:
+        filtros: Mesmos filtros do mapa (tipo, status, bairro, prioridade);
+            "Todos"/"Todas" não filtram
+
+    O resultado é guardado por (filtros, versão dos dados, dia), já que o
+    decaimento pela idade muda de um dia para o outro.
+    """
+    filtros_norm = normalizar_filtros(filtros)
+
+    def _calcular() -> Dict[str, pd.DataFrame]:
+        df = data_manager.carregar_todas_ocorrencias()
+        for campo, valor in filtros_norm:
+            if campo in df.columns:
+                df = df[df[campo] == valor]
+        return calcular_urgencia(df)
+
+    chave: Tuple = (filtros_norm, data_manager.obter_versao(), date.today())
+    return _cache_urgencia.obter_ou_criar(
+        chave,
+        _calcular,
+        lambda resultado: sum(int(t.memory_usage(deep=True).sum()) for t in resultado.values())
+    )
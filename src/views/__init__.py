@@ -1,8 +1,22 @@
 """
 Views da aplicação Mapa Digital Urbano.
-"""
-
 
+As páginas são importadas sob demanda: só o módulo da página selecionada
+(e suas dependências pesadas, como folium e plotly) é carregado.
+"""
+import importlib
+from types import ModuleType
 
+# Rótulo da navegação -> módulo da página (na ordem do menu)
+PAGINAS = {
+    "🗺️ Mapa Interativo": "mapa",
+    "📣 Reportar Problema": "reportar",
+    "📊 Dashboard": "dashboard",
+    "ℹ️ Sobre": "sobre",
+    "🔐 Admin": "admin",
+}
 
 
+def carregar_pagina(rotulo: str) -> ModuleType:
+    """Importa (uma única vez por processo) o módulo da página do menu."""
+    return importlib.import_module(f"{__name__}.{PAGINAS[rotulo]}")
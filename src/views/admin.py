@@ -4,21 +4,24 @@ Acesso restrito ao administrador
 """
 import streamlit as st
 import pandas as pd
-from datetime import datetime
 import sys
 from pathlib import Path
-import json
 
 # Adicionar src ao path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from data_manager import data_manager
-from config import TIPOS_OCORRENCIA, STATUS_OCORRENCIA, PRIORIDADES, IMAGES_DIR
+from config import TIPOS_OCORRENCIA, STATUS_OCORRENCIA, PRIORIDADES, IMAGES_DIR, TRIAGEM_CONFIG
+from fila_triagem import ordenar_para_triagem
+from ocorrencia import FONTE_USUARIO
 
 # Credenciais do administrador
 ADMIN_USER = "admin"
 ADMIN_PASS = "mapa2025"
 
+# Opcao da triagem em lote que nao altera o status
+MANTER_STATUS = "(manter status)"
+
 
 def verificar_login():
     """Verifica se o usuario esta logado."""
@@ -32,6 +35,110 @@ def fazer_logout():
     st.rerun()
 
 
+def _selecionar_ocorrencia(ocorrencia_id):
+    """
+    Callback dos botões "Gerenciar" e "Voltar".
+    
+    Roda antes da reexecução do fragmento que contém o botão, que assim já
+    exibe a nova seleção sem precisar de um st.rerun.
+    """
+    st.session_state["ocorrencia_selecionada"] = ocorrencia_id
+
+
+def _mostrar_mais():
+    """Callback do botao que exibe mais uma pagina da fila de triagem."""
+    exibidas = st.session_state.get("fila_exibidas", TRIAGEM_CONFIG["por_pagina"])
+    st.session_state["fila_exibidas"] = exibidas + TRIAGEM_CONFIG["por_pagina"]
+
+
+def _aplicar_em_lote(ocorrencia_ids, atualizacoes, comentario=""):
+    """
+    Atualiza as ocorrencias e registra o comentario em todas em uma unica gravacao.
+    
+    Se algo falhar, nada e gravado e o erro e exibido.
+    """
+    try:
+        with data_manager.transacao() as tx:
+            for ocorrencia_id in ocorrencia_ids:
+                if atualizacoes:
+                    tx.atualizar(ocorrencia_id, atualizacoes)
+                if comentario:
+                    tx.comentar(ocorrencia_id, comentario, "Administrador")
+    except Exception as e:
+        st.error(f"❌ Erro ao atualizar: {e}")
+        return False
+    return True
+
+
+def _aplicar_acao(ocorrencia_id, atualizacoes, comentario=""):
+    """Atualiza uma ocorrencia e registra o comentario em uma unica gravacao."""
+    return _aplicar_em_lote([ocorrencia_id], atualizacoes, comentario)
+
+
+def _chave_selecao(ocorrencia_id):
+    """
+    Chave do checkbox de selecao de uma ocorrencia.
+    
+    Inclui a "geracao" da triagem em lote: depois de aplicar um lote a geracao
+    muda e todos os checkboxes voltam desmarcados.
+    """
+    return f"sel_{st.session_state.get('lote_geracao', 0)}_{ocorrencia_id}"
+
+
+def _marcar_selecao(ocorrencia_ids, valor):
+    """Callback de "Selecionar todas" e "Limpar selecao"."""
+    for ocorrencia_id in ocorrencia_ids:
+        st.session_state[_chave_selecao(ocorrencia_id)] = valor
+
+
+def _triagem_em_lote(ids_editaveis):
+    """Muda o status e/ou comenta todas as ocorrencias selecionadas de uma vez."""
+    resultado = st.session_state.pop("lote_resultado", None)
+    if resultado:
+        st.success(resultado)
+    
+    selecionadas = [i for i in ids_editaveis if st.session_state.get(_chave_selecao(i))]
+    
+    with st.expander(f"☑️ Triagem em lote ({len(selecionadas)} selecionadas)", expanded=bool(selecionadas)):
+        col1, col2 = st.columns(2)
+        with col1:
+            st.button(
+                f"Selecionar todas as {len(ids_editaveis)} editaveis",
+                use_container_width=True,
+                disabled=not ids_editaveis,
+                on_click=_marcar_selecao,
+                args=(ids_editaveis, True)
+            )
+        with col2:
+            st.button(
+                "Limpar selecao",
+                use_container_width=True,
+                disabled=not selecionadas,
+                on_click=_marcar_selecao,
+                args=(ids_editaveis, False)
+            )
+        
+        with st.form("form_lote", clear_on_submit=True):
+            novo_status = st.selectbox("Novo Status", [MANTER_STATUS] + list(STATUS_OCORRENCIA.keys()))
+            comentario = st.text_area(
+                "Comentario para todas as selecionadas",
+                placeholder="Ex: Equipe de drenagem acionada para a regiao...",
+                height=80
+            )
+            aplicar = st.form_submit_button("💾 Aplicar as selecionadas", use_container_width=True, type="primary")
+        
+        if aplicar:
+            atualizacoes = {} if novo_status == MANTER_STATUS else {"status": novo_status}
+            if not selecionadas:
+                st.warning("Selecione ao menos uma ocorrencia editavel.")
+            elif not atualizacoes and not comentario.strip():
+                st.warning("Escolha um novo status ou escreva um comentario.")
+            elif _aplicar_em_lote(selecionadas, atualizacoes, comentario.strip()):
+                st.session_state["lote_geracao"] = st.session_state.get("lote_geracao", 0) + 1
+                st.session_state["lote_resultado"] = f"✅ {len(selecionadas)} ocorrencias atualizadas em uma unica gravacao."
+                st.rerun()
+
+
 def tela_login():
     """Renderiza a tela de login."""
     st.markdown("## 🔐 Acesso Administrativo")
@@ -87,32 +194,40 @@ def painel_administrativo():
     
     # Carregar dados
     df = data_manager.carregar_todas_ocorrencias()
-    reportes = data_manager._carregar_reportes()
     
     if df.empty:
         st.warning("📭 Nenhuma ocorrencia registrada ainda.")
         return
     
     # ================== METRICAS ==================
+    por_status = df["status"].value_counts()
     col1, col2, col3, col4, col5 = st.columns(5)
     
     with col1:
         st.metric("Total", len(df))
     with col2:
-        pendentes = len(df[df["status"] == "Pendente"])
-        st.metric("Pendentes", pendentes)
+        st.metric("Pendentes", int(por_status.get("Pendente", 0)))
     with col3:
-        em_analise = len(df[df["status"] == "Em Analise"])
-        st.metric("Em Analise", em_analise)
+        st.metric("Em Analise", int(por_status.get("Em Analise", 0)))
     with col4:
-        em_andamento = len(df[df["status"] == "Em Andamento"])
-        st.metric("Em Andamento", em_andamento)
+        st.metric("Em Andamento", int(por_status.get("Em Andamento", 0)))
     with col5:
-        resolvidos = len(df[df["status"] == "Resolvido"])
-        st.metric("Resolvidos", resolvidos)
+        st.metric("Resolvidos", int(por_status.get("Resolvido", 0)))
     
     st.markdown("---")
     
+    _gestao_ocorrencias()
+
+
+@st.fragment
+def _gestao_ocorrencias():
+    """
+    Abas de lista e de gerenciamento.
+    
+    Fragmento: os filtros da lista e os botões "Gerenciar" reexecutam só
+    estas abas, sem refazer as métricas, a sidebar e o cabeçalho. Ações que
+    alteram dados reexecutam o app inteiro, pois as contagens mudam.
+    """
     # ================== TABS PRINCIPAIS ==================
     tab_lista, tab_detalhe = st.tabs(["📋 Lista de Ocorrencias", "🔍 Gerenciar Ocorrencia"])
     
@@ -141,29 +256,31 @@ def painel_administrativo():
                 key="filtro_prioridade"
             )
         
-        # Aplicar filtros
-        df_filtrado = df.copy()
-        
-        if filtro_status != "Todos":
-            df_filtrado = df_filtrado[df_filtrado["status"] == filtro_status]
-        if filtro_tipo != "Todos":
-            df_filtrado = df_filtrado[df_filtrado["tipo"] == filtro_tipo]
-        if filtro_prioridade != "Todas":
-            df_filtrado = df_filtrado[df_filtrado["prioridade"] == filtro_prioridade]
-        
-        # Ordenar por prioridade e data
-        prioridade_ordem = {"Critica": 0, "Alta": 1, "Media": 2, "Baixa": 3}
-        df_filtrado["prioridade_ordem"] = df_filtrado["prioridade"].map(prioridade_ordem).fillna(4)
-        df_filtrado = df_filtrado.sort_values(["prioridade_ordem", "data"], ascending=[True, False])
+        # Aplicar filtros (máscara sobre o snapshot compartilhado, sem copiá-lo)
+        df_filtrado = data_manager.selecionar_ocorrencias({
+            "status": filtro_status,
+            "tipo": filtro_tipo,
+            "prioridade": filtro_prioridade
+        })
         
         st.markdown(f"**{len(df_filtrado)}** ocorrencias encontradas")
+        
+        # Só reportes do JSON podem ser alterados (o CSV original e somente leitura)
+        editaveis = (df_filtrado["fonte"] == FONTE_USUARIO).to_numpy(dtype=bool, na_value=False)
+        _triagem_em_lote([str(i) for i in df_filtrado["id"].to_numpy()[editaveis]])
         st.markdown("---")
         
         if df_filtrado.empty:
             st.info("Nenhuma ocorrencia com os filtros selecionados.")
         else:
+            # Só as primeiras da fila de triagem (prioridade, votos, espera e
+            # ocorrencias abertas proximas), sem ordenar todas as filtradas
+            exibidas = st.session_state.get("fila_exibidas", TRIAGEM_CONFIG["por_pagina"])
+            df_fila = ordenar_para_triagem(df_filtrado, exibidas)
+            st.caption(f"Mostrando {len(df_fila)} de {len(df_filtrado)}, na ordem da fila de triagem")
+            
             # Criar lista de ocorrencias como cards clicaveis
-            for idx, row in df_filtrado.iterrows():
+            for idx, row in df_fila.iterrows():
                 ocorrencia_id = str(row.get("id", idx))
                 tipo = row.get("tipo", "Nao informado")
                 bairro = row.get("bairro", "Nao informado")
@@ -181,7 +298,15 @@ def painel_administrativo():
                     usuario = "Anonimo"
                 
                 # Card da ocorrencia
-                col_card, col_btn = st.columns([4, 1])
+                col_sel, col_card, col_btn = st.columns([0.3, 4, 1])
+                
+                with col_sel:
+                    st.checkbox(
+                        "Selecionar",
+                        key=_chave_selecao(ocorrencia_id),
+                        label_visibility="collapsed",
+                        disabled=row.get("fonte") != FONTE_USUARIO
+                    )
                 
                 with col_card:
                     st.markdown(f"""
@@ -208,286 +333,226 @@ def painel_administrativo():
                     """, unsafe_allow_html=True)
                 
                 with col_btn:
-                    if st.button("⚙️ Gerenciar", key=f"btn_{ocorrencia_id}", use_container_width=True):
-                        st.session_state["ocorrencia_selecionada"] = ocorrencia_id
-                        st.rerun()
+                    st.button(
+                        "⚙️ Gerenciar",
+                        key=f"btn_{ocorrencia_id}",
+                        use_container_width=True,
+                        on_click=_selecionar_ocorrencia,
+                        args=(ocorrencia_id,)
+                    )
+            
+            if len(df_fila) < len(df_filtrado):
+                st.button(
+                    f"⬇️ Mostrar mais {TRIAGEM_CONFIG['por_pagina']}",
+                    use_container_width=True,
+                    on_click=_mostrar_mais
+                )
     
     with tab_detalhe:
-        ocorrencia_id = st.session_state.get("ocorrencia_selecionada")
+        _detalhe_ocorrencia()
+
+
+@st.fragment
+def _detalhe_ocorrencia():
+    """Detalhes e ações da ocorrência selecionada (fragmento dentro das abas)."""
+    ocorrencia_id = st.session_state.get("ocorrencia_selecionada")
+    if not ocorrencia_id:
+        st.info("👆 Selecione uma ocorrencia na aba 'Lista de Ocorrencias' para gerenciar.")
+        return
+    
+    ocorrencia = data_manager.obter_ocorrencia(ocorrencia_id)
+    if ocorrencia is None:
+        st.error("Ocorrencia nao encontrada.")
+        st.session_state["ocorrencia_selecionada"] = None
+        return
+    
+    # Botao voltar
+    st.button("⬅️ Voltar para Lista", on_click=_selecionar_ocorrencia, args=(None,))
+    
+    st.markdown("---")
+    
+    # ================== DETALHES DA OCORRENCIA ==================
+    col_info, col_acoes = st.columns([2, 1])
+    
+    with col_info:
+        st.markdown("### 📍 Detalhes da Ocorrencia")
         
-        if not ocorrencia_id:
-            st.info("👆 Selecione uma ocorrencia na aba 'Lista de Ocorrencias' para gerenciar.")
-            return
+        tipo = ocorrencia.tipo or "Nao informado"
+        bairro = ocorrencia.bairro or "Nao informado"
+        status = ocorrencia.status
+        prioridade = ocorrencia.prioridade
         
-        # Buscar ocorrencia
-        row = None
-        for idx, r in df.iterrows():
-            if str(r.get("id", idx)) == str(ocorrencia_id):
-                row = r
-                break
+        # Info basica
+        st.markdown(f"**ID:** `{ocorrencia_id}`")
+        st.markdown(f"**Tipo:** {tipo}")
+        st.markdown(f"**Bairro:** {bairro}")
         
-        if row is None:
-            st.error("Ocorrencia nao encontrada.")
-            st.session_state["ocorrencia_selecionada"] = None
-            return
+        # Data
+        data = ocorrencia.data_envio
+        st.markdown(f"**Data:** {data.strftime('%d/%m/%Y') if data else 'Nao informada'}")
         
-        # Botao voltar
-        if st.button("⬅️ Voltar para Lista"):
-            st.session_state["ocorrencia_selecionada"] = None
-            st.rerun()
+        # Coordenadas
+        lat = ocorrencia.latitude if ocorrencia.latitude is not None else "N/A"
+        lon = ocorrencia.longitude if ocorrencia.longitude is not None else "N/A"
+        st.markdown(f"**Coordenadas:** {lat}, {lon}")
         
+        # Descricao
         st.markdown("---")
+        st.markdown("**Descricao completa:**")
+        st.info(ocorrencia.descricao or "Sem descricao")
         
-        # ================== DETALHES DA OCORRENCIA ==================
-        col_info, col_acoes = st.columns([2, 1])
+        # Usuario
+        st.markdown(f"**Reportado por:** {ocorrencia.usuario}")
         
-        with col_info:
-            st.markdown("### 📍 Detalhes da Ocorrencia")
-            
-            tipo = row.get("tipo", "Nao informado")
-            bairro = row.get("bairro", "Nao informado")
-            status = row.get("status", "Pendente")
-            prioridade = row.get("prioridade", "Media")
-            
-            # Info basica
-            st.markdown(f"**ID:** `{ocorrencia_id}`")
-            st.markdown(f"**Tipo:** {tipo}")
-            st.markdown(f"**Bairro:** {bairro}")
-            
-            # Data
-            data = row.get("data", "Nao informada")
-            if pd.notna(data):
-                if hasattr(data, 'strftime'):
-                    data = data.strftime("%d/%m/%Y")
-            st.markdown(f"**Data:** {data}")
-            
-            # Coordenadas
-            lat = row.get("latitude", "N/A")
-            lon = row.get("longitude", "N/A")
-            st.markdown(f"**Coordenadas:** {lat}, {lon}")
-            
-            # Descricao
-            st.markdown("---")
-            st.markdown("**Descricao completa:**")
-            descricao = row.get("descricao", "Sem descricao")
-            if pd.isna(descricao):
-                descricao = "Sem descricao"
-            st.info(descricao)
-            
-            # Usuario
-            usuario = row.get("usuario", "Anonimo")
-            if pd.isna(usuario) or usuario == "":
-                usuario = "Anonimo"
-            st.markdown(f"**Reportado por:** {usuario}")
-            
-            # Votos
-            votos = row.get("votos", 0)
-            if pd.isna(votos):
-                votos = 0
-            st.markdown(f"**Apoios da comunidade:** 👍 {int(votos)}")
-            
-            # ================== FOTOS ==================
-            st.markdown("---")
-            st.markdown("**📷 Fotos anexadas:**")
-            
-            fotos = row.get("fotos", None)
-            
-            # Verificar se fotos existe e tem conteudo
-            fotos_lista = []
-            if fotos is not None and not (isinstance(fotos, float) and pd.isna(fotos)):
-                if isinstance(fotos, str):
-                    try:
-                        fotos_lista = json.loads(fotos)
-                    except:
-                        if fotos.strip():
-                            fotos_lista = [fotos]
-                elif isinstance(fotos, list):
-                    fotos_lista = fotos
-            
-            if fotos_lista and len(fotos_lista) > 0:
-                cols_fotos = st.columns(min(len(fotos_lista), 4))
-                for i, foto_path in enumerate(fotos_lista[:4]):
-                    with cols_fotos[i]:
-                        try:
-                            st.image(foto_path, use_container_width=True)
-                        except:
-                            st.caption(f"📷 {Path(foto_path).name}")
-            else:
-                st.caption("Nenhuma foto anexada.")
-            
-            # ================== HISTORICO DE INTERACOES ==================
-            st.markdown("---")
-            st.markdown("**💬 Historico de interacoes:**")
-            
-            comentarios = row.get("comentarios", None)
-            
-            # Verificar se comentarios existe e tem conteudo
-            comentarios_lista = []
-            if comentarios is not None and not (isinstance(comentarios, float) and pd.isna(comentarios)):
-                if isinstance(comentarios, str):
+        # Votos
+        st.markdown(f"**Apoios da comunidade:** 👍 {ocorrencia.votos}")
+        
+        # ================== FOTOS ==================
+        st.markdown("---")
+        st.markdown("**📷 Fotos anexadas:**")
+        
+        if ocorrencia.fotos:
+            cols_fotos = st.columns(min(len(ocorrencia.fotos), 4))
+            for i, foto_path in enumerate(ocorrencia.fotos[:4]):
+                with cols_fotos[i]:
                     try:
-                        comentarios_lista = json.loads(comentarios)
+                        st.image(foto_path, use_container_width=True)
                     except:
-                        comentarios_lista = []
-                elif isinstance(comentarios, list):
-                    comentarios_lista = comentarios
-            
-            if comentarios_lista and len(comentarios_lista) > 0:
-                for com in comentarios_lista:
-                    autor = com.get("autor", "Sistema")
-                    texto = com.get("texto", "")
-                    data_com = com.get("data", "")
-                    if data_com:
-                        try:
-                            data_com = datetime.fromisoformat(data_com).strftime("%d/%m/%Y %H:%M")
-                        except:
-                            pass
-                    
-                    st.markdown(f"""
-                    <div style="
-                        background: #2d2d2d;
-                        padding: 0.75rem;
-                        border-radius: 8px;
-                        margin-bottom: 0.5rem;
-                        border-left: 3px solid #3498db;
-                    ">
-                        <strong>{autor}</strong> <span style="color: #7f8c8d; font-size: 0.8rem;">({data_com})</span><br>
-                        <span style="color: #ddd;">{texto}</span>
-                    </div>
-                    """, unsafe_allow_html=True)
-            else:
-                st.caption("Nenhuma interacao registrada ainda.")
+                        st.caption(f"📷 {Path(foto_path).name}")
+        else:
+            st.caption("Nenhuma foto anexada.")
         
-        with col_acoes:
-            st.markdown("### ⚙️ Acoes")
-            
-            status_config = STATUS_OCORRENCIA.get(status, {"cor": "#7f8c8d", "icone": "❓"})
-            prioridade_config = PRIORIDADES.get(prioridade, {"cor": "#f39c12"})
-            
-            # Status atual
-            st.markdown(f"""
-            <div style="
-                background: {status_config['cor']};
-                color: white;
-                padding: 0.75rem 1rem;
-                border-radius: 8px;
-                text-align: center;
-                margin-bottom: 1rem;
-                font-weight: bold;
-            ">
-                Status Atual: {status}
-            </div>
-            """, unsafe_allow_html=True)
+        # ================== HISTORICO DE INTERACOES ==================
+        st.markdown("---")
+        st.markdown("**💬 Historico de interacoes:**")
+        
+        if ocorrencia.comentarios:
+            for com in ocorrencia.comentarios:
+                autor = com.autor
+                texto = com.texto
+                data_com = com.data.strftime("%d/%m/%Y %H:%M") if com.data else ""
+                
+                st.markdown(f"""
+                <div style="
+                    background: #2d2d2d;
+                    padding: 0.75rem;
+                    border-radius: 8px;
+                    margin-bottom: 0.5rem;
+                    border-left: 3px solid #3498db;
+                ">
+                    <strong>{autor}</strong> <span style="color: #7f8c8d; font-size: 0.8rem;">({data_com})</span><br>
+                    <span style="color: #ddd;">{texto}</span>
+                </div>
+                """, unsafe_allow_html=True)
+        else:
+            st.caption("Nenhuma interacao registrada ainda.")
+    
+    with col_acoes:
+        st.markdown("### ⚙️ Acoes")
+        
+        status_config = STATUS_OCORRENCIA.get(status, {"cor": "#7f8c8d", "icone": "❓"})
+        prioridade_config = PRIORIDADES.get(prioridade, {"cor": "#f39c12"})
+        
+        # Status atual
+        st.markdown(f"""
+        <div style="
+            background: {status_config['cor']};
+            color: white;
+            padding: 0.75rem 1rem;
+            border-radius: 8px;
+            text-align: center;
+            margin-bottom: 1rem;
+            font-weight: bold;
+        ">
+            Status Atual: {status}
+        </div>
+        """, unsafe_allow_html=True)
+        
+        # Prioridade atual
+        st.markdown(f"""
+        <div style="
+            background: {prioridade_config['cor']};
+            color: white;
+            padding: 0.75rem 1rem;
+            border-radius: 8px;
+            text-align: center;
+            margin-bottom: 1rem;
+            font-weight: bold;
+        ">
+            Prioridade: {prioridade}
+        </div>
+        """, unsafe_allow_html=True)
+        
+        st.markdown("---")
+        
+        # Verificar se e um reporte do JSON (editavel)
+        if not ocorrencia.editavel:
+            st.warning("⚠️ Esta ocorrencia e do CSV original e nao pode ser editada.")
+            return
+        
+        # Formulario de atualizacao
+        st.markdown("#### Atualizar Ocorrencia")
+        
+        with st.form(f"form_atualizar_{ocorrencia_id}"):
+            novo_status = st.selectbox(
+                "Novo Status",
+                list(STATUS_OCORRENCIA.keys()),
+                index=list(STATUS_OCORRENCIA.keys()).index(status) if status in STATUS_OCORRENCIA else 0
+            )
             
-            # Prioridade atual
-            st.markdown(f"""
-            <div style="
-                background: {prioridade_config['cor']};
-                color: white;
-                padding: 0.75rem 1rem;
-                border-radius: 8px;
-                text-align: center;
-                margin-bottom: 1rem;
-                font-weight: bold;
-            ">
-                Prioridade: {prioridade}
-            </div>
-            """, unsafe_allow_html=True)
+            nova_prioridade = st.selectbox(
+                "Nova Prioridade",
+                list(PRIORIDADES.keys()),
+                index=list(PRIORIDADES.keys()).index(prioridade) if prioridade in PRIORIDADES else 1
+            )
             
-            st.markdown("---")
+            comentario = st.text_area(
+                "Adicionar Comentario",
+                placeholder="Ex: Equipe enviada para verificacao local...",
+                height=100
+            )
             
-            # Verificar se e um reporte do JSON (editavel)
-            reporte_editavel = None
-            for rep in reportes:
-                if str(rep.get("id")) == str(ocorrencia_id):
-                    reporte_editavel = rep
-                    break
+            col_btn1, col_btn2 = st.columns(2)
             
-            if not reporte_editavel:
-                st.warning("⚠️ Esta ocorrencia e do CSV original e nao pode ser editada.")
-                return
+            with col_btn1:
+                atualizar = st.form_submit_button("💾 Salvar", use_container_width=True, type="primary")
             
-            # Formulario de atualizacao
-            st.markdown("#### Atualizar Ocorrencia")
+            with col_btn2:
+                finalizar = st.form_submit_button("✅ Finalizar", use_container_width=True)
             
-            with st.form(f"form_atualizar_{ocorrencia_id}"):
-                novo_status = st.selectbox(
-                    "Novo Status",
-                    list(STATUS_OCORRENCIA.keys()),
-                    index=list(STATUS_OCORRENCIA.keys()).index(status) if status in STATUS_OCORRENCIA else 0
-                )
-                
-                nova_prioridade = st.selectbox(
-                    "Nova Prioridade",
-                    list(PRIORIDADES.keys()),
-                    index=list(PRIORIDADES.keys()).index(prioridade) if prioridade in PRIORIDADES else 1
-                )
-                
-                comentario = st.text_area(
-                    "Adicionar Comentario",
-                    placeholder="Ex: Equipe enviada para verificacao local...",
-                    height=100
-                )
+            if atualizar:
+                atualizacoes = {
+                    "status": novo_status,
+                    "prioridade": nova_prioridade
+                }
                 
-                col_btn1, col_btn2 = st.columns(2)
-                
-                with col_btn1:
-                    atualizar = st.form_submit_button("💾 Salvar", use_container_width=True, type="primary")
-                
-                with col_btn2:
-                    finalizar = st.form_submit_button("✅ Finalizar", use_container_width=True)
-                
-                if atualizar:
-                    atualizacoes = {
-                        "status": novo_status,
-                        "prioridade": nova_prioridade
-                    }
-                    
-                    # Adicionar comentario se houver
-                    if comentario.strip():
-                        data_manager.adicionar_comentario(
-                            ocorrencia_id,
-                            comentario.strip(),
-                            "Administrador"
-                        )
-                    
-                    # Atualizar ocorrencia
-                    if data_manager.atualizar_ocorrencia(ocorrencia_id, atualizacoes):
-                        st.success("✅ Ocorrencia atualizada com sucesso!")
-                        st.rerun()
-                    else:
-                        st.error("❌ Erro ao atualizar")
-                
-                if finalizar:
-                    data_manager.atualizar_ocorrencia(ocorrencia_id, {"status": "Resolvido"})
-                    data_manager.adicionar_comentario(
-                        ocorrencia_id, 
-                        "Ocorrencia finalizada pelo administrador.", 
-                        "Administrador"
-                    )
-                    st.success("✅ Ocorrencia marcada como RESOLVIDA!")
+                # Atualizar ocorrencia (e comentar, se houver) em uma gravacao
+                if _aplicar_acao(ocorrencia_id, atualizacoes, comentario.strip()):
+                    st.success("✅ Ocorrencia atualizada com sucesso!")
                     st.rerun()
             
-            # Botoes de acao rapida
-            st.markdown("---")
-            st.markdown("#### Acoes Rapidas")
-            
-            if status == "Pendente":
-                if st.button("🔍 Marcar Em Analise", use_container_width=True):
-                    data_manager.atualizar_ocorrencia(ocorrencia_id, {"status": "Em Analise"})
-                    data_manager.adicionar_comentario(ocorrencia_id, "Ocorrencia em analise.", "Administrador")
+            if finalizar:
+                if _aplicar_acao(ocorrencia_id, {"status": "Resolvido"}, "Ocorrencia finalizada pelo administrador."):
+                    st.success("✅ Ocorrencia marcada como RESOLVIDA!")
                     st.rerun()
-            
-            if status in ["Pendente", "Em Analise"]:
-                if st.button("🔧 Iniciar Atendimento", use_container_width=True):
-                    data_manager.atualizar_ocorrencia(ocorrencia_id, {"status": "Em Andamento"})
-                    data_manager.adicionar_comentario(ocorrencia_id, "Atendimento iniciado.", "Administrador")
+        
+        # Botoes de acao rapida
+        st.markdown("---")
+        st.markdown("#### Acoes Rapidas")
+        
+        if status == "Pendente":
+            if st.button("🔍 Marcar Em Analise", use_container_width=True):
+                if _aplicar_acao(ocorrencia_id, {"status": "Em Analise"}, "Ocorrencia em analise."):
                     st.rerun()
-            
-            if status != "Arquivado":
-                if st.button("📁 Arquivar", use_container_width=True):
-                    data_manager.atualizar_ocorrencia(ocorrencia_id, {"status": "Arquivado"})
-                    data_manager.adicionar_comentario(ocorrencia_id, "Ocorrencia arquivada.", "Administrador")
+        
+        if status in ["Pendente", "Em Analise"]:
+            if st.button("🔧 Iniciar Atendimento", use_container_width=True):
+                if _aplicar_acao(ocorrencia_id, {"status": "Em Andamento"}, "Atendimento iniciado."):
+                    st.rerun()
+        
+        if status != "Arquivado":
+            if st.button("📁 Arquivar", use_container_width=True):
+                if _aplicar_acao(ocorrencia_id, {"status": "Arquivado"}, "Ocorrencia arquivada."):
                     st.rerun()
 
 
@@ -6,6 +6,7 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
+from functools import partial
 import sys
 from pathlib import Path
 
@@ -13,7 +14,231 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from data_manager import data_manager
-from config import TIPOS_OCORRENCIA, STATUS_OCORRENCIA, PRIORIDADES
+from incidentes import obter_agrupador
+from cubo_agregados import obter_cubo, obter_estatisticas
+from cache_utils import CacheLRU
+from linha_tempo import RESOLUCOES, agregar, intervalo_do_balde
+from urgencia import obter_urgencia
+from exportacao import baixar
+from pintura_progressiva import adiar, preencher, reservar
+from config import TIPOS_OCORRENCIA, STATUS_OCORRENCIA, PRIORIDADES, CACHE_CONFIG, URGENCIA_CONFIG
+
+# Figuras prontas por (gráfico, filtros, versão dos dados), compartilhadas entre sessões
+_cache_figuras = CacheLRU(max_bytes=CACHE_CONFIG["figuras_max_bytes"])
+
+# Tamanho estimado de uma figura guardada (medido pelo JSON do Plotly):
+# base (layout), mais um tanto por traço e por ponto
+_BYTES_FIGURA, _BYTES_TRACO, _BYTES_PONTO = 4096, 512, 64
+
+# Gráfico -> (dimensão do cubo, campo do ponto selecionado com o rótulo)
+GRAFICOS_FILTRO = {
+    "tipo": ("tipo", "label"),
+    "status": ("status", "y"),
+    "bairro": ("bairro", "x"),
+    "prioridade": ("prioridade", "x"),
+}
+
+
+def _chave_grafico(nome: str) -> str:
+    """Chave do widget; muda ao limpar os filtros para descartar as seleções."""
+    return f"dash_{nome}_{st.session_state.get('dash_rodada_filtros', 0)}"
+
+
+def _pontos_selecionados(nome: str) -> list:
+    estado = st.session_state.get(_chave_grafico(nome))
+    if not estado:
+        return []
+    return estado.get("selection", {}).get("points", [])
+
+
+def _ler_filtros_cruzados():
+    """
+    Converte as seleções feitas nos gráficos em filtros do cubo.
+
+    Returns:
+        Tupla (filtros por dimensão, início, fim do período selecionado)
+    """
+    filtros = {}
+    for nome, (dimensao, campo) in GRAFICOS_FILTRO.items():
+        rotulos = [p.get(campo) for p in _pontos_selecionados(nome) if p.get(campo) is not None]
+        if rotulos:
+            filtros[dimensao] = sorted(set(rotulos))
+
+    inicio, fim = st.session_state.get("dash_periodo") or (None, None)
+    return filtros, inicio, fim
+
+
+def _ao_selecionar_periodo(chave: str):
+    """
+    Callback da linha do tempo: o intervalo clicado vira o período filtrado.
+    
+    Em resolução mais grossa que dia, a linha do tempo também desce para o
+    intervalo clicado (drill-down), exibido na resolução adequada.
+    """
+    estado = st.session_state.get(chave)
+    pontos = estado.get("selection", {}).get("points", []) if estado else []
+    datas = pd.to_datetime([p.get("x") for p in pontos if p.get("x") is not None], errors="coerce").dropna()
+    if not len(datas):
+        return
+    
+    resolucao = st.session_state.get("dash_timeline_resolucao", "dia")
+    inicio = intervalo_do_balde(datas.min(), resolucao)[0]
+    fim = intervalo_do_balde(datas.max(), resolucao)[1]
+    st.session_state["dash_periodo"] = (inicio, fim)
+    if resolucao != "dia":
+        st.session_state.setdefault("dash_timeline_zoom", []).append((inicio, fim))
+
+
+def _limpar_filtros_cruzados():
+    """Callback do botão "Limpar filtros": descarta seleções, período e drill-down."""
+    st.session_state["dash_rodada_filtros"] = st.session_state.get("dash_rodada_filtros", 0) + 1
+    st.session_state["dash_periodo"] = None
+    st.session_state["dash_timeline_zoom"] = []
+
+
+def _voltar_timeline():
+    """Callback do botão "Voltar" da linha do tempo: sobe um nível de detalhe."""
+    zoom = st.session_state.get("dash_timeline_zoom", [])
+    if zoom:
+        zoom.pop()
+    st.session_state["dash_periodo"] = zoom[-1] if zoom else None
+
+
+def _obter_figura(grafico: str, chave_filtros: tuple, construir, pontos: int) -> go.Figure:
+    """
+    Retorna a figura do cache ou a constrói.
+    
+    O tamanho da entrada é estimado a partir de ``pontos`` (quantidade de
+    valores plotados) e do número de traços, sem serializar a figura. As
+    figuras guardadas são compartilhadas entre sessões e não devem ser
+    alteradas depois de obtidas.
+    """
+    chave = (grafico, chave_filtros, data_manager.obter_versao())
+    return _cache_figuras.obter_ou_criar(
+        chave,
+        construir,
+        lambda figura: _BYTES_FIGURA + _BYTES_TRACO * len(figura.data) + _BYTES_PONTO * pontos
+    )
+
+
+def _figura_tipo(por_tipo: dict) -> go.Figure:
+    df_tipo = pd.DataFrame({
+        "Tipo": list(por_tipo.keys()),
+        "Quantidade": list(por_tipo.values())
+    })
+    
+    cores = [TIPOS_OCORRENCIA.get(t, {}).get("cor", "#7f8c8d") for t in df_tipo["Tipo"]]
+    
+    fig_tipo = px.pie(
+        df_tipo,
+        values="Quantidade",
+        names="Tipo",
+        color_discrete_sequence=cores,
+        hole=0.4
+    )
+    fig_tipo.update_layout(
+        margin=dict(t=20, b=20, l=20, r=20),
+        legend=dict(orientation="h", yanchor="bottom", y=-0.2)
+    )
+    fig_tipo.update_traces(textposition='inside', textinfo='percent+label')
+    return fig_tipo
+
+
+def _figura_status(por_status: dict) -> go.Figure:
+    df_status = pd.DataFrame({
+        "Status": list(por_status.keys()),
+        "Quantidade": list(por_status.values())
+    })
+    
+    # Ordenar por quantidade
+    df_status = df_status.sort_values("Quantidade", ascending=True)
+    
+    cores_status = [STATUS_OCORRENCIA.get(s, {}).get("cor", "#7f8c8d") for s in df_status["Status"]]
+    
+    fig_status = px.bar(
+        df_status,
+        x="Quantidade",
+        y="Status",
+        orientation="h",
+        color="Status",
+        color_discrete_sequence=cores_status
+    )
+    fig_status.update_layout(
+        margin=dict(t=20, b=20, l=20, r=20),
+        showlegend=False,
+        xaxis_title="",
+        yaxis_title=""
+    )
+    return fig_status
+
+
+def _figura_bairro(df_bairro: pd.DataFrame) -> go.Figure:
+    fig_bairro = px.bar(
+        df_bairro,
+        x="Bairro",
+        y="Quantidade",
+        color="Quantidade",
+        color_continuous_scale="RdYlGn_r"
+    )
+    fig_bairro.update_layout(
+        margin=dict(t=20, b=60, l=20, r=20),
+        xaxis_tickangle=-45,
+        coloraxis_showscale=False
+    )
+    return fig_bairro
+
+
+def _figura_timeline(baldes: pd.DataFrame, resolucao: str) -> go.Figure:
+    df_por_periodo = baldes.rename(columns={"inicio": "data_dia", "quantidade": "Quantidade"})
+    
+    fig_timeline = px.area(
+        df_por_periodo,
+        x="data_dia",
+        y="Quantidade",
+        title="",
+        markers=resolucao != "dia",
+        hover_data={"fim": "|%d/%m/%Y"},
+        color_discrete_sequence=["#3498db"]
+    )
+    fig_timeline.update_layout(
+        margin=dict(t=20, b=20, l=20, r=20),
+        xaxis_title=f"Data (por {RESOLUCOES[resolucao][1].lower()})",
+        yaxis_title="Ocorrências"
+    )
+    fig_timeline.update_traces(
+        fill='tozeroy',
+        line=dict(width=2)
+    )
+    return fig_timeline
+
+
+def _figura_prioridade(por_prioridade: dict) -> go.Figure:
+    df_prioridade = pd.DataFrame({
+        "Prioridade": list(por_prioridade.keys()),
+        "Quantidade": list(por_prioridade.values())
+    })
+    
+    # Ordenar por peso
+    ordem = ["Baixa", "Media", "Alta", "Critica"]
+    df_prioridade["ordem"] = df_prioridade["Prioridade"].map(
+        {p: i for i, p in enumerate(ordem)}
+    )
+    df_prioridade = df_prioridade.sort_values("ordem")
+    
+    cores_prioridade = [PRIORIDADES.get(p, {}).get("cor", "#7f8c8d") for p in df_prioridade["Prioridade"]]
+    
+    fig_prioridade = px.bar(
+        df_prioridade,
+        x="Prioridade",
+        y="Quantidade",
+        color="Prioridade",
+        color_discrete_sequence=cores_prioridade
+    )
+    fig_prioridade.update_layout(
+        margin=dict(t=20, b=20, l=20, r=20),
+        showlegend=False
+    )
+    return fig_prioridade
 
 
 def render():
@@ -22,18 +247,22 @@ def render():
     st.markdown("## 📊 Dashboard de Ocorrências")
     st.markdown("Análise em tempo real dos problemas urbanos reportados pela comunidade.")
     
-    # Carregar dados
-    df = data_manager.carregar_todas_ocorrencias()
-    stats = data_manager.obter_estatisticas()
+    # Indicadores a partir de estruturas pré-calculadas (cubo, datas ordenadas)
+    stats = obter_estatisticas()
     
-    if df.empty:
+    if stats["total"] == 0:
         st.warning("📭 Nenhuma ocorrência registrada. Os dados aparecerão aqui após o primeiro reporte.")
         return
     
+    # Agrupamento de incidentes e índice de urgência são montados em segundo
+    # plano enquanto os KPIs e os gráficos (do cubo) são desenhados
+    futuro_incidentes = adiar(lambda: obter_agrupador().quantidade_incidentes)
+    futuro_urgencia = adiar(obter_urgencia)
+    
     # ================== KPIs PRINCIPAIS ==================
     st.markdown("### 📈 Indicadores Principais")
     
-    col1, col2, col3, col4, col5 = st.columns(5)
+    col1, col2, col3, col4, col5, col6 = st.columns(6)
     
     with col1:
         st.metric(
@@ -42,6 +271,9 @@ def render():
             help="Número total de problemas reportados"
         )
     
+    with col6:
+        espaco_incidentes = reservar("⏳ Incidentes...")
+    
     with col2:
         pendentes = stats["por_status"].get("Pendente", 0)
         st.metric(
@@ -67,14 +299,153 @@ def render():
         )
     
     with col5:
+        semana = data_manager.obter_kpi_periodo(7)
         st.metric(
             "Últimos 7 dias",
-            stats["ultimos_7_dias"],
-            help="Ocorrências dos últimos 7 dias"
+            semana["atual"],
+            delta=f"{semana['delta']:+d} vs. 7 dias anteriores",
+            delta_color="inverse",
+            help="Ocorrências dos últimos 7 dias, comparadas às dos 7 dias anteriores"
         )
     
     st.markdown("---")
     
+    _graficos_cruzados()
+    
+    # ================== URGÊNCIA POR BAIRRO ==================
+    st.markdown("#### 🧭 Ranking de Urgência por Bairro")
+    st.caption(
+        "Ocorrências abertas ponderadas pela prioridade, pelos votos da comunidade "
+        "e pela idade do reporte. A carga soma as pontuações; o índice é a média."
+    )
+    
+    espaco_urgencia = reservar("⏳ Calculando urgência...")
+    
+    # ================== EXPORTAR RELATÓRIO ==================
+    st.markdown("---")
+    
+    with st.expander("📥 Exportar Relatório"):
+        _exportar_relatorio(stats)
+    
+    # ================== PREENCHIMENTO DOS ESPAÇOS ==================
+    preencher(espaco_incidentes, futuro_incidentes, lambda quantidade: st.metric(
+        "Incidentes",
+        quantidade,
+        help="Problemas físicos distintos (reportes próximos do mesmo tipo contam uma vez)"
+    ))
+    preencher(espaco_urgencia, futuro_urgencia, _exibir_urgencia)
+
+
+def _exibir_urgencia(urgencia: dict):
+    """Índice geral e tabelas do ranking de urgência por bairro e por célula."""
+    if not urgencia["bairros"].empty:
+        geral = urgencia["geral"].iloc[0]
+        st.markdown("**Índice de Urgência Geral**")
+        st.progress(min(float(geral["indice"]) / 100, 1.0))
+        st.caption(f"{geral['indice']:.1f}% nas {int(geral['quantidade'])} ocorrências abertas (quanto maior, mais urgente)")
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.dataframe(
+                urgencia["bairros"].rename(columns={
+                    "bairro": "Bairro",
+                    "quantidade": "Abertas",
+                    "carga": "Carga",
+                    "indice": "Índice (%)"
+                }),
+                use_container_width=True,
+                hide_index=True
+            )
+        
+        with col2:
+            celulas = urgencia["celulas"].head(10)
+            st.dataframe(
+                pd.DataFrame({
+                    "Local (centro da célula)": [f"{lat:.5f}, {lon:.5f}" for lat, lon in zip(celulas["lat"], celulas["lon"])],
+                    "Abertas": celulas["quantidade"],
+                    "Carga": celulas["carga"],
+                    "Índice (%)": celulas["indice"]
+                }),
+                use_container_width=True,
+                hide_index=True
+            )
+            st.caption(f"10 células de {URGENCIA_CONFIG['celula_m']} m mais urgentes (veja a aba Urgência do mapa)")
+    else:
+        st.success("✅ Nenhuma ocorrência aberta!")
+
+
+def _exportar_relatorio(stats: dict):
+    """Botões de download do relatório (CSV completo e resumo em texto)."""
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        # O CSV só é gerado se o botão for clicado (e reaproveitado depois)
+        st.download_button(
+            "📄 Baixar Dados Completos (CSV)",
+            baixar("csv"),
+            "ocorrencias_completo.csv",
+            "text/csv",
+            use_container_width=True
+        )
+    
+    with col2:
+        # Resumo em texto
+        resumo = f"""
+RELATÓRIO DE OCORRÊNCIAS URBANAS
+================================
+Gerado em: {datetime.now().strftime('%d/%m/%Y %H:%M')}
+
+RESUMO GERAL
+- Total de Ocorrências: {stats['total']}
+- Taxa de Resolução: {stats['taxa_resolucao']}%
+- Últimos 7 dias: {stats['ultimos_7_dias']}
+
+POR TIPO:
+{chr(10).join([f"  - {k}: {v}" for k, v in stats['por_tipo'].items()])}
+
+POR STATUS:
+{chr(10).join([f"  - {k}: {v}" for k, v in stats['por_status'].items()])}
+
+POR BAIRRO:
+{chr(10).join([f"  - {k}: {v}" for k, v in stats['por_bairro'].items()])}
+        """
+        
+        st.download_button(
+            "📊 Baixar Resumo (TXT)",
+            resumo,
+            "resumo_ocorrencias.txt",
+            "text/plain",
+            use_container_width=True
+        )
+
+
+@st.fragment
+def _graficos_cruzados():
+    """
+    Gráficos com filtro cruzado (tipo, status, bairro, linha do tempo e prioridade).
+    
+    Fragmento: clicar em um gráfico reexecuta só este grupo; os KPIs, o
+    ranking de urgência e a exportação, que não dependem das seleções, ficam
+    como estão. Os dados vêm do cubo, as seleções do session_state.
+    """
+    # ================== FILTRO CRUZADO ==================
+    cubo = obter_cubo()
+    filtros, inicio, fim = _ler_filtros_cruzados()
+    chave_filtros = (tuple(sorted((d, tuple(v)) for d, v in filtros.items())), inicio, fim)
+    
+    if filtros or inicio is not None:
+        descricao = [f"**{d.capitalize()}**: {', '.join(v)}" for d, v in filtros.items()]
+        if inicio is not None:
+            descricao.append(f"**Período**: {inicio:%d/%m/%Y} a {fim:%d/%m/%Y}")
+        col_filtro, col_limpar = st.columns([4, 1])
+        with col_filtro:
+            st.info("🔎 Filtro cruzado: " + " · ".join(descricao))
+        with col_limpar:
+            st.button("✖️ Limpar filtros", use_container_width=True, on_click=_limpar_filtros_cruzados)
+    else:
+        st.caption("💡 Clique nos gráficos para filtrar os demais (selecione um período na linha do tempo).")
+    
     # ================== GRÁFICOS ==================
     col_esq, col_dir = st.columns(2)
     
@@ -82,28 +453,14 @@ def render():
         # Gráfico de pizza - Por Tipo
         st.markdown("#### 🏷️ Distribuição por Tipo")
         
-        if stats["por_tipo"]:
-            df_tipo = pd.DataFrame({
-                "Tipo": list(stats["por_tipo"].keys()),
-                "Quantidade": list(stats["por_tipo"].values())
-            })
+        por_tipo = cubo.contar_por("tipo", filtros, inicio, fim)
+        if por_tipo:
+            fig_tipo = _obter_figura("tipo", chave_filtros, lambda: _figura_tipo(por_tipo), len(por_tipo))
             
-            cores = [TIPOS_OCORRENCIA.get(t, {}).get("cor", "#7f8c8d") for t in df_tipo["Tipo"]]
-            
-            fig_tipo = px.pie(
-                df_tipo,
-                values="Quantidade",
-                names="Tipo",
-                color_discrete_sequence=cores,
-                hole=0.4
-            )
-            fig_tipo.update_layout(
-                margin=dict(t=20, b=20, l=20, r=20),
-                legend=dict(orientation="h", yanchor="bottom", y=-0.2)
+            st.plotly_chart(
+                fig_tipo, use_container_width=True,
+                key=_chave_grafico("tipo"), on_select="rerun", selection_mode="points"
             )
-            fig_tipo.update_traces(textposition='inside', textinfo='percent+label')
-            
-            st.plotly_chart(fig_tipo, use_container_width=True)
         else:
             st.info("Sem dados para exibir")
     
@@ -111,33 +468,14 @@ def render():
         # Gráfico de barras - Por Status
         st.markdown("#### 📊 Status das Ocorrências")
         
-        if stats["por_status"]:
-            df_status = pd.DataFrame({
-                "Status": list(stats["por_status"].keys()),
-                "Quantidade": list(stats["por_status"].values())
-            })
-            
-            # Ordenar por quantidade
-            df_status = df_status.sort_values("Quantidade", ascending=True)
-            
-            cores_status = [STATUS_OCORRENCIA.get(s, {}).get("cor", "#7f8c8d") for s in df_status["Status"]]
+        por_status = cubo.contar_por("status", filtros, inicio, fim)
+        if por_status:
+            fig_status = _obter_figura("status", chave_filtros, lambda: _figura_status(por_status), len(por_status))
             
-            fig_status = px.bar(
-                df_status,
-                x="Quantidade",
-                y="Status",
-                orientation="h",
-                color="Status",
-                color_discrete_sequence=cores_status
+            st.plotly_chart(
+                fig_status, use_container_width=True,
+                key=_chave_grafico("status"), on_select="rerun", selection_mode="points"
             )
-            fig_status.update_layout(
-                margin=dict(t=20, b=20, l=20, r=20),
-                showlegend=False,
-                xaxis_title="",
-                yaxis_title=""
-            )
-            
-            st.plotly_chart(fig_status, use_container_width=True)
         else:
             st.info("Sem dados para exibir")
     
@@ -146,26 +484,19 @@ def render():
     # ================== ANÁLISE POR BAIRRO ==================
     st.markdown("### 🏘️ Ocorrências por Bairro")
     
-    if stats["por_bairro"]:
+    por_bairro = cubo.contar_por("bairro", filtros, inicio, fim)
+    if por_bairro:
         df_bairro = pd.DataFrame({
-            "Bairro": list(stats["por_bairro"].keys()),
-            "Quantidade": list(stats["por_bairro"].values())
+            "Bairro": list(por_bairro.keys()),
+            "Quantidade": list(por_bairro.values())
         }).sort_values("Quantidade", ascending=False)
         
-        fig_bairro = px.bar(
-            df_bairro,
-            x="Bairro",
-            y="Quantidade",
-            color="Quantidade",
-            color_continuous_scale="RdYlGn_r"
-        )
-        fig_bairro.update_layout(
-            margin=dict(t=20, b=60, l=20, r=20),
-            xaxis_tickangle=-45,
-            coloraxis_showscale=False
-        )
+        fig_bairro = _obter_figura("bairro", chave_filtros, lambda: _figura_bairro(df_bairro), len(df_bairro))
         
-        st.plotly_chart(fig_bairro, use_container_width=True)
+        st.plotly_chart(
+            fig_bairro, use_container_width=True,
+            key=_chave_grafico("bairro"), on_select="rerun", selection_mode="points"
+        )
         
         # Ranking de bairros
         col1, col2 = st.columns(2)
@@ -187,79 +518,66 @@ def render():
     # ================== TIMELINE ==================
     st.markdown("### 📅 Linha do Tempo")
     
-    if "data" in df.columns:
-        df_timeline = df.copy()
-        df_timeline["data"] = pd.to_datetime(df_timeline["data"], errors="coerce")
-        df_timeline = df_timeline.dropna(subset=["data"])
+    # A linha do tempo ignora o próprio período selecionado para permitir ajustá-lo
+    serie = cubo.serie_diaria(filtros)
+    if not serie.empty:
+        zoom = st.session_state.get("dash_timeline_zoom", [])
+        vis_inicio, vis_fim = zoom[-1] if zoom else (serie.index[0], serie.index[-1])
+        baldes, resolucao = agregar(serie.index, serie.to_numpy(), vis_inicio, vis_fim)
+        st.session_state["dash_timeline_resolucao"] = resolucao
         
-        if not df_timeline.empty:
-            # Agrupar por dia
-            df_timeline["data_dia"] = df_timeline["data"].dt.date
-            df_por_dia = df_timeline.groupby("data_dia").size().reset_index(name="Quantidade")
-            df_por_dia["data_dia"] = pd.to_datetime(df_por_dia["data_dia"])
-            
-            fig_timeline = px.area(
-                df_por_dia,
-                x="data_dia",
-                y="Quantidade",
-                title="",
-                color_discrete_sequence=["#3498db"]
-            )
-            fig_timeline.update_layout(
-                margin=dict(t=20, b=20, l=20, r=20),
-                xaxis_title="Data",
-                yaxis_title="Ocorrências"
+        col_info, col_voltar = st.columns([4, 1])
+        with col_info:
+            st.caption(
+                f"Resolução: **{RESOLUCOES[resolucao][1].lower()}** · "
+                f"{vis_inicio:%d/%m/%Y} a {vis_fim:%d/%m/%Y}"
+                + (" · clique em um ponto para detalhar" if resolucao != "dia" else "")
             )
-            fig_timeline.update_traces(
-                fill='tozeroy',
-                line=dict(width=2)
-            )
-            
-            st.plotly_chart(fig_timeline, use_container_width=True)
-        else:
-            st.info("Dados de data não disponíveis")
+        with col_voltar:
+            if zoom:
+                st.button("⬅️ Voltar", use_container_width=True, on_click=_voltar_timeline)
+        
+        # Só os filtros de categoria e o intervalo exibido afetam a linha do tempo
+        fig_timeline = _obter_figura(
+            "timeline",
+            (chave_filtros[0], vis_inicio, vis_fim),
+            lambda: _figura_timeline(baldes, resolucao),
+            len(baldes)
+        )
+        
+        # A chave muda a cada nível de detalhe para descartar a seleção anterior
+        chave_timeline = _chave_grafico(f"timeline_{len(zoom)}")
+        st.plotly_chart(
+            fig_timeline, use_container_width=True,
+            key=chave_timeline,
+            on_select=partial(_ao_selecionar_periodo, chave_timeline),
+            selection_mode=("points", "box")
+        )
+    else:
+        st.info("Dados de data não disponíveis")
     
     # ================== PRIORIDADE ==================
     st.markdown("---")
     st.markdown("### ⚡ Análise de Prioridade")
     
+    por_prioridade = cubo.contar_por("prioridade", filtros, inicio, fim)
+    
     col1, col2 = st.columns([2, 1])
     
     with col1:
-        if stats["por_prioridade"]:
-            df_prioridade = pd.DataFrame({
-                "Prioridade": list(stats["por_prioridade"].keys()),
-                "Quantidade": list(stats["por_prioridade"].values())
-            })
-            
-            # Ordenar por peso
-            ordem = ["Baixa", "Media", "Alta", "Critica"]
-            df_prioridade["ordem"] = df_prioridade["Prioridade"].map(
-                {p: i for i, p in enumerate(ordem)}
-            )
-            df_prioridade = df_prioridade.sort_values("ordem")
-            
-            cores_prioridade = [PRIORIDADES.get(p, {}).get("cor", "#7f8c8d") for p in df_prioridade["Prioridade"]]
+        if por_prioridade:
+            fig_prioridade = _obter_figura("prioridade", chave_filtros, lambda: _figura_prioridade(por_prioridade), len(por_prioridade))
             
-            fig_prioridade = px.bar(
-                df_prioridade,
-                x="Prioridade",
-                y="Quantidade",
-                color="Prioridade",
-                color_discrete_sequence=cores_prioridade
-            )
-            fig_prioridade.update_layout(
-                margin=dict(t=20, b=20, l=20, r=20),
-                showlegend=False
+            st.plotly_chart(
+                fig_prioridade, use_container_width=True,
+                key=_chave_grafico("prioridade"), on_select="rerun", selection_mode="points"
             )
-            
-            st.plotly_chart(fig_prioridade, use_container_width=True)
     
     with col2:
         st.markdown("#### 🚨 Atenção Necessária")
         
-        criticas = stats["por_prioridade"].get("Critica", 0)
-        altas = stats["por_prioridade"].get("Alta", 0)
+        criticas = por_prioridade.get("Critica", 0)
+        altas = por_prioridade.get("Alta", 0)
         
         if criticas > 0:
             st.error(f"**{criticas}** ocorrências críticas precisam de atenção imediata!")
@@ -269,66 +587,3 @@ def render():
         
         if criticas == 0 and altas == 0:
             st.success("✅ Nenhuma ocorrência crítica ou de alta prioridade!")
-        
-        # Índice de urgência
-        total = stats["total"]
-        if total > 0:
-            peso_total = (
-                criticas * 4 + 
-                altas * 3 + 
-                stats["por_prioridade"].get("Media", 0) * 2 + 
-                stats["por_prioridade"].get("Baixa", 0)
-            )
-            indice = (peso_total / (total * 4)) * 100
-            
-            st.markdown("---")
-            st.markdown("**Índice de Urgência Geral**")
-            st.progress(indice / 100)
-            st.caption(f"{indice:.1f}% (quanto maior, mais urgente)")
-    
-    # ================== EXPORTAR RELATÓRIO ==================
-    st.markdown("---")
-    
-    with st.expander("📥 Exportar Relatório"):
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            csv_completo = df.to_csv(index=False, encoding="utf-8-sig")
-            st.download_button(
-                "📄 Baixar Dados Completos (CSV)",
-                csv_completo,
-                "ocorrencias_completo.csv",
-                "text/csv",
-                use_container_width=True
-            )
-        
-        with col2:
-            # Resumo em texto
-            resumo = f"""
-RELATÓRIO DE OCORRÊNCIAS URBANAS
-================================
-Gerado em: {datetime.now().strftime('%d/%m/%Y %H:%M')}
-
-RESUMO GERAL
-- Total de Ocorrências: {stats['total']}
-- Taxa de Resolução: {stats['taxa_resolucao']}%
-- Últimos 7 dias: {stats['ultimos_7_dias']}
-
-POR TIPO:
-{chr(10).join([f"  - {k}: {v}" for k, v in stats['por_tipo'].items()])}
-
-POR STATUS:
-{chr(10).join([f"  - {k}: {v}" for k, v in stats['por_status'].items()])}
-
-POR BAIRRO:
-{chr(10).join([f"  - {k}: {v}" for k, v in stats['por_bairro'].items()])}
-            """
-            
-            st.download_button(
-                "📊 Baixar Resumo (TXT)",
-                resumo,
-                "resumo_ocorrencias.txt",
-                "text/plain",
-                use_container_width=True
-            )
-
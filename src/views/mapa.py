@@ -2,17 +2,46 @@
 Página do Mapa Interativo com filtros e visualização de ocorrências.
 """
 import streamlit as st
+import streamlit.components.v1 as components
 import pandas as pd
-from streamlit_folium import st_folium
 import sys
+from datetime import date
 from pathlib import Path
+from typing import Optional
+from urllib.parse import urlencode
 
 # Adicionar src ao path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from data_manager import data_manager
-from map_utils import criar_mapa_base, adicionar_marcadores, criar_mapa_calor
-from config import TIPOS_OCORRENCIA, STATUS_OCORRENCIA, BAIRROS, PRIORIDADES
+from data_manager import data_manager, normalizar_filtros
+from map_utils import (
+    criar_mapa_base,
+    adicionar_marcadores,
+    criar_mapa_calor,
+    adicionar_camada_vetorial,
+    adicionar_coropletico,
+    adicionar_camada_urgencia,
+    obter_mapa_em_cache
+)
+from servidor_tiles import iniciar_servidor
+from incidentes import contar_incidentes, representantes_incidentes
+from geo_bairros import (
+    obter_geojson_simplificado,
+    poligonos_aproximados,
+    poligonos_disponiveis,
+    tolerancia_para_zoom,
+    versao_poligonos,
+)
+from urgencia import obter_urgencia
+from cubo_agregados import NAO_INFORMADO, obter_cubo
+from pintura_progressiva import adiar, preencher, reservar
+from exportacao import FORMATOS, baixar
+from config import TIPOS_OCORRENCIA, STATUS_OCORRENCIA, BAIRROS, PRIORIDADES, TILES_CONFIG, MAP_CONFIG, URGENCIA_CONFIG
+
+
+def _dict_filtros(filtros: tuple) -> dict:
+    """Filtros (tipo, status, bairro, prioridade) no formato aceito pelos módulos de dados."""
+    return dict(zip(("tipo", "status", "bairro", "prioridade"), filtros))
 
 
 def render():
@@ -21,20 +50,36 @@ def render():
     st.markdown("## 🗺️ Mapa de Ocorrências")
     st.markdown("Visualize todos os problemas reportados pela comunidade em tempo real.")
     
-    # Carregar dados
-    df = data_manager.carregar_todas_ocorrencias()
-    
-    if df.empty:
+    if obter_cubo().total() == 0:
         st.warning("📭 Nenhuma ocorrência registrada ainda. Seja o primeiro a reportar!")
         return
     
+    _painel_ocorrencias()
+
+
+@st.fragment
+def _painel_ocorrencias():
+    """
+    Filtros, métricas, mapas e lista de ocorrências.
+    
+    Fragmento: mudar um filtro reexecuta só este painel, sem refazer a
+    sidebar, os estilos e o cabeçalho do app. Os dados são lidos aqui, do
+    cache do DataManager, e repassados explicitamente aos fragmentos internos.
+    
+    A pintura é progressiva: filtros e métricas saem dos contadores do cubo
+    antes de qualquer dado ser carregado; os mapas das demais abas são
+    montados em segundo plano enquanto o de marcadores e a lista são
+    desenhados, e ocupam seus espaços quando ficam prontos.
+    """
+    cubo = obter_cubo()
+    
     # ================== FILTROS ==================
     with st.expander("🔍 Filtros", expanded=True):
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
             # Filtro por tipo
-            tipos_disponiveis = ["Todos"] + sorted(df["tipo"].dropna().unique().tolist())
+            tipos_disponiveis = ["Todos"] + sorted(t for t in cubo.contar_por("tipo") if t != NAO_INFORMADO)
             tipo_selecionado = st.selectbox(
                 "Tipo de Ocorrência",
                 tipos_disponiveis,
@@ -52,7 +97,7 @@ def render():
         
         with col3:
             # Filtro por bairro
-            bairros_disponiveis = ["Todos"] + sorted(df["bairro"].dropna().unique().tolist())
+            bairros_disponiveis = ["Todos"] + sorted(b for b in cubo.contar_por("bairro") if b != NAO_INFORMADO)
             bairro_selecionado = st.selectbox(
                 "Bairro",
                 bairros_disponiveis,
@@ -68,78 +113,65 @@ def render():
                 index=0
             )
     
-    # ================== APLICAR FILTROS ==================
-    df_filtrado = df.copy()
-    
-    if tipo_selecionado != "Todos":
-        df_filtrado = df_filtrado[df_filtrado["tipo"] == tipo_selecionado]
-    
-    if status_selecionado != "Todos":
-        df_filtrado = df_filtrado[df_filtrado["status"] == status_selecionado]
-    
-    if bairro_selecionado != "Todos":
-        df_filtrado = df_filtrado[df_filtrado["bairro"] == bairro_selecionado]
-    
-    if prioridade_selecionada != "Todas":
-        df_filtrado = df_filtrado[df_filtrado["prioridade"] == prioridade_selecionada]
+    filtros = (tipo_selecionado, status_selecionado, bairro_selecionado, prioridade_selecionada)
+    filtros_cubo = {campo: [valor] for campo, valor in normalizar_filtros(_dict_filtros(filtros))}
     
     # ================== MÉTRICAS RÁPIDAS ==================
+    # contar_por ignora o filtro da própria dimensão; aqui o filtro de status vale
+    por_status = {
+        s: q for s, q in cubo.contar_por("status", filtros_cubo).items()
+        if status_selecionado in ("Todos", s)
+    }
+    
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
         st.metric(
             "Total Exibido",
-            len(df_filtrado),
-            delta=f"de {len(df)} total"
+            cubo.total(filtros_cubo),
+            delta=f"de {cubo.total()} total"
         )
     
     with col2:
-        pendentes = len(df_filtrado[df_filtrado["status"] == "Pendente"])
-        st.metric("Pendentes", pendentes)
+        st.metric("Pendentes", por_status.get("Pendente", 0))
     
     with col3:
-        em_andamento = len(df_filtrado[df_filtrado["status"] == "Em Andamento"])
-        st.metric("Em Andamento", em_andamento)
+        st.metric("Em Andamento", por_status.get("Em Andamento", 0))
     
     with col4:
-        resolvidos = len(df_filtrado[df_filtrado["status"] == "Resolvido"])
-        st.metric("Resolvidos", resolvidos)
+        st.metric("Resolvidos", por_status.get("Resolvido", 0))
+    
+    espaco_incidentes = reservar("🔗 Contando incidentes...")
     
     st.markdown("---")
     
+    # ================== APLICAR FILTROS ==================
+    # Seleção por máscara sobre o snapshot compartilhado (sem filtros, o próprio snapshot)
+    versao_dados = data_manager.obter_versao()
+    df_filtrado = data_manager.selecionar_ocorrencias(_dict_filtros(filtros))
+    
+    # Construções das abas secundárias, em segundo plano
+    vazio = df_filtrado.empty
+    futuro_incidentes = None if vazio else adiar(contar_incidentes, df_filtrado)
+    futuro_calor = None if vazio else adiar(_html_mapa_calor, df_filtrado, filtros, versao_dados)
+    futuro_bairros = None if vazio or not poligonos_disponiveis() else \
+        adiar(_html_mapa_bairros, df_filtrado, filtros, versao_dados)
+    futuro_urgencia = adiar(_html_mapa_urgencia, df_filtrado, filtros, versao_dados)
+    
     # ================== TABS DE VISUALIZAÇÃO ==================
-    tab_marcadores, tab_calor = st.tabs(["📍 Marcadores", "🔥 Mapa de Calor"])
+    tab_marcadores, tab_calor, tab_bairros, tab_urgencia = st.tabs(
+        ["📍 Marcadores", "🔥 Mapa de Calor", "🏘️ Bairros", "🚨 Urgência"]
+    )
     
     with tab_marcadores:
-        # Opções de visualização
-        col1, col2 = st.columns([3, 1])
-        with col2:
-            agrupar = st.checkbox("Agrupar marcadores próximos", value=True)
-        
-        # Criar e exibir mapa
-        if not df_filtrado.empty:
-            # Centralizar no centro dos dados filtrados
-            center_lat = df_filtrado["latitude"].mean()
-            center_lon = df_filtrado["longitude"].mean()
-            
-            mapa = criar_mapa_base(center_lat=center_lat, center_lon=center_lon)
-            mapa = adicionar_marcadores(mapa, df_filtrado, agrupar=agrupar)
-            
-            st_folium(mapa, width=None, height=550, use_container_width=True)
-        else:
-            st.info("Nenhuma ocorrência corresponde aos filtros selecionados.")
+        _mapa_marcadores(df_filtrado, filtros, versao_dados)
     
     with tab_calor:
         st.markdown("#### Concentracao de Ocorrencias")
         st.markdown("Areas em **vermelho** indicam maior concentracao de problemas. Areas em **azul** indicam menor concentracao.")
         
-        if not df_filtrado.empty:
-            # Centralizar no centro dos dados filtrados
-            center_lat = df_filtrado["latitude"].mean()
-            center_lon = df_filtrado["longitude"].mean()
-            
-            mapa_calor = criar_mapa_calor(df_filtrado, center_lat=center_lat, center_lon=center_lon)
-            st_folium(mapa_calor, width=None, height=550, use_container_width=True, key="mapa_calor")
+        if futuro_calor is not None:
+            espaco_calor = reservar("⏳ Montando mapa de calor...")
             
             # Legenda
             st.markdown("""
@@ -161,6 +193,34 @@ def render():
         else:
             st.info("Nenhuma ocorrencia corresponde aos filtros selecionados.")
     
+    with tab_bairros:
+        st.markdown("#### Visao Geral por Bairro")
+        st.markdown("Cada bairro e colorido pela quantidade de ocorrencias filtradas.")
+        
+        if not poligonos_disponiveis():
+            st.info(
+                "Limites dos bairros nao encontrados. Coloque o GeoJSON oficial em "
+                "`data/raw/bairros.geojson` (ou gere um substituto aproximado com "
+                "`python geo_bairros.py --gerar`)."
+            )
+        elif futuro_bairros is not None:
+            if poligonos_aproximados():
+                st.caption(
+                    "⚠️ Limites aproximados, gerados a partir das ocorrencias: nao sao os "
+                    "limites oficiais dos bairros."
+                )
+            espaco_bairros = reservar("⏳ Montando mapa dos bairros...")
+        else:
+            st.info("Nenhuma ocorrencia corresponde aos filtros selecionados.")
+    
+    with tab_urgencia:
+        st.markdown("#### Onde Enviar as Equipes")
+        st.markdown(
+            f"Celulas de {URGENCIA_CONFIG['celula_m']} m coloridas pelo indice de urgencia das "
+            "ocorrencias abertas (prioridade, votos e idade do reporte)."
+        )
+        espaco_urgencia = reservar("⏳ Calculando urgencia...")
+    
     # ================== LISTA DE OCORRÊNCIAS ==================
     st.markdown("---")
     st.markdown("### 📋 Lista de Ocorrências")
@@ -170,7 +230,7 @@ def render():
         colunas_exibir = ["tipo", "descricao", "bairro", "status", "prioridade", "data"]
         colunas_existentes = [c for c in colunas_exibir if c in df_filtrado.columns]
         
-        df_exibir = df_filtrado[colunas_existentes].copy()
+        df_exibir = df_filtrado[colunas_existentes]
         
         # Renomear colunas para exibição
         rename_map = {
@@ -199,20 +259,167 @@ def render():
         )
         
         # Download dos dados
-        col1, col2, col3 = st.columns([2, 1, 1])
-        with col3:
-            csv = df_filtrado.to_csv(index=False, encoding="utf-8-sig")
-            st.download_button(
-                "📥 Exportar CSV",
-                csv,
-                "ocorrencias_filtradas.csv",
-                "text/csv",
-                use_container_width=True
-            )
+        _exportar_filtradas(filtros)
     else:
         st.info("Nenhuma ocorrência para exibir.")
+    
+    # ================== PREENCHIMENTO DOS ESPAÇOS ==================
+    if futuro_incidentes is None:
+        espaco_incidentes.empty()
+    else:
+        preencher(espaco_incidentes, futuro_incidentes, lambda quantidade: st.caption(
+            f"🔗 {quantidade} incidentes distintos entre as ocorrências exibidas"
+        ))
+    
+    if futuro_calor is not None:
+        preencher(espaco_calor, futuro_calor, _exibir_mapa)
+    
+    if futuro_bairros is not None:
+        preencher(espaco_bairros, futuro_bairros, _exibir_mapa)
+    
+    preencher(espaco_urgencia, futuro_urgencia, lambda html: _exibir_mapa(html) if html else st.info(
+        "Nenhuma ocorrencia aberta corresponde aos filtros selecionados."
+    ))
+
 
+def _exibir_mapa(html_mapa: str):
+    components.html(html_mapa, height=550)
+
+
+def _html_mapa_calor(df_filtrado: pd.DataFrame, filtros: tuple, versao_dados: str) -> str:
+    def construir_mapa_calor():
+        # Centralizar no centro dos dados filtrados
+        center_lat = df_filtrado["latitude"].mean()
+        center_lon = df_filtrado["longitude"].mean()
+        
+        return criar_mapa_calor(df_filtrado, center_lat=center_lat, center_lon=center_lon)
+    
+    return obter_mapa_em_cache((filtros, False, "calor", versao_dados), construir_mapa_calor)[1]
+
+
+def _html_mapa_bairros(df_filtrado: pd.DataFrame, filtros: tuple, versao_dados: str) -> str:
+    def construir_mapa_bairros():
+        contagens = df_filtrado["bairro"].value_counts().to_dict()
+        geojson = obter_geojson_simplificado(tolerancia_para_zoom(MAP_CONFIG["zoom_start"]))
+        
+        mapa = criar_mapa_base()
+        return adicionar_coropletico(mapa, geojson, contagens)
+    
+    # Trocar ou regerar o arquivo de limites também invalida o mapa
+    chave = (filtros, False, "bairros", versao_dados, versao_poligonos())
+    return obter_mapa_em_cache(chave, construir_mapa_bairros)[1]
 
 
+def _html_mapa_urgencia(df_filtrado: pd.DataFrame, filtros: tuple, versao_dados: str) -> Optional[str]:
+    """HTML do mapa de urgência, ou None se não houver ocorrência aberta."""
+    urgencia = obter_urgencia(_dict_filtros(filtros))
+    if urgencia["celulas"].empty:
+        return None
+    
+    def construir_mapa_urgencia():
+        center_lat = df_filtrado["latitude"].mean()
+        center_lon = df_filtrado["longitude"].mean()
+        
+        mapa = criar_mapa_base(center_lat=center_lat, center_lon=center_lon)
+        return adicionar_camada_urgencia(mapa, urgencia["celulas"])
+    
+    return obter_mapa_em_cache(
+        # O decaimento pela idade muda o índice de um dia para o outro
+        (filtros, False, "urgencia", versao_dados, date.today()),
+        construir_mapa_urgencia
+    )[1]
 
 
+@st.fragment
+def _mapa_marcadores(df_filtrado: pd.DataFrame, filtros: tuple, versao_dados: str):
+    """
+    Aba de marcadores.
+    
+    Fragmento: as opções de agrupamento reexecutam só o mapa, com os mesmos
+    dados filtrados recebidos do painel.
+    """
+    # Opções de visualização
+    col1, col2 = st.columns([3, 1])
+    with col2:
+        agrupar = st.checkbox("Agrupar marcadores próximos", value=True)
+        por_incidente = st.checkbox(
+            "Um marcador por incidente",
+            value=False,
+            help="Reúne reportes do mesmo problema em um único marcador"
+        )
+    
+    df_mapa = representantes_incidentes(df_filtrado) if por_incidente else df_filtrado
+    
+    # Criar e exibir mapa
+    url_servidor = iniciar_servidor() if len(df_mapa) > TILES_CONFIG["limite_marcadores"] else None
+    if len(df_mapa) > TILES_CONFIG["limite_marcadores"] and url_servidor is None:
+        # Sem servidor de tiles acessível pelo navegador: só os primeiros marcadores
+        st.warning(
+            f"Exibindo só {TILES_CONFIG['limite_marcadores']} de {len(df_mapa)} ocorrências: "
+            "configure MAPA_TILES_URL para ver todas como tiles vetoriais (ver README)."
+        )
+        df_mapa = df_mapa.head(TILES_CONFIG["limite_marcadores"])
+    
+    if url_servidor:
+        # Muitos pontos: o navegador busca só os tiles vetoriais visíveis
+        url_tiles = url_servidor + "/mvt/{z}/{x}/{y}.pbf"
+        consulta = urlencode(_dict_filtros(filtros))
+        
+        def construir_mapa_vetorial():
+            center_lat = df_filtrado["latitude"].mean()
+            center_lon = df_filtrado["longitude"].mean()
+            
+            mapa = criar_mapa_base(center_lat=center_lat, center_lon=center_lon)
+            return adicionar_camada_vetorial(mapa, f"{url_tiles}?{consulta}")
+        
+        _, html_mapa = obter_mapa_em_cache(
+            (filtros, False, "vetorial", versao_dados),
+            construir_mapa_vetorial
+        )
+        components.html(html_mapa, height=550)
+        st.caption(
+            f"Exibindo {len(df_filtrado)} ocorrências como tiles vetoriais; "
+            "pontos próximos são agregados nos zooms mais distantes."
+        )
+    elif not df_filtrado.empty:
+        def construir_mapa():
+            # Centralizar no centro dos dados filtrados
+            center_lat = df_filtrado["latitude"].mean()
+            center_lon = df_filtrado["longitude"].mean()
+            
+            mapa = criar_mapa_base(center_lat=center_lat, center_lon=center_lon)
+            return adicionar_marcadores(mapa, df_mapa, agrupar=agrupar)
+        
+        # Mapas já montados para a mesma combinação são reaproveitados
+        modo = "incidentes" if por_incidente else "marcadores"
+        _, html_mapa = obter_mapa_em_cache(
+            (filtros, agrupar, modo, versao_dados),
+            construir_mapa
+        )
+        components.html(html_mapa, height=550)
+    else:
+        st.info("Nenhuma ocorrência corresponde aos filtros selecionados.")
+
+
+@st.fragment
+def _exportar_filtradas(filtros: tuple):
+    """Seletor de formato e botão de download (fragmento: trocar o formato não refaz os mapas)."""
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col2:
+        formato = st.selectbox(
+            "Formato",
+            list(FORMATOS.keys()),
+            format_func=lambda f: FORMATOS[f][2],
+            label_visibility="collapsed",
+            key="mapa_formato_exportacao"
+        )
+    with col3:
+        extensao, mime, rotulo, _ = FORMATOS[formato]
+        # O arquivo só é gerado se o botão for clicado (e reaproveitado depois)
+        st.download_button(
+            f"📥 Exportar {rotulo.split(' ')[0]}",
+            baixar(formato, _dict_filtros(filtros)),
+            f"ocorrencias_filtradas.{extensao}",
+            mime,
+            use_container_width=True
+        )
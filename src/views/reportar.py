@@ -2,8 +2,8 @@
 Página para reportar novos problemas urbanos.
 """
 import streamlit as st
+import pandas as pd
 from streamlit_folium import st_folium
-import folium
 import sys
 from pathlib import Path
 from datetime import datetime
@@ -12,7 +12,48 @@ from datetime import datetime
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from data_manager import data_manager
-from config import TIPOS_OCORRENCIA, BAIRROS, PRIORIDADES, MAP_CONFIG
+from map_utils import criar_mapa_seletor
+from indice_espacial import buscar_ocorrencias_proximas
+from geo_bairros import identificar_bairro
+from config import TIPOS_OCORRENCIA, BAIRROS, PRIORIDADES, DUPLICADOS_CONFIG
+
+
+def render_reportes_proximos(lat: float, lon: float, tipo: str):
+    """Mostra reportes abertos do mesmo tipo perto do ponto, com opção de apoiar."""
+    proximos = buscar_ocorrencias_proximas(lat, lon, tipo=tipo)
+    
+    if proximos.empty:
+        return
+    
+    st.warning(
+        f"⚠️ Já existem {len(proximos)} reporte(s) de **{tipo}** abertos a até "
+        f"{DUPLICADOS_CONFIG['raio_m']} m deste local. Se for o mesmo problema, apoie o reporte existente."
+    )
+    
+    apoiados = st.session_state.setdefault("reportes_apoiados", set())
+    
+    for _, row in proximos.iterrows():
+        ocorrencia_id = str(row.get("id"))
+        votos = row.get("votos", 0)
+        votos = 0 if pd.isna(votos) else int(votos)
+        descricao = str(row.get("descricao", ""))[:80]
+        
+        col_info, col_btn = st.columns([3, 1])
+        with col_info:
+            st.markdown(
+                f"**{row.get('status', 'Pendente')}** • {row['distancia_m']:.0f} m • 👍 {votos}  \n"
+                f"<span style='color: #7f8c8d; font-size: 0.85rem;'>{descricao}</span>",
+                unsafe_allow_html=True
+            )
+        with col_btn:
+            if ocorrencia_id in apoiados:
+                st.button("✅ Apoiado", key=f"apoiar_{ocorrencia_id}", disabled=True, use_container_width=True)
+            elif st.button("👍 Apoiar", key=f"apoiar_{ocorrencia_id}", use_container_width=True):
+                if data_manager.votar_ocorrencia(ocorrencia_id):
+                    apoiados.add(ocorrencia_id)
+                    st.rerun()
+                else:
+                    st.caption("Este reporte nao aceita apoios.")
 
 
 def render():
@@ -28,15 +69,8 @@ def render():
         st.markdown("### 📍 Selecione a Localização")
         st.markdown("Clique no mapa para marcar o local exato do problema.")
         
-        # Criar mapa para seleção
-        mapa = folium.Map(
-            location=[MAP_CONFIG["center_lat"], MAP_CONFIG["center_lon"]],
-            zoom_start=MAP_CONFIG["zoom_start"],
-            tiles="CartoDB positron"
-        )
-        
-        # Adicionar popup de coordenadas
-        mapa.add_child(folium.LatLngPopup())
+        # Criar mapa para seleção (com popup de coordenadas)
+        mapa = criar_mapa_seletor()
         
         # Exibir mapa
         output = st_folium(
@@ -55,23 +89,28 @@ def render():
             lat = output["last_clicked"]["lat"]
             lon = output["last_clicked"]["lng"]
             st.success(f"✅ Local selecionado: {lat:.6f}, {lon:.6f}")
+            
+            # O tipo escolhido ao lado já está no session_state nesta execução
+            tipo_atual = st.session_state.get("tipo_reporte", next(iter(TIPOS_OCORRENCIA)))
+            render_reportes_proximos(lat, lon, tipo_atual)
         else:
             st.info("👆 Clique no mapa para selecionar a localização")
     
     with col_form:
         st.markdown("### 📝 Detalhes do Problema")
         
+        # Tipo fora do formulário: a busca de reportes próximos usa o valor atual
+        tipo = st.selectbox(
+            "Tipo do Problema *",
+            list(TIPOS_OCORRENCIA.keys()),
+            key="tipo_reporte",
+            help="Selecione a categoria que melhor descreve o problema"
+        )
+        
+        # Descrição do tipo selecionado
+        st.caption(f"ℹ️ {TIPOS_OCORRENCIA[tipo]['descricao']}")
+        
         with st.form("form_reportar", clear_on_submit=True):
-            # Tipo de problema
-            tipo = st.selectbox(
-                "Tipo do Problema *",
-                list(TIPOS_OCORRENCIA.keys()),
-                help="Selecione a categoria que melhor descreve o problema"
-            )
-            
-            # Descrição do tipo selecionado
-            st.caption(f"ℹ️ {TIPOS_OCORRENCIA[tipo]['descricao']}")
-            
             # Descrição detalhada
             descricao = st.text_area(
                 "Descrição Detalhada *",
@@ -80,12 +119,19 @@ def render():
                 max_chars=500
             )
             
-            # Bairro
+            # Bairro (pré-selecionado pela localização clicada)
+            bairro_sugerido = identificar_bairro(lat, lon) if lat is not None else None
             bairro = st.selectbox(
                 "Bairro *",
                 BAIRROS,
+                index=BAIRROS.index(bairro_sugerido) if bairro_sugerido in BAIRROS else 0,
                 help="Selecione o bairro onde está localizado o problema"
             )
+            if bairro_sugerido:
+                st.caption(
+                    f"📍 Bairro identificado pela localização: {bairro_sugerido}. "
+                    "Se você escolher outro, sua escolha é mantida."
+                )
             
             # Prioridade
             prioridade = st.select_slider(
@@ -198,13 +244,13 @@ def render():
                         
                         resumo_cols = st.columns(2)
                         with resumo_cols[0]:
-                            st.markdown(f"**Tipo:** {tipo}")
-                            st.markdown(f"**Bairro:** {bairro}")
-                            st.markdown(f"**Prioridade:** {prioridade}")
+                            st.markdown(f"**Tipo:** {ocorrencia.tipo}")
+                            st.markdown(f"**Bairro:** {ocorrencia.bairro}")
+                            st.markdown(f"**Prioridade:** {ocorrencia.prioridade}")
                         with resumo_cols[1]:
-                            st.markdown(f"**ID:** `{ocorrencia['id'][:15]}...`")
-                            st.markdown(f"**Status:** Pendente")
-                            st.markdown(f"**Data:** {datetime.now().strftime('%d/%m/%Y %H:%M')}")
+                            st.markdown(f"**ID:** `{ocorrencia.id[:15]}...`")
+                            st.markdown(f"**Status:** {ocorrencia.status}")
+                            st.markdown(f"**Data:** {ocorrencia.data_envio.strftime('%d/%m/%Y %H:%M')}")
                         
                     except Exception as e:
                         st.error(f"❌ Erro ao salvar: {str(e)}")
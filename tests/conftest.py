@@ -0,0 +1,55 @@
+"""
+Configuração comum dos testes.
+
+Os módulos ficam em ``src`` (o app é executado a partir de lá). Os testes
+usam arquivos de dados em um diretório temporário, nunca os de ``data/``.
+"""
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(SRC_DIR))
+
+import data_manager as modulo_dados  # noqa: E402
+
+CSV_MINIMO = (
+    "id,tipo,descricao,latitude,longitude,bairro,data,status,prioridade,votos\n"
+    "1,Buraco,Buraco na faixa,-11.4312,-61.4541,Centro,2025-10-01,Pendente,Alta,12\n"
+    "2,Iluminacao,Poste sem luz,-11.4384,-61.4497,Centro,2025-10-02,Em Andamento,Media,8\n"
+    "3,Lixo,Entulho na calcada,-11.4450,-61.4620,Liberdade,2025-10-03,Resolvido,Baixa,2\n"
+)
+
+
+def apontar_arquivos(pasta: Path, alterar=setattr, alterar_item=None) -> None:
+    """Aponta o módulo data_manager para os arquivos de ``pasta``."""
+    alterar_item = alterar_item or (lambda d, k, v: d.__setitem__(k, v))
+    alterar(modulo_dados, "OCORRENCIAS_CSV", pasta / "ocorrencias.csv")
+    alterar(modulo_dados, "REPORTES_JSON", pasta / "reportes.json")
+    alterar(modulo_dados, "IMAGES_DIR", pasta / "images")
+    alterar_item(modulo_dados.SINCRONIZACAO_CONFIG, "log", pasta / "alteracoes.jsonl")
+    alterar_item(modulo_dados.SINCRONIZACAO_CONFIG, "trava", pasta / "alteracoes.lock")
+
+
+@pytest.fixture
+def pasta_dados(tmp_path, monkeypatch) -> Path:
+    """Diretório temporário com um CSV pequeno e nenhum reporte, já em uso pelo data_manager."""
+    (tmp_path / "ocorrencias.csv").write_text(CSV_MINIMO, encoding="utf-8")
+    (tmp_path / "reportes.json").write_text(json.dumps([]), encoding="utf-8")
+    apontar_arquivos(tmp_path, monkeypatch.setattr, monkeypatch.setitem)
+    return tmp_path
+
+
+@pytest.fixture
+def gerenciador(pasta_dados) -> "modulo_dados.DataManager":
+    """DataManager novo sobre os arquivos temporários."""
+    return modulo_dados.DataManager()
+
+
+def novo_reporte(gerenciador, tipo="Buraco", lat=-11.44, lon=-61.46, **campos):
+    """Adiciona um reporte com descrição padrão e retorna a ocorrência."""
+    return gerenciador.adicionar_ocorrencia(
+        tipo, campos.pop("descricao", "Reporte de teste"), lat, lon, campos.pop("bairro", "Centro"), **campos
+    )
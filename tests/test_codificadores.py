@@ -0,0 +1,108 @@
+"""
+Codificadores próprios (MVT e FlatGeobuf) conferidos com decodificadores de
+referência: mapbox-vector-tile para os tiles e o GDAL (pyogrio) para o
+FlatGeobuf. Os testes são pulados se esses pacotes não estiverem instalados.
+"""
+import math
+
+import numpy as np
+import pytest
+
+import exportacao
+import tiles_vetoriais
+from config import TILES_CONFIG
+from conftest import novo_reporte
+
+mapbox_vector_tile = pytest.importorskip("mapbox_vector_tile")
+
+
+def _decodificar_tile(dados: bytes) -> dict:
+    return mapbox_vector_tile.decode(dados, default_options={"y_coord_down": True})
+
+
+def _lon_lat_do_tile(z: int, x: int, y: int, px: float, py: float, extent: int):
+    n = 2 ** z
+    mx, my = (x + px / extent) / n, (y + py / extent) / n
+    lon = mx * 360.0 - 180.0
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * my))))
+    return lon, lat
+
+
+def test_camada_mvt_e_lida_pelo_decodificador_de_referencia():
+    pontos = [(10, 20), (4000, 4095), (-30, 4100)]  # os dois últimos caem na margem do tile
+    propriedades = [
+        {"tipo": "Buraco", "status": "Pendente", "quantidade": 1},
+        {"tipo": "Calçada", "bairro": None, "quantidade": 7},
+        {"tipo": "Buraco", "status": "Em Analise", "quantidade": 1},
+    ]
+
+    camada = _decodificar_tile(tiles_vetoriais.codificar_camada("ocorrencias", pontos, propriedades, 4096))
+
+    assert list(camada) == ["ocorrencias"]
+    assert camada["ocorrencias"]["extent"] == 4096
+    features = camada["ocorrencias"]["features"]
+    assert [f["id"] for f in features] == [1, 2, 3]
+    assert [f["geometry"] for f in features] == [{"type": "Point", "coordinates": list(p)} for p in pontos]
+    # Valores None não são gravados
+    assert [f["properties"] for f in features] == [
+        {k: v for k, v in p.items() if v is not None} for p in propriedades
+    ]
+
+
+def test_tile_gerado_tem_as_ocorrencias_do_recorte(gerenciador, monkeypatch):
+    monkeypatch.setattr(tiles_vetoriais, "data_manager", gerenciador)
+    novo_reporte(gerenciador, tipo="Lixo", lat=-11.4401, lon=-61.4602)
+    df = gerenciador.carregar_todas_ocorrencias()
+
+    z = 10
+    mx, my = tiles_vetoriais.projetar(df["latitude"].to_numpy(float), df["longitude"].to_numpy(float))
+    x, y = int(mx[0] * 2 ** z), int(my[0] * 2 ** z)
+    assert (np.floor(mx * 2 ** z) == x).all() and (np.floor(my * 2 ** z) == y).all()
+
+    extent = TILES_CONFIG["extent"]
+    features = _decodificar_tile(tiles_vetoriais.gerar_tile(z, x, y))["ocorrencias"]["features"]
+    assert len(features) == len(df)
+
+    recebidos = sorted(
+        (f["properties"]["tipo"], f["properties"]["status"])
+        + tuple(round(c, 3) for c in _lon_lat_do_tile(z, x, y, *f["geometry"]["coordinates"], extent))
+        for f in features
+    )
+    esperados = sorted(zip(df["tipo"], df["status"], df["longitude"].round(3), df["latitude"].round(3)))
+    assert recebidos == esperados
+
+    so_lixo = _decodificar_tile(tiles_vetoriais.gerar_tile(z, x, y, (("tipo", "Lixo"),)))["ocorrencias"]["features"]
+    assert sorted(f["properties"]["tipo"] for f in so_lixo) == ["Lixo", "Lixo"]
+
+
+def test_flatgeobuf_e_lido_pelo_gdal(gerenciador, monkeypatch, tmp_path):
+    pyogrio = pytest.importorskip("pyogrio")
+    shapely = pytest.importorskip("shapely")
+    monkeypatch.setattr(exportacao, "data_manager", gerenciador)
+
+    localizada = novo_reporte(gerenciador, tipo="Calcada", descricao="Calçada quebrada – perto da praça")
+    sem_local = novo_reporte(gerenciador, tipo="Arvore")
+    assert gerenciador.atualizar_ocorrencia(sem_local.id, {"latitude": None, "longitude": None})
+    assert gerenciador.votar_ocorrencia(localizada.id)
+
+    destino = tmp_path / "ocorrencias.fgb"
+    exportacao.escrever_exportacao(destino, "fgb")
+    meta, _, geometrias, campos = pyogrio.raw.read(destino)
+
+    assert meta["geometry_type"] == "Point"
+    assert list(meta["fields"]) == [nome for nome, _ in exportacao.COLUNAS_GEO]
+    lido = dict(zip(meta["fields"], campos))
+    df = gerenciador.carregar_todas_ocorrencias()
+
+    assert list(lido["id"]) == df["id"].astype(str).tolist()
+    assert list(lido["tipo"]) == df["tipo"].tolist()
+    assert list(lido["descricao"]) == df["descricao"].tolist()
+    assert list(lido["votos"]) == df["votos"].astype(int).tolist()
+    assert [str(d)[:19] for d in lido["data"]] == [d.strftime("%Y-%m-%dT%H:%M:%S") for d in df["data"]]
+
+    for geometria, lat, lon in zip(geometrias, df["latitude"], df["longitude"]):
+        if lat is None or np.isnan(lat):
+            assert geometria is None
+        else:
+            ponto = shapely.from_wkb(geometria)
+            assert (ponto.x, ponto.y) == pytest.approx((lon, lat))
@@ -0,0 +1,135 @@
+"""
+Fila de triagem: depois de atualizações incrementais, a ordem do heap é a
+mesma de uma ordenação completa calculada do zero.
+"""
+import math
+import random
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from config import MAP_CONFIG, PRIORIDADES
+from fila_triagem import FilaTriagem
+from indice_espacial import RAIO_TERRA_M
+from ocorrencia import Ocorrencia
+
+PARAMETROS = {
+    "raio_m": 250,
+    "dias_para_dobrar": 30,
+    "peso_votos": 0.25,
+    "peso_densidade": 0.5,
+    "status_abertos": ("Pendente", "Em Analise", "Em Andamento"),
+}
+STATUS = ("Pendente", "Em Analise", "Em Andamento", "Resolvido", "Arquivado")
+INICIO = datetime(2025, 1, 1)
+
+
+def _registro_aleatorio(rng: random.Random, id_ocorrencia: str) -> dict:
+    sem_local = rng.random() < 0.05
+    return {
+        "id": id_ocorrencia,
+        "prioridade": rng.choice(list(PRIORIDADES)),
+        "status": rng.choice(STATUS),
+        "votos": rng.randrange(0, 30),
+        "latitude": None if sem_local else -11.44 + rng.gauss(0, 0.003),
+        "longitude": None if sem_local else -61.46 + rng.gauss(0, 0.003),
+        "data": INICIO + timedelta(days=rng.uniform(0, 300)),
+    }
+
+
+def _dataframe(registros: dict) -> pd.DataFrame:
+    return pd.DataFrame(list(registros.values())).astype({"latitude": float, "longitude": float})
+
+
+def _ocorrencia(registro: dict) -> Ocorrencia:
+    return Ocorrencia(
+        registro["id"], latitude=registro["latitude"], longitude=registro["longitude"],
+        status=registro["status"], prioridade=registro["prioridade"],
+        data_envio=registro["data"], votos=registro["votos"]
+    )
+
+
+def _ordem_forca_bruta(registros: dict) -> list:
+    """Ordem da fila recalculada do zero para todas as ocorrências."""
+    peso_max = max(info["peso"] for info in PRIORIDADES.values())
+    escala_lon = math.cos(math.radians(MAP_CONFIG["center_lat"]))
+    celulas = {}
+    for r in registros.values():
+        aberta = r["status"] in PARAMETROS["status_abertos"]
+        if aberta and r["latitude"] is not None:
+            x = math.radians(r["longitude"]) * RAIO_TERRA_M * escala_lon
+            y = math.radians(r["latitude"]) * RAIO_TERRA_M
+            celulas[r["id"]] = (int(x // PARAMETROS["raio_m"]), int(y // PARAMETROS["raio_m"]))
+
+    chaves = []
+    for r in registros.values():
+        dias = (pd.Timestamp(r["data"]).value / 1e9) / 86400.0
+        if r["status"] not in PARAMETROS["status_abertos"]:
+            chaves.append(((1, -dias), r["id"]))
+            continue
+        vizinhos = 0
+        if r["id"] in celulas:
+            cx, cy = celulas[r["id"]]
+            vizinhos = sum(
+                1 for outro, (ox, oy) in celulas.items()
+                if outro != r["id"] and abs(ox - cx) <= 1 and abs(oy - cy) <= 1
+            )
+        base = (
+            PRIORIDADES[r["prioridade"]]["peso"] / peso_max
+            * (1 + PARAMETROS["peso_votos"] * math.log1p(r["votos"]))
+            * (1 + PARAMETROS["peso_densidade"] * math.log1p(vizinhos))
+        )
+        chaves.append(((0, dias / PARAMETROS["dias_para_dobrar"] - math.log2(base)), r["id"]))
+    return [id_ocorrencia for _, id_ocorrencia in sorted(chaves)]
+
+
+@pytest.mark.parametrize("semente", [1, 2, 3])
+def test_proximos_igual_a_ordenacao_completa_apos_atualizacoes(semente):
+    rng = random.Random(semente)
+    registros = {f"r{i}": _registro_aleatorio(rng, f"r{i}") for i in range(400)}
+    fila = FilaTriagem.de_dataframe(_dataframe(registros), **PARAMETROS)
+    assert fila.proximos(len(registros)) == _ordem_forca_bruta(registros)
+
+    for passo in range(600):
+        sorteio = rng.random()
+        if sorteio < 0.2:
+            id_ocorrencia = f"n{passo}"
+            registros[id_ocorrencia] = _registro_aleatorio(rng, id_ocorrencia)
+        else:
+            id_ocorrencia = rng.choice(list(registros))
+            registro = dict(registros[id_ocorrencia])
+            if sorteio < 0.45:
+                registro["votos"] += 1
+            elif sorteio < 0.65:
+                registro["status"] = rng.choice(STATUS)
+            elif sorteio < 0.8:
+                registro["prioridade"] = rng.choice(list(PRIORIDADES))
+            else:
+                novo = _registro_aleatorio(rng, id_ocorrencia)
+                registro["latitude"], registro["longitude"] = novo["latitude"], novo["longitude"]
+            registros[id_ocorrencia] = registro
+        fila.atualizar(_ocorrencia(registros[id_ocorrencia]))
+
+    esperada = _ordem_forca_bruta(registros)
+    assert fila.proximos(len(registros)) == esperada
+    assert fila.proximos(25) == esperada[:25]
+
+    # Subconjuntos pequeno (comparação direta) e grande (percurso do heap)
+    for tamanho in (30, len(registros) // 2):
+        ids = set(rng.sample(list(registros), tamanho))
+        assert fila.proximos(20, ids) == [i for i in esperada if i in ids][:20]
+
+    # Remontar do zero leva à mesma fila
+    assert FilaTriagem.de_dataframe(_dataframe(registros), **PARAMETROS).proximos(len(registros)) == esperada
+
+
+def test_pontuacao_dobra_a_cada_periodo():
+    registro = {
+        "id": "a", "prioridade": "Alta", "status": "Pendente", "votos": 3,
+        "latitude": -11.44, "longitude": -61.46, "data": INICIO,
+    }
+    fila = FilaTriagem.de_dataframe(_dataframe({"a": registro}), **PARAMETROS)
+    agora = pd.Timestamp(INICIO).value / 1e9
+    depois = agora + PARAMETROS["dias_para_dobrar"] * 86400
+    assert fila.pontuacao("a", depois) == pytest.approx(2 * fila.pontuacao("a", agora))
@@ -0,0 +1,44 @@
+"""
+Ocorrencia: conversão do/para o formato gravado em ``reportes.json``.
+"""
+import json
+
+from ocorrencia import Ocorrencia
+
+REPORTE = {
+    "id": "20251001120000000000",
+    "tipo": "Buraco",
+    "descricao": "Buraco na esquina",
+    "latitude": -11.44,
+    "longitude": -61.46,
+    "bairro": "Centro",
+    "status": "Pendente",
+    "prioridade": "Alta",
+    "fotos": [],
+    "usuario": "Anonimo",
+    "data_envio": "2025-10-01T12:00:00",
+    "data_atualizacao": "2025-10-01T12:00:00",
+    "votos": 0,
+    "comentarios": [],
+    "protocolo": "SEMOSP-2025-0042",
+}
+
+
+def test_ida_e_volta_preserva_chaves_extras():
+    ocorrencia = Ocorrencia.de_dict(REPORTE)
+    assert ocorrencia.extras == {"protocolo": "SEMOSP-2025-0042"}
+    assert ocorrencia.para_dict() == REPORTE
+
+
+def test_escritas_preservam_chaves_extras(gerenciador, pasta_dados):
+    (pasta_dados / "reportes.json").write_text(json.dumps([REPORTE]), encoding="utf-8")
+    id_reporte = REPORTE["id"]
+
+    assert gerenciador.atualizar_ocorrencia(id_reporte, {"status": "Resolvido"})
+    assert gerenciador.votar_ocorrencia(id_reporte)
+    assert gerenciador.adicionar_comentario(id_reporte, "Equipe a caminho")
+
+    gravado, = json.loads((pasta_dados / "reportes.json").read_text(encoding="utf-8"))
+    assert gravado["protocolo"] == "SEMOSP-2025-0042"
+    assert gravado["status"] == "Resolvido" and gravado["votos"] == 1
+    assert [c["texto"] for c in gravado["comentarios"]] == ["Equipe a caminho"]
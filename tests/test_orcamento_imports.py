@@ -0,0 +1,60 @@
+"""
+Orçamento de importação das páginas.
+
+Cada página é importada em um interpretador novo, depois do que o app.py já
+carrega (streamlit, pandas, data_manager, componentes), e não pode carregar
+as dependências pesadas de outras páginas (o que o próprio streamlit já
+importa não conta). O tempo de importação varia com a máquina, então só é
+verificado com ``ORCAMENTO_IMPORTS_TEMPO=1`` no ambiente.
+"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import SRC_DIR
+
+MODULOS_PESADOS = ("folium", "streamlit_folium", "plotly.express", "plotly.graph_objects")
+
+# Página -> (segundos permitidos, módulos pesados permitidos)
+ORCAMENTO_PAGINAS = {
+    "mapa": (2.0, ("folium",)),
+    "reportar": (2.0, ("folium", "streamlit_folium")),
+    "dashboard": (1.5, ("plotly.express", "plotly.graph_objects")),
+    "sobre": (0.25, ()),
+    "admin": (0.25, ()),
+}
+
+_MEDICAO = """
+import json, sys, time
+sys.path.insert(0, {src!r})
+import streamlit, pandas, data_manager, components.ui_components
+from views import PAGINAS, carregar_pagina
+rotulo = next(r for r, m in PAGINAS.items() if m == {pagina!r})
+antes = set(sys.modules)
+inicio = time.perf_counter()
+carregar_pagina(rotulo)
+print(json.dumps({{
+    "tempo": time.perf_counter() - inicio,
+    "pesados": [m for m in {pesados!r} if m in sys.modules and m not in antes],
+}}))
+"""
+
+
+def _medir(pagina: str) -> dict:
+    codigo = _MEDICAO.format(src=str(SRC_DIR), pagina=pagina, pesados=MODULOS_PESADOS)
+    saida = subprocess.run([sys.executable, "-c", codigo], capture_output=True, text=True, cwd=SRC_DIR)
+    assert saida.returncode == 0, saida.stderr
+    return json.loads(saida.stdout.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize("pagina", sorted(ORCAMENTO_PAGINAS))
+def test_pagina_dentro_do_orcamento(pagina):
+    limite, permitidos = ORCAMENTO_PAGINAS[pagina]
+    medicao = _medir(pagina)
+
+    assert [m for m in medicao["pesados"] if m not in permitidos] == []
+    if os.environ.get("ORCAMENTO_IMPORTS_TEMPO") == "1":
+        assert medicao["tempo"] <= limite
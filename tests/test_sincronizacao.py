@@ -0,0 +1,105 @@
+"""
+Coerência entre processos: outro processo aplica as escritas pelo log de
+alterações e chega ao mesmo snapshot que uma leitura completa dos arquivos.
+"""
+import json
+import subprocess
+import sys
+import textwrap
+
+from conftest import SRC_DIR, novo_reporte
+
+# Outro processo: lê o snapshot, espera as escritas e o atualiza pelo log
+_LEITOR = textwrap.dedent("""
+    import json, sys
+    from pathlib import Path
+    sys.path.insert(0, {src!r})
+    sys.path.insert(0, {testes!r})
+    import pandas as pd
+    import data_manager as modulo_dados
+    from conftest import apontar_arquivos
+
+    apontar_arquivos(Path({pasta!r}))
+    gerenciador = modulo_dados.DataManager()
+    eventos = []
+    gerenciador.registrar_observador(lambda evento, ocorrencia, anterior: eventos.append([evento, ocorrencia["id"]]))
+    inicial = len(gerenciador.carregar_todas_ocorrencias())
+    print("pronto", flush=True)
+    sys.stdin.readline()
+
+    versao = gerenciador.obter_versao()
+    aplicado = gerenciador.carregar_todas_ocorrencias()
+    completo = modulo_dados.DataManager().carregar_todas_ocorrencias()
+    try:
+        pd.testing.assert_frame_equal(aplicado, completo)
+        diferenca = None
+    except AssertionError as e:
+        diferenca = str(e)
+    print(json.dumps({{
+        "inicial": inicial,
+        "versao": versao,
+        "eventos": eventos,
+        "diferenca": diferenca,
+        "registros": aplicado.to_json(orient="records", date_format="iso"),
+    }}))
+""")
+
+
+def _iniciar_leitor(pasta):
+    codigo = _LEITOR.format(src=str(SRC_DIR), testes=str(SRC_DIR.parent / "tests"), pasta=str(pasta))
+    processo = subprocess.Popen(
+        [sys.executable, "-c", codigo], cwd=SRC_DIR,
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+    )
+    assert processo.stdout.readline().strip() == "pronto", processo.stderr.read()
+    return processo
+
+
+def _concluir_leitor(processo):
+    saida, erros = processo.communicate("\n", timeout=60)
+    assert processo.returncode == 0, erros
+    return json.loads(saida.strip().splitlines()[-1])
+
+
+def test_outro_processo_aplica_o_log_e_chega_ao_mesmo_snapshot(gerenciador, pasta_dados):
+    existente = novo_reporte(gerenciador, descricao="Antes do leitor")
+    leitor = _iniciar_leitor(pasta_dados)
+
+    nova = novo_reporte(gerenciador, tipo="Lixo", lat=-11.45, lon=-61.47)
+    assert gerenciador.votar_ocorrencia(existente.id)
+    with gerenciador.transacao() as tx:
+        tx.atualizar(existente.id, {"status": "Em Analise", "prioridade": "Critica"})
+        tx.comentar(nova.id, "Visto no local", "Fiscal")
+
+    resultado = _concluir_leitor(leitor)
+
+    assert resultado["diferenca"] is None
+    assert resultado["versao"] == gerenciador.obter_versao()
+    assert resultado["inicial"] == 4
+    # Aplicado pelo log, uma notificação por escrita (sem recarga completa)
+    assert resultado["eventos"] == [
+        ["adicionada", nova.id],
+        ["votada", existente.id],
+        ["atualizada", existente.id],
+        ["comentada", nova.id],
+    ]
+    local = gerenciador.carregar_todas_ocorrencias()
+    assert json.loads(resultado["registros"]) == json.loads(local.to_json(orient="records", date_format="iso"))
+
+
+def test_escrita_fora_do_log_faz_outro_processo_recarregar(gerenciador, pasta_dados):
+    novo_reporte(gerenciador)
+    leitor = _iniciar_leitor(pasta_dados)
+
+    # Edição direta do JSON, sem passar pelo DataManager
+    caminho = pasta_dados / "reportes.json"
+    reportes = json.loads(caminho.read_text(encoding="utf-8"))
+    reportes[0]["status"] = "Resolvido"
+    caminho.write_text(json.dumps(reportes), encoding="utf-8")
+
+    resultado = _concluir_leitor(leitor)
+
+    assert resultado["diferenca"] is None
+    assert resultado["eventos"] == []
+    registros = json.loads(resultado["registros"])
+    assert registros[-1]["status"] == "Resolvido"
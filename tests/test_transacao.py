@@ -0,0 +1,121 @@
+"""
+Transações do DataManager: tudo ou nada, e uma única gravação por bloco.
+"""
+import json
+
+import pytest
+
+from conftest import novo_reporte
+
+
+@pytest.fixture
+def gravacoes(gerenciador, monkeypatch):
+    """Lista com os lotes de alterações de cada gravação do JSON."""
+    lotes = []
+    original = gerenciador._gravar_reportes
+
+    def _contar(reportes, alteracoes):
+        lotes.append(alteracoes)
+        original(reportes, alteracoes)
+
+    monkeypatch.setattr(gerenciador, "_gravar_reportes", _contar)
+    return lotes
+
+
+@pytest.fixture
+def eventos(gerenciador):
+    recebidos = []
+    gerenciador.registrar_observador(lambda evento, ocorrencia, anterior: recebidos.append((evento, ocorrencia["id"])))
+    return recebidos
+
+
+def test_excecao_no_bloco_desfaz_tudo(gerenciador, pasta_dados, gravacoes, eventos):
+    ocorrencia = novo_reporte(gerenciador)
+    conteudo = (pasta_dados / "reportes.json").read_bytes()
+    versao = gerenciador.obter_versao()
+    gravacoes.clear()
+    eventos.clear()
+
+    with pytest.raises(RuntimeError):
+        with gerenciador.transacao() as tx:
+            tx.atualizar(ocorrencia.id, {"status": "Resolvido"})
+            tx.votar(ocorrencia.id)
+            raise RuntimeError("falha no meio do bloco")
+
+    assert (pasta_dados / "reportes.json").read_bytes() == conteudo
+    assert gerenciador.obter_versao() == versao
+    assert gravacoes == [] and eventos == []
+    linha = gerenciador.carregar_todas_ocorrencias().iloc[-1]
+    assert linha["status"] == "Pendente" and linha["votos"] == 0
+
+
+def test_ocorrencia_inexistente_desfaz_as_demais(gerenciador, pasta_dados, gravacoes, eventos):
+    ocorrencia = novo_reporte(gerenciador)
+    conteudo = (pasta_dados / "reportes.json").read_bytes()
+    gravacoes.clear()
+    eventos.clear()
+
+    with pytest.raises(KeyError):
+        with gerenciador.transacao() as tx:
+            tx.votar(ocorrencia.id)
+            tx.votar("nao-existe")
+
+    assert (pasta_dados / "reportes.json").read_bytes() == conteudo
+    assert gravacoes == [] and eventos == []
+    # As operações isoladas relatam a falha sem levantar
+    assert gerenciador.votar_ocorrencia("nao-existe") is False
+
+
+def test_campo_extra_e_gravado(gerenciador, pasta_dados):
+    ocorrencia = novo_reporte(gerenciador)
+
+    assert gerenciador.atualizar_ocorrencia(ocorrencia.id, {"responsavel": "Equipe 3", "status": "Em Analise"})
+
+    gravado = json.loads((pasta_dados / "reportes.json").read_text(encoding="utf-8"))[-1]
+    assert gravado["responsavel"] == "Equipe 3" and gravado["status"] == "Em Analise"
+
+
+@pytest.mark.parametrize("campo", ["id", "fonte"])
+def test_id_e_fonte_sao_recusados_antes_da_gravacao(gerenciador, gravacoes, campo):
+    ocorrencia = novo_reporte(gerenciador)
+    gravacoes.clear()
+
+    with pytest.raises(ValueError, match=campo):
+        with gerenciador.transacao() as tx:
+            tx.atualizar(ocorrencia.id, {campo: "outro"})
+    assert gravacoes == []
+    assert gerenciador.atualizar_ocorrencia(ocorrencia.id, {campo: "outro"}) is False
+
+
+def test_bloco_grava_uma_vez_e_notifica_uma_vez_por_ocorrencia(gerenciador, pasta_dados, gravacoes, eventos):
+    a = novo_reporte(gerenciador)
+    b = novo_reporte(gerenciador, tipo="Lixo")
+    gravacoes.clear()
+    eventos.clear()
+    linhas_log = len((pasta_dados / "alteracoes.jsonl").read_text(encoding="utf-8").splitlines())
+
+    with gerenciador.transacao() as tx:
+        tx.votar(a.id)
+        tx.atualizar(a.id, {"status": "Em Analise"})
+        tx.comentar(a.id, "Equipe a caminho", "Administrador")
+        tx.votar(b.id)
+        tx.votar(b.id)
+
+    assert len(gravacoes) == 1
+    assert len((pasta_dados / "alteracoes.jsonl").read_text(encoding="utf-8").splitlines()) == linhas_log + 1
+    # O evento de cada ocorrência é o mais abrangente entre as operações
+    assert eventos == [("atualizada", a.id), ("votada", b.id)]
+
+    df = gerenciador.carregar_todas_ocorrencias().set_index("id")
+    assert df.loc[a.id, "status"] == "Em Analise"
+    assert df.loc[a.id, "votos"] == 1
+    assert [c["texto"] for c in df.loc[a.id, "comentarios"]] == ["Equipe a caminho"]
+    assert df.loc[b.id, "votos"] == 2
+
+
+def test_bloco_vazio_nao_grava(gerenciador, gravacoes):
+    versao = gerenciador.obter_versao()
+    with gerenciador.transacao():
+        pass
+    assert gravacoes == []
+    assert gerenciador.obter_versao() == versao